@@ -10,10 +10,70 @@ from dotenv import load_dotenv
 db = SQLAlchemy()
 login_manager = LoginManager()
 
-def create_app():
+# 可由環境變數（或 .env）覆寫的調校設定：(設定名稱, 型別)。
+# 只有設定了的環境變數才會寫入 app.config，其餘沿用各服務模組中的預設值。
+ENV_SETTINGS = [
+    # 密碼雜湊（password_service）
+    ('PASSWORD_HASH_METHOD', str),
+    ('PASSWORD_SALT_LENGTH', int),
+    ('PASSWORD_HASH_WORKERS', int),
+    ('PASSWORD_HASH_TIMEOUT', float),
+    # 登入使用者快取與 API token（auth_service）
+    ('LOGIN_USER_CACHE_TTL', int),
+    ('LOGIN_USER_CACHE_MAXSIZE', int),
+    ('API_TOKEN_AUTH', bool),
+    ('API_TOKEN_MAX_AGE', int),
+    # 背景工作（job_service）
+    ('JOB_WORKERS', int),
+    ('JOB_RESULT_DIR', str),
+    ('JOB_RESULT_TTL', int),
+    ('JOB_STALE_AFTER', int),
+    # Excel 導入（data_service）
+    ('IMPORT_PARSE_WORKERS', int),
+    # Gemini 客戶端（gemini_client）
+    ('GEMINI_TIMEOUT', float),
+    ('GEMINI_MAX_CONCURRENCY_PER_KEY', int),
+    ('GEMINI_MAX_RETRIES', int),
+    # LLM 回應快取（llm_cache）
+    ('LLM_CACHE_MAXSIZE', int),
+    ('LLM_CACHE_TTL', int),
+    ('LLM_CACHE_SQL_TIER', bool),
+    # AI 羊隻上下文（sheep_context）
+    ('AI_CONTEXT_CACHE_TTL', int),
+    ('AI_CONTEXT_CACHE_MAXSIZE', int),
+    ('AI_CONTEXT_MAX_CHARS', int),
+    # AI 對話記憶（chat_memory）
+    ('CHAT_WINDOW_TURNS', int),
+    ('CHAT_SUMMARY_EVERY_TURNS', int),
+    ('CHAT_PROMPT_MAX_CHARS', int),
+    # 事件選項快取（user_service）
+    ('EVENT_OPTIONS_CACHE_TTL', int),
+    ('EVENT_OPTIONS_CACHE_MAXSIZE', int),
+]
+
+def _env_value(raw, value_type):
+    """(私有) 將環境變數字串轉為設定值；布林值接受 1/true/yes/on（不分大小寫）。"""
+    if value_type is bool:
+        return raw.strip().lower() in ('1', 'true', 'yes', 'on')
+    return value_type(raw)
+
+def _load_env_settings(app):
+    """(私有) 從環境變數讀取 ENV_SETTINGS 中的設定，格式錯誤時拋出 ValueError 並指出設定名稱。"""
+    for key, value_type in ENV_SETTINGS:
+        raw = os.environ.get(key)
+        if raw is None or raw.strip() == '': continue
+        try:
+            app.config[key] = _env_value(raw, value_type)
+        except ValueError:
+            raise ValueError(f"環境變數 {key} 的值無效: {raw!r}")
+
+def create_app(test_config=None):
     """
     應用程式工廠函數。
     這種模式允許我們為不同的環境（如測試、生產）創建不同的應用實例。
+
+    Args:
+        test_config (dict, optional): 覆蓋預設設定的字典，例如讓基準測試腳本改用 SQLite 資料庫。
     """
     # 載入 .env 檔案中的環境變數
     # 確保在 create_app 內部也載入，以便在任何情境下都能讀取到
@@ -37,6 +97,20 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Gemini API 端點；測試時可指向本機的模擬伺服器
+    app.config['GEMINI_API_BASE'] = os.environ.get('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta')
+
+    # 效能調校與功能設定（見 ENV_SETTINGS），未設定時使用預設值
+    _load_env_settings(app)
+
+    if test_config:
+        app.config.update(test_config)
+
+    # --- JSON 序列化 ---
+    # 已安裝 orjson 時以其取代 Flask 預設的 JSON provider，jsonify 的輸出格式不變
+    from .serializers import init_json_provider
+    init_json_provider(app)
+
     # --- 初始化擴展 ---
     db.init_app(app)
     login_manager.init_app(app)
@@ -47,6 +121,8 @@ def create_app():
     # 當使用者嘗試訪問需要登入的頁面時顯示的訊息
     login_manager.login_message = '請登入以訪問此頁面。'
     login_manager.login_message_category = 'info'
+    # user_loader（含使用者快取）與 API token 的 request_loader
+    from .services import auth_service
 
     # 使用應用程式上下文
     with app.app_context():
@@ -57,11 +133,25 @@ def create_app():
         app.register_blueprint(auth_routes.bp)
         app.register_blueprint(api_routes.bp)
 
+        # --- 註冊命令列指令 ---
+        from .cli import register_cli
+        register_cli(app)
+
         # --- 建立資料庫表格 ---
         # 這將根據 models.py 中定義的模型在 PostgreSQL 中建立所有尚不存在的表格
-        # 在生產環境中，通常會使用資料庫遷移工具如 Alembic 來管理 schema 變更
         db.create_all()
 
+        # --- 套用資料庫遷移 ---
+        # create_all 無法變更既有表格（例如新增索引），這些變更由 migrations.py 依版本套用
+        from .migrations import run_migrations
+        run_migrations()
+
+        # --- 背景工作的啟動清理 ---
+        # 將上次行程中斷時留下的 pending / running 工作標記為失敗，並刪除過期的匯出檔案
+        from .services import job_service
+        job_service.recover_orphaned_jobs()
+        job_service.cleanup_expired_results()
+
         return app
 
 # --- END OF FILE backend/app/__init__.py ---
\ No newline at end of file
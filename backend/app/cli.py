@@ -0,0 +1,40 @@
+# --- START OF FILE backend/app/cli.py ---
+
+"""
+Flask 命令列指令。在 backend 目錄下執行，例如：
+
+    flask --app run provision-users accounts.csv
+"""
+
+import csv
+import click
+from .services import user_service
+
+def register_cli(app):
+    """將本模組的指令註冊到 app.cli。"""
+    app.cli.add_command(provision_users_command)
+
+@click.command('provision-users')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=user_service.PROVISION_BATCH_SIZE, show_default=True, help='每批建立的使用者數。')
+def provision_users_command(csv_path, batch_size):
+    """
+    從 CSV 批次建立使用者並初始化預設事件選項。
+
+    CSV 需有標題列，包含 username 與 password 兩個欄位（UTF-8，可含 BOM）。
+    """
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        missing = {'username', 'password'} - set(reader.fieldnames or [])
+        if missing:
+            raise click.ClickException(f"CSV 缺少欄位: {', '.join(sorted(missing))}")
+        accounts = ((row.get('username'), row.get('password')) for row in reader)
+        report = user_service.provision_users(
+            accounts, batch_size=batch_size, progress_callback=lambda created: click.echo(f"已建立 {created} 位使用者...")
+        )
+
+    click.echo(f"完成：建立 {report['created']} 位使用者，耗時 {report['elapsed_sec']} 秒（{report['users_per_sec']} 位/秒）")
+    for item in report['skipped']:
+        click.echo(f"  略過 {item['username'] or '(空白)'}：{item['reason']}")
+
+# --- END OF FILE backend/app/cli.py ---
\ No newline at end of file
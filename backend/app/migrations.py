@@ -0,0 +1,131 @@
+# --- START OF FILE backend/app/migrations.py ---
+
+"""
+輕量的資料庫遷移機制。
+
+db.create_all() 只會建立不存在的表格，無法為既有表格加上索引或變更欄位型別。
+這裡以 schema_migration 表格記錄已套用的版本，應用程式啟動時（create_all 之後）
+在同一個事務中依序套用尚未執行的遷移並寫入版本紀錄；任何一個失敗即整批回滾、中止啟動。
+
+新增遷移：在 MIGRATIONS 末端加上 (版本, 說明, 函數)，函數接收一個 Connection。
+遷移必須可在「全新資料庫」上安全執行，因為 create_all 已依最新模型建好表格。
+"""
+
+from datetime import datetime
+from . import db
+from .services.date_utils import parse_date
+from .services import history_rollup
+from .models import SchemaMigration, ChatHistory, EventTypeOption, EventDescriptionOption, SheepEvent, SheepHistoricalData
+
+# PostgreSQL advisory lock 的識別碼，避免多個 worker 同時啟動時重複執行遷移
+MIGRATION_LOCK_ID = 4726001
+
+def _create_model_indexes(conn, models):
+    """(私有) 建立模型 __table_args__ 中宣告、但資料庫中尚不存在的索引。"""
+    for model in models:
+        for index in model.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+def _migration_001_hot_query_indexes(conn):
+    """
+    各使用者常用查詢的複合索引：
+    - sheep_event (sheep_id, event_date, id)：單隻羊的事件列表
+    - sheep_historical_data (sheep_id, record_type, record_date)：趨勢圖、健康警示
+    - chat_history (user_id, session_id, timestamp)：對話視窗
+    - event_type_option / event_description_option：事件選項
+    - sheep_event、sheep_historical_data 的 user_id：匯出與使用者範圍的查詢
+
+    在大型 PostgreSQL 資料表上，可事先以 CREATE INDEX CONCURRENTLY 手動建立同名索引，
+    此遷移會略過已存在的索引。
+    """
+    _create_model_indexes(conn, [SheepEvent, SheepHistoricalData, ChatHistory, EventTypeOption, EventDescriptionOption])
+
+# (表格, 欄位, 是否允許 NULL)
+DATE_COLUMNS = [
+    ('sheep', 'BirthDate', True),
+    ('sheep', 'next_vaccination_due_date', True),
+    ('sheep', 'next_deworming_due_date', True),
+    ('sheep', 'expected_lambing_date', True),
+    ('sheep_event', 'event_date', False),
+    ('sheep_historical_data', 'record_date', False),
+]
+
+def _normalize_date_strings(conn, table, column, nullable):
+    """
+    (私有) 以與 Excel 導入相同的規則 (date_utils.parse_date) 將文字日期統一為 'YYYY-MM-DD'。
+    只對非標準格式的不重複值逐一 UPDATE；允許 NULL 的欄位中無法解析的值改為 NULL，
+    不允許 NULL 的欄位若有無法解析的值則中止遷移，避免刪除資料。
+    """
+    col = table.c[column]
+    invalid = []
+    for value in conn.execute(db.select(col).where(col.is_not(None)).distinct()).scalars().all():
+        parsed = parse_date(value)
+        normalized = parsed.isoformat() if parsed else None
+        if normalized == value: continue
+        if normalized is None and not nullable:
+            invalid.append(value)
+            continue
+        conn.execute(db.update(table).where(col == value).values({column: normalized}))
+    if invalid:
+        raise RuntimeError(f"{table.name}.{column} 有 {len(invalid)} 種無法解析的日期值（例如 {invalid[:5]}），請修正後再啟動。")
+
+def _migration_002_native_date_columns(conn):
+    """
+    將日期欄位由 VARCHAR(50) 改為 DATE：先統一既有字串的格式，PostgreSQL 再以 ALTER COLUMN ... TYPE DATE 轉換。
+    SQLite 的 DATE 本身即以 'YYYY-MM-DD' 文字保存，只需統一格式。
+    全新資料庫由 create_all 直接建立 DATE 欄位，會被略過。
+    """
+    inspector = db.inspect(conn)
+    quote = conn.dialect.identifier_preparer.quote
+    for table_name, column_name, nullable in DATE_COLUMNS:
+        column_info = next(c for c in inspector.get_columns(table_name) if c['name'] == column_name)
+        if isinstance(column_info['type'], db.Date): continue
+        table = db.Table(table_name, db.MetaData(), autoload_with=conn)
+        _normalize_date_strings(conn, table, column_name, nullable)
+        if conn.dialect.name == 'postgresql':
+            conn.execute(db.text(
+                f"ALTER TABLE {quote(table_name)} ALTER COLUMN {quote(column_name)} TYPE DATE USING {quote(column_name)}::date"
+            ))
+
+def _migration_003_history_rollups(conn):
+    """
+    以既有的歷史數據回填 sheep_history_rollup（表格本身由 create_all 建立），逐一使用者處理以控制記憶體用量。
+    """
+    user_ids = conn.execute(db.select(SheepHistoricalData.user_id).distinct()).scalars().all()
+    for user_id in user_ids:
+        history_rollup.rebuild_user(user_id, executor=conn)
+
+def _migration_004_user_data_version(conn):
+    """為 user 表格加上 data_version 欄位（讀取 API 的 ETag 版本號）；全新資料庫已由 create_all 建立，會被略過。"""
+    if any(c['name'] == 'data_version' for c in db.inspect(conn).get_columns('user')): return
+    conn.execute(db.text('ALTER TABLE "user" ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0'))
+
+def _migration_005_job_worker(conn):
+    """為 job 表格加上 worker 欄位（執行工作的行程）；全新資料庫已由 create_all 建立，會被略過。"""
+    if any(c['name'] == 'worker' for c in db.inspect(conn).get_columns('job')): return
+    conn.execute(db.text('ALTER TABLE job ADD COLUMN worker VARCHAR(100)'))
+
+MIGRATIONS = [
+    (1, "hot query composite indexes", _migration_001_hot_query_indexes),
+    (2, "native DATE columns for sheep, event and history dates", _migration_002_native_date_columns),
+    (3, "backfill weekly / monthly history rollups", _migration_003_history_rollups),
+    (4, "per-user data version for conditional GET", _migration_004_user_data_version),
+    (5, "job worker process for orphaned job recovery", _migration_005_job_worker),
+]
+
+def run_migrations():
+    """套用所有尚未執行的遷移，返回本次套用的版本列表。需在應用程式上下文中調用。"""
+    table = SchemaMigration.__table__
+    applied = []
+    with db.engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(db.text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+        done = set(conn.execute(db.select(table.c.version)).scalars())
+        for version, description, migrate in MIGRATIONS:
+            if version in done: continue
+            migrate(conn)
+            conn.execute(db.insert(table).values(version=version, description=description, applied_at=datetime.utcnow()))
+            applied.append(version)
+    return applied
+
+# --- END OF FILE backend/app/migrations.py ---
\ No newline at end of file
@@ -1,10 +1,15 @@
 # --- START OF FILE backend/app/models.py ---
 
-from . import db, login_manager
+from . import db
+from .serializers import model_serializer
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from datetime import datetime
 
+def _columns_to_dict(obj):
+    """將模型的所有欄位轉為字典；DATE 欄位輸出 'YYYY-MM-DD' 字串，與改用 DATE 型別前的 API 格式相同。"""
+    return model_serializer(type(obj)).to_dict(obj)
+
 class User(UserMixin, db.Model):
     """
     使用者模型，儲存使用者帳號資訊。
@@ -13,19 +18,27 @@ class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
+    # 資料版本號：使用者的羊隻、事件、歷史數據或事件選項有任何寫入時遞增，供讀取 API 產生 ETag
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # 關聯：一個使用者可以擁有多筆羊隻、事件等資料
     # cascade="all, delete-orphan" 表示刪除使用者時，其所有關聯資料也將一併刪除
     sheep = db.relationship('Sheep', backref='owner', lazy='dynamic', cascade="all, delete-orphan")
     events = db.relationship('SheepEvent', backref='owner', lazy='dynamic', cascade="all, delete-orphan")
     chat_history = db.relationship('ChatHistory', backref='owner', lazy='dynamic', cascade="all, delete-orphan")
+    chat_sessions = db.relationship('ChatSession', backref='owner', lazy='dynamic', cascade="all, delete-orphan")
     event_type_options = db.relationship('EventTypeOption', backref='owner', lazy='dynamic', cascade="all, delete-orphan")
     event_description_options = db.relationship('EventDescriptionOption', backref='owner', lazy='dynamic', cascade="all, delete-orphan")
     historical_data = db.relationship('SheepHistoricalData', backref='owner', lazy='dynamic', cascade="all, delete-orphan")
+    history_rollups = db.relationship('SheepHistoryRollup', backref='owner', lazy='dynamic', cascade="all, delete-orphan")
+    dashboard_snapshot = db.relationship('DashboardSnapshot', backref='owner', uselist=False, cascade="all, delete-orphan")
+    jobs = db.relationship('Job', backref='owner', lazy='dynamic', cascade="all, delete-orphan")
 
     def set_password(self, password):
-        """設定使用者密碼，儲存為 hash 值。"""
-        self.password_hash = generate_password_hash(password)
+        """設定使用者密碼，儲存為 hash 值；演算法與參數取自 PASSWORD_HASH_METHOD / PASSWORD_SALT_LENGTH。"""
+        from .services.password_service import get_hash_params
+        method, salt_length = get_hash_params()
+        self.password_hash = generate_password_hash(password, method=method, salt_length=salt_length)
 
     def check_password(self, password):
         """核對輸入的密碼是否正確。"""
@@ -34,16 +47,12 @@ class User(UserMixin, db.Model):
     def __repr__(self):
         return f'<User {self.username}>'
 
-@login_manager.user_loader
-def load_user(user_id):
-    """Flask-Login 需要的回呼函數，用來根據 user_id 重新載入使用者物件。"""
-    return User.query.get(int(user_id))
-
 class EventTypeOption(db.Model):
     """
     儲存使用者自訂的事件類型選項。
     """
     __tablename__ = 'event_type_option'
+    __table_args__ = (db.Index('ix_event_type_option_user_name', 'user_id', 'name'),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -59,6 +68,10 @@ class EventDescriptionOption(db.Model):
     儲存使用者自訂的事件簡要描述選項，與 EventTypeOption 關聯。
     """
     __tablename__ = 'event_description_option'
+    __table_args__ = (
+        db.Index('ix_event_description_option_type_desc', 'event_type_option_id', 'description'),
+        db.Index('ix_event_description_option_user', 'user_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     event_type_option_id = db.Column(db.Integer, db.ForeignKey('event_type_option.id'), nullable=False)
@@ -81,7 +94,7 @@ class Sheep(db.Model):
     
     # 核心識別資料
     EarNum = db.Column(db.String(100), nullable=False)
-    BirthDate = db.Column(db.String(50))
+    BirthDate = db.Column(db.Date)
     Sex = db.Column(db.String(20))
     Breed = db.Column(db.String(100))
     
@@ -118,9 +131,9 @@ class Sheep(db.Model):
     # 備註與提醒
     other_remarks = db.Column(db.Text)
     agent_notes = db.Column(db.Text)
-    next_vaccination_due_date = db.Column(db.String(50))
-    next_deworming_due_date = db.Column(db.String(50))
-    expected_lambing_date = db.Column(db.String(50))
+    next_vaccination_due_date = db.Column(db.Date)
+    next_deworming_due_date = db.Column(db.Date)
+    expected_lambing_date = db.Column(db.Date)
     
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -129,11 +142,12 @@ class Sheep(db.Model):
     
     # 關聯：一隻羊可以有多筆歷史數據和事件記錄
     historical_data = db.relationship('SheepHistoricalData', backref='sheep', lazy='dynamic', cascade="all, delete-orphan")
+    history_rollups = db.relationship('SheepHistoryRollup', backref='sheep', lazy='dynamic', cascade="all, delete-orphan")
     events = db.relationship('SheepEvent', backref='sheep', lazy='dynamic', cascade="all, delete-orphan")
 
     def to_dict(self):
         """將模型物件轉換為字典，方便轉為 JSON。"""
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return _columns_to_dict(self)
 
     def __repr__(self):
         return f'<Sheep {self.EarNum} OwnerID:{self.user_id}>'
@@ -143,18 +157,22 @@ class SheepEvent(db.Model):
     羊隻事件日誌模型。
     """
     __tablename__ = 'sheep_event'
+    __table_args__ = (
+        db.Index('ix_sheep_event_sheep_date', 'sheep_id', 'event_date', 'id'), # 單隻羊的事件列表，依日期排序
+        db.Index('ix_sheep_event_user', 'user_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     sheep_id = db.Column(db.Integer, db.ForeignKey('sheep.id', ondelete='CASCADE'), nullable=False)
 
-    event_date = db.Column(db.String(50), nullable=False)
+    event_date = db.Column(db.Date, nullable=False)
     event_type = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     notes = db.Column(db.Text)
     recorded_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def to_dict(self):
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return _columns_to_dict(self)
 
     def __repr__(self):
         return f'<Event {self.event_type} for SheepID:{self.sheep_id}>'
@@ -164,27 +182,64 @@ class SheepHistoricalData(db.Model):
     儲存羊隻的歷史數值數據（如體重、產奶量）。
     """
     __tablename__ = 'sheep_historical_data'
+    __table_args__ = (
+        db.Index('ix_history_sheep_type_date', 'sheep_id', 'record_type', 'record_date'), # 趨勢圖與健康警示
+        db.Index('ix_history_user', 'user_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     sheep_id = db.Column(db.Integer, db.ForeignKey('sheep.id', ondelete='CASCADE'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
-    record_date = db.Column(db.String(50), nullable=False)
+    record_date = db.Column(db.Date, nullable=False)
     record_type = db.Column(db.String(100), nullable=False) # e.g., 'Body_Weight_kg'
     value = db.Column(db.Float, nullable=False)
     notes = db.Column(db.Text)
     recorded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return _columns_to_dict(self)
 
     def __repr__(self):
         return f'<HistoricalData {self.record_type}:{self.value} for SheepID:{self.sheep_id}>'
 
+class SheepHistoryRollup(db.Model):
+    """
+    歷史數據的週 / 月彙總，每個 (羊隻, 紀錄類型, 時間粒度, 區間起始日) 一列。
+    由 services/history_rollup.py 在寫入歷史數據時增量維護，供長期趨勢圖使用。
+    """
+    __tablename__ = 'sheep_history_rollup'
+    sheep_id = db.Column(db.Integer, db.ForeignKey('sheep.id', ondelete='CASCADE'), primary_key=True)
+    record_type = db.Column(db.String(100), primary_key=True)
+    resolution = db.Column(db.String(10), primary_key=True) # 'week' (週一起算) 或 'month'
+    bucket_start = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    min_value = db.Column(db.Float, nullable=False)
+    max_value = db.Column(db.Float, nullable=False)
+    sum_value = db.Column(db.Float, nullable=False) # 平均值 = sum_value / count，方便增量累加
+    count = db.Column(db.Integer, nullable=False)
+    last_value = db.Column(db.Float, nullable=False) # 區間內日期最晚的一筆
+    last_date = db.Column(db.Date, nullable=False)
+
+    def to_dict(self):
+        mean = self.sum_value / self.count
+        return {
+            'record_type': self.record_type, 'resolution': self.resolution,
+            'bucket_start': self.bucket_start.isoformat(), 'record_date': self.bucket_start.isoformat(),
+            'value': mean, 'mean': mean, 'min': self.min_value, 'max': self.max_value,
+            'count': self.count, 'last': self.last_value, 'last_date': self.last_date.isoformat()
+        }
+
+    def __repr__(self):
+        return f'<HistoryRollup {self.record_type}/{self.resolution}@{self.bucket_start} for SheepID:{self.sheep_id}>'
+
 class ChatHistory(db.Model):
     """
     AI 聊天歷史記錄模型。
     """
     __tablename__ = 'chat_history'
+    # 對話視窗查詢 (user_id, session_id) 並依 timestamp 取最近幾筆
+    __table_args__ = (db.Index('ix_chat_history_user_session_ts', 'user_id', 'session_id', 'timestamp'),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     session_id = db.Column(db.String(100), nullable=False)
@@ -196,4 +251,89 @@ class ChatHistory(db.Model):
     def __repr__(self):
         return f'<Chat {self.session_id} - {self.role}>'
 
+class ChatSession(db.Model):
+    """
+    對話階段的滾動摘要：較舊的訊息整合為 summary，之後只逐字帶入 summarized_until_id 之後的訊息。
+    """
+    __tablename__ = 'chat_session'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    session_id = db.Column(db.String(100), primary_key=True)
+    summary = db.Column(db.Text)
+    summarized_until_id = db.Column(db.Integer, default=0, nullable=False) # 已整合進摘要的最後一筆 ChatHistory.id
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ChatSession {self.session_id} until:{self.summarized_until_id}>'
+
+class DashboardSnapshot(db.Model):
+    """
+    每位使用者的儀表板快照。
+    寫入操作只會遞增 version，讀取時若 computed_version 落後或日期已變更才重新計算。
+    """
+    __tablename__ = 'dashboard_snapshot'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    payload = db.Column(db.JSON, nullable=False)
+    snapshot_date = db.Column(db.String(50), nullable=False) # 提醒事項依當天日期計算，跨日即失效
+    version = db.Column(db.Integer, default=0, nullable=False)
+    computed_version = db.Column(db.Integer, default=0, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def is_dirty(self):
+        return self.computed_version != self.version
+
+    def __repr__(self):
+        return f'<DashboardSnapshot UserID:{self.user_id} v{self.computed_version}/{self.version}>'
+
+class Job(db.Model):
+    """
+    背景工作（Excel 導入、匯出）的狀態、進度與結果。
+    """
+    __tablename__ = 'job'
+    id = db.Column(db.String(32), primary_key=True) # uuid4 hex
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False) # 'import' or 'export'
+    status = db.Column(db.String(20), nullable=False, default='pending') # pending / running / succeeded / failed
+    progress = db.Column(db.JSON) # sheets_done, sheets_total, rows_processed, rows_per_sec
+    result = db.Column(db.JSON) # 導入報告
+    result_path = db.Column(db.String(500)) # 匯出檔案的伺服器端路徑，不對外公開
+    error = db.Column(db.Text)
+    worker = db.Column(db.String(100)) # 執行工作的行程 "主機名稱:PID"，用於啟動時辨識中斷的工作
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'kind': self.kind, 'status': self.status, 'progress': self.progress or {},
+            'error': self.error, 'created_at': self.created_at, 'finished_at': self.finished_at,
+            'result_ready': self.status == 'succeeded'
+        }
+
+    def __repr__(self):
+        return f'<Job {self.kind}:{self.id} {self.status}>'
+
+class SchemaMigration(db.Model):
+    """
+    已套用的資料庫遷移版本，由 app/migrations.py 維護。
+    """
+    __tablename__ = 'schema_migration'
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SchemaMigration {self.version}>'
+
+class LlmCacheEntry(db.Model):
+    """
+    LLM 回應快取的資料庫層，供多個 worker 行程共用。
+    """
+    __tablename__ = 'llm_cache_entry'
+    key = db.Column(db.String(200), primary_key=True)
+    value = db.Column(db.JSON, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<LlmCacheEntry {self.key}>'
+
 # --- END OF FILE backend/app/models.py ---
\ No newline at end of file
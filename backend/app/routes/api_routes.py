@@ -1,10 +1,12 @@
 # --- START OF FILE backend/app/routes/api_routes.py ---
 
-from flask import Blueprint, request, jsonify, current_app, send_file
+from flask import Blueprint, request, jsonify, current_app, send_file, Response, stream_with_context
 from flask_login import login_required, current_user
-from ..services import sheep_service, user_service, data_service, ai_service
+from ..services import sheep_service, user_service, data_service, ai_service, job_service, data_version
 import markdown
-from datetime import datetime # <--- 修正處：補上這個 import
+import os
+import json
+from datetime import datetime, date # <--- 修正處：補上這個 import
 
 # 建立一個名為 'api' 的藍圖，並設定 URL 前綴為 /api
 bp = Blueprint('api', __name__, url_prefix='/api')
@@ -22,11 +24,57 @@ def handle_service_call(service_func, *args, **kwargs):
         current_app.logger.error(f"API Error in {service_func.__name__}: {e}")
         return jsonify({"error": "伺服器內部錯誤"}), 500
 
+# --- Helper for conditional GET (ETag / 304) ---
+def conditional_service_call(etag, service_func, *args, **kwargs):
+    """
+    etag 為目前資料版本產生的字串。若請求的 If-None-Match 與其相符，直接返回 304，
+    不調用服務層；否則照常調用 handle_service_call，並在成功的回應附上 ETag。
+    etag 為 None（例如找不到羊隻）時不做條件判斷。
+    """
+    if etag is None:
+        return handle_service_call(service_func, *args, **kwargs)
+    if is_not_modified(etag):
+        return with_etag(current_app.response_class(status=304), etag)
+    response = handle_service_call(service_func, *args, **kwargs)
+    return with_etag(response, etag) if getattr(response, 'status_code', None) == 200 else response
+
+def is_not_modified(etag):
+    """請求的 If-None-Match 是否與 etag 相符（GET 使用弱比較）。"""
+    return request.if_none_match.contains_weak(etag)
+
+def with_etag(response, etag):
+    """為回應附上 ETag；瀏覽器可保存回應，但每次使用前都必須以 If-None-Match 重新驗證。"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def user_etag(*extra):
+    """以目前使用者的資料版本號產生 ETag。"""
+    version = data_version.get_data_version(current_user.id)
+    return '-'.join(str(part) for part in ('u', current_user.id, version) + extra)
+
+def sheep_etag(ear_num):
+    """以羊隻的 id 與 last_updated 產生 ETag；找不到羊隻時返回 None。"""
+    found = data_version.get_sheep_version(current_user.id, ear_num)
+    if found is None: return None
+    sheep_id, last_updated = found
+    return f"s-{sheep_id}-{last_updated.timestamp() if last_updated else 0}"
+
 # --- Sheep (羊隻) API ---
 @bp.route('/sheep', methods=['GET'])
 @login_required
 def get_all_sheep():
-    return handle_service_call(sheep_service.get_all_sheep_by_user, current_user.id)
+    # ?all=1 保留舊版行為：一次返回所有羊隻的完整資料
+    if request.args.get('all') == '1':
+        return conditional_service_call(user_etag(), sheep_service.get_all_sheep_by_user, current_user.id)
+    # 分頁: ?cursor=&limit=&fields=EarNum,Breed,...&status=&Breed=&Sex=&FarmNum=（篩選值可用逗號分隔多個）
+    fields = request.args.get('fields')
+    filters = {name: request.args[name].split(',') for name in sheep_service.SHEEP_LIST_FILTERS if request.args.get(name)}
+    return conditional_service_call(
+        user_etag(), sheep_service.list_sheep_page, current_user.id,
+        cursor=request.args.get('cursor'), limit=request.args.get('limit'),
+        fields=fields.split(',') if fields else None, filters=filters
+    )
 
 @bp.route('/sheep', methods=['POST'])
 @login_required
@@ -44,9 +92,12 @@ def add_sheep():
 @bp.route('/sheep/<ear_num>', methods=['GET'])
 @login_required
 def get_sheep_details(ear_num):
+    etag = sheep_etag(ear_num)
+    if etag and is_not_modified(etag):
+        return with_etag(current_app.response_class(status=304), etag)
     details = sheep_service.get_sheep_details_by_ear_num(current_user.id, ear_num)
     if details:
-        return jsonify(details)
+        return with_etag(jsonify(details), etag)
     return jsonify({"error": "找不到該耳號的羊隻或您沒有權限"}), 404
 
 @bp.route('/sheep/<ear_num>', methods=['PUT'])
@@ -76,7 +127,7 @@ def delete_sheep(ear_num):
 @bp.route('/sheep/<ear_num>/events', methods=['GET'])
 @login_required
 def get_sheep_events(ear_num):
-    return handle_service_call(sheep_service.get_events_for_sheep, current_user.id, ear_num)
+    return conditional_service_call(sheep_etag(ear_num), sheep_service.get_events_for_sheep, current_user.id, ear_num)
 
 @bp.route('/sheep/<ear_num>/events', methods=['POST'])
 @login_required
@@ -91,6 +142,22 @@ def add_sheep_event(ear_num):
         current_app.logger.error(f"新增羊隻事件失敗: {e}")
         return jsonify({"error": "新增羊隻事件失敗"}), 500
 
+@bp.route('/sheep/batch_update', methods=['POST'])
+@login_required
+def batch_update_sheep():
+    """批次更新多隻羊，請求主體為項目列表或 {"items": [...]}，返回每一項的結果。"""
+    return handle_service_call(sheep_service.batch_update_sheep, current_user.id, _batch_items(request.get_json()))
+
+@bp.route('/sheep/batch_events', methods=['POST'])
+@login_required
+def batch_add_sheep_events():
+    """批次記錄事件，請求主體為 [{"EarNum", "event": {...}}] 或 {"items": [...]}，返回每一項的結果。"""
+    return handle_service_call(sheep_service.batch_add_sheep_events, current_user.id, _batch_items(request.get_json()))
+
+def _batch_items(payload):
+    """(私有) 批次 API 接受直接的列表，或以 items 包裝的物件。"""
+    return payload.get('items') if isinstance(payload, dict) else payload
+
 @bp.route('/events/<int:event_id>', methods=['PUT'])
 @login_required
 def update_event(event_id):
@@ -111,7 +178,12 @@ def delete_event(event_id):
 @bp.route('/event_options', methods=['GET'])
 @login_required
 def get_event_options():
-    return handle_service_call(user_service.get_all_event_options, current_user.id)
+    # ETag 為選項內容的版本標籤，只有事件選項本身變更時才會改變
+    options_data, tag = user_service.get_event_options_with_version(current_user.id)
+    etag = f"opts-{tag}"
+    if is_not_modified(etag):
+        return with_etag(current_app.response_class(status=304), etag)
+    return with_etag(jsonify(options_data), etag)
 
 @bp.route('/event_types', methods=['POST'])
 @login_required
@@ -145,7 +217,12 @@ def delete_event_description(option_id):
 @bp.route('/sheep/<ear_num>/history', methods=['GET'])
 @login_required
 def get_sheep_history(ear_num):
-    return handle_service_call(sheep_service.get_history_for_sheep, current_user.id, ear_num)
+    # ?resolution=raw|week|month&from=YYYY-MM-DD&to=YYYY-MM-DD
+    return conditional_service_call(
+        sheep_etag(ear_num), sheep_service.get_history_for_sheep, current_user.id, ear_num,
+        resolution=request.args.get('resolution', 'raw'),
+        date_from=request.args.get('from'), date_to=request.args.get('to')
+    )
 
 @bp.route('/history/<int:record_id>', methods=['DELETE'])
 @login_required
@@ -161,12 +238,17 @@ def delete_sheep_history(record_id):
 @bp.route('/data/export_excel', methods=['GET'])
 @login_required
 def export_excel():
+    # ?async=1 時改為建立背景工作，立即返回工作 ID
+    if request.args.get('async') == '1':
+        job_id = job_service.submit_export_job(current_user.id)
+        return jsonify({"success": True, "job_id": job_id}), 202
     try:
-        excel_binary = data_service.export_user_data_to_excel(current_user.id)
+        # 暫存檔由 send_file 分段串流給客戶端，傳送完畢後自動關閉
+        excel_file = data_service.export_user_data_to_excel(current_user.id)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"goat_data_export_{timestamp}.xlsx"
         return send_file(
-            excel_binary,
+            excel_file,
             as_attachment=True,
             download_name=filename,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
@@ -198,6 +280,14 @@ def process_import():
     is_default_mode = request.form.get('is_default_mode', 'false').lower() == 'true'
     mapping_config_str = request.form.get('mapping_config', '{}')
 
+    if request.form.get('async', 'false').lower() == 'true':
+        try:
+            job_id = job_service.submit_import_job(current_user.id, file.stream, mapping_config_str, is_default_mode)
+            return jsonify({"success": True, "job_id": job_id}), 202
+        except Exception as e:
+            current_app.logger.error(f"建立導入工作失敗: {e}")
+            return jsonify({"error": f"建立導入工作失敗: {str(e)}"}), 500
+
     try:
         report_details = data_service.import_data_from_excel(
             current_user.id, file.stream, mapping_config_str, is_default_mode
@@ -207,11 +297,48 @@ def process_import():
         current_app.logger.error(f"導入 Excel 數據失敗: {e}")
         return jsonify({"error": f"導入數據過程中發生錯誤: {str(e)}"}), 500
 
+# --- Background Jobs API ---
+@bp.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job_status(job_id):
+    job_status = job_service.get_job_status(current_user.id, job_id)
+    if not job_status:
+        return jsonify({"error": "找不到該工作"}), 404
+    return jsonify(job_status)
+
+@bp.route('/jobs/<job_id>/result', methods=['GET'])
+@login_required
+def get_job_result(job_id):
+    job = job_service.get_job(current_user.id, job_id)
+    if not job:
+        return jsonify({"error": "找不到該工作"}), 404
+    if job.status == 'failed':
+        return jsonify({"error": job.error}), 500
+    if job.status != 'succeeded':
+        return jsonify({"error": "工作尚未完成", "status": job.status}), 409
+
+    if job.kind == 'export':
+        if not job.result_path or not os.path.exists(job.result_path):
+            return jsonify({"error": "匯出檔案已過期，請重新匯出"}), 410
+        filename = f"goat_data_export_{job.created_at.strftime('%Y%m%d_%H%M%S')}.xlsx"
+        return send_file(
+            job.result_path,
+            as_attachment=True,
+            download_name=filename,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    return jsonify({"success": True, "message": "數據導入已成功完成！", "details": job.result})
+
 # --- Dashboard API ---
 @bp.route('/dashboard_data', methods=['GET'])
 @login_required
 def get_dashboard_data():
-    return handle_service_call(sheep_service.get_dashboard_data, current_user.id)
+    # ?fresh=1 會略過快照，強制重新計算
+    fresh = request.args.get('fresh') == '1'
+    if fresh:
+        return handle_service_call(sheep_service.get_dashboard_snapshot, current_user.id, fresh=True)
+    # 提醒與健康警示依當天日期計算，ETag 需包含日期
+    return conditional_service_call(user_etag(date.today().isoformat()), sheep_service.get_dashboard_snapshot, current_user.id)
 
 # --- AI Agent API ---
 @bp.route('/agent_tip', methods=['GET'])
@@ -224,8 +351,7 @@ def get_agent_tip():
     if "error" in result:
         return jsonify({"error": result['error']}), 500
     
-    tip_html = markdown.markdown(result.get("text", "無法獲取提示。"), extensions=['nl2br'])
-    return jsonify({"tip_html": tip_html})
+    return jsonify({"tip_html": result["tip_html"]})
 
 @bp.route('/recommendation', methods=['POST'])
 @login_required
@@ -268,5 +394,52 @@ def chat_with_agent():
     reply_html = markdown.markdown(model_reply_text, extensions=['fenced_code', 'tables', 'nl2br'])
     return jsonify({"reply_html": reply_html})
 
+@bp.route('/chat_with_agent/stream', methods=['POST'])
+@login_required
+def chat_with_agent_stream():
+    """
+    串流版的 AI 對話，以 Server-Sent Events 逐段回傳：
+    - `data: {"text": ...}` 為回覆片段
+    - `event: done` 附帶完整回覆的 reply_html，回覆完成後才寫入聊天記錄
+    - `event: error` 附帶錯誤訊息
+    """
+    data = request.get_json()
+    api_key = data.get('api_key')
+    user_message = data.get('message')
+    session_id = data.get('session_id')
+    ear_num_context = data.get('ear_num_context')
+
+    if not all([api_key, user_message, session_id]):
+        return jsonify({"error": "缺少必要參數"}), 400
+
+    user_id = current_user.id
+
+    def sse(payload, event=None):
+        prefix = f"event: {event}\n" if event else ""
+        return f"{prefix}data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    def generate():
+        reply_parts = []
+        for chunk in ai_service.stream_chat_response(api_key, user_id, session_id, user_message, ear_num_context):
+            if "error" in chunk:
+                yield sse({"error": chunk["error"]}, event="error")
+                return
+            reply_parts.append(chunk["text"])
+            yield sse({"text": chunk["text"]})
+
+        model_reply_text = "".join(reply_parts) or "抱歉，我暫時無法回答。"
+        try:
+            sheep_service.save_chat_messages(user_id, session_id, ear_num_context, user_message, model_reply_text)
+        except Exception as e:
+            current_app.logger.error(f"儲存聊天記錄失敗: {e}")
+        reply_html = markdown.markdown(model_reply_text, extensions=['fenced_code', 'tables', 'nl2br'])
+        yield sse({"reply_html": reply_html}, event="done")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'} # 避免反向代理緩衝 SSE
+    )
+
 
 # --- END OF FILE backend/app/routes/api_routes.py ---
\ No newline at end of file
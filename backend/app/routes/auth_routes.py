@@ -2,7 +2,8 @@
 
 from flask import Blueprint, render_template, request, jsonify, url_for, redirect, flash
 from flask_login import login_user, logout_user, current_user, login_required
-from ..services import user_service
+from ..services import user_service, auth_service
+from ..services.password_service import PasswordHashBusy
 
 # 【修正】為所有認證路由統一加上 /api/auth 前綴
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -18,7 +19,10 @@ def login_api():
     username = data.get('username')
     password = data.get('password')
     
-    user = user_service.authenticate_user(username, password)
+    try:
+        user = user_service.authenticate_user(username, password)
+    except PasswordHashBusy as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
     
     if user:
         login_user(user, remember=True)
@@ -43,6 +47,8 @@ def register_api():
         return jsonify({'success': True, 'user': {'username': new_user.username}}), 201
     except ValueError as e:
         return jsonify({'success': False, 'message': str(e)}), 409
+    except PasswordHashBusy as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
     except Exception as e:
         return jsonify({'success': False, 'message': f'註冊過程中發生未知錯誤'}), 500
 
@@ -51,9 +57,35 @@ def register_api():
 @login_required
 def logout_api():
     """處理使用者登出的 API 請求。"""
+    user_id = current_user.id
     logout_user()
+    auth_service.invalidate_user(user_id)
     return jsonify({'success': True, 'message': '您已成功登出'})
 
+# 現在的完整路徑是: POST /api/auth/password
+@bp.route('/password', methods=['POST'])
+@login_required
+def change_password_api():
+    """處理變更密碼的 API 請求。"""
+    data = request.get_json()
+    try:
+        user_service.change_password(current_user.id, data.get('current_password'), data.get('new_password'))
+        return jsonify({'success': True, 'message': '密碼已變更'})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except PasswordHashBusy as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+
+# 現在的完整路徑是: POST /api/auth/token
+@bp.route('/token', methods=['POST'])
+@login_required
+def issue_token_api():
+    """為已登入的使用者簽發 /api 使用的 Bearer token（需啟用 API_TOKEN_AUTH）。"""
+    if not auth_service.api_token_enabled():
+        return jsonify({'success': False, 'message': '未啟用 API token 驗證'}), 404
+    token, expires_in = auth_service.issue_api_token(current_user)
+    return jsonify({'success': True, 'token': token, 'expires_in': expires_in})
+
 # 現在的完整路徑是: GET /api/auth/status
 @bp.route('/status', methods=['GET'])
 def auth_status():
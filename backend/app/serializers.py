@@ -0,0 +1,114 @@
+# --- START OF FILE backend/app/serializers.py ---
+
+"""
+序列化層：預先編譯的模型列序列化器，以及以 orjson 實作的 Flask JSON provider。
+
+列表類 API 以 RowSerializer.select() 取得 Core 查詢，直接把結果 tuple 轉為字典，
+不建立 ORM 物件；單一物件的 to_dict 也共用同一份欄位清單，輸出格式完全相同。
+"""
+
+from operator import attrgetter
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Date
+
+from . import db
+
+try:
+    import orjson
+except ImportError: # 未安裝 orjson 時沿用 Flask 預設的 JSON provider
+    orjson = None
+
+class RowSerializer:
+    """
+    單一模型（及欄位子集）的序列化器。欄位名稱、屬性存取器與需要轉為 'YYYY-MM-DD' 的
+    DATE 欄位位置在建立時計算一次，之後每列只做 zip 與少數 isoformat 呼叫。
+    """
+
+    def __init__(self, model, fields=None):
+        table_columns = model.__table__.columns
+        self.columns = [table_columns[name] for name in fields] if fields else list(table_columns)
+        self.names = tuple(c.name for c in self.columns)
+        self.date_names = tuple(c.name for c in self.columns if isinstance(c.type, Date))
+        getter = attrgetter(*self.names)
+        self._values = getter if len(self.names) > 1 else lambda obj: (getter(obj),)
+
+    def select(self):
+        """返回只查詢這些欄位的 SELECT 語句，可再串接 where / order_by / limit。"""
+        return db.select(*self.columns)
+
+    def row_to_dict(self, row):
+        """將 Core 查詢返回的一列（tuple）轉為字典。"""
+        data = dict(zip(self.names, row))
+        for name in self.date_names:
+            value = data[name]
+            if value is not None: data[name] = value.isoformat()
+        return data
+
+    def rows_to_dicts(self, rows):
+        """將多列轉為字典列表。"""
+        return [self.row_to_dict(row) for row in rows]
+
+    def fetch_all(self, statement):
+        """執行 select() 衍生的語句並返回字典列表。"""
+        return self.rows_to_dicts(db.session.execute(statement))
+
+    def to_dict(self, obj):
+        """將 ORM 物件轉為字典，與 row_to_dict 輸出相同。"""
+        return self.row_to_dict(self._values(obj))
+
+_serializers = {}
+
+def model_serializer(model, fields=None):
+    """
+    取得（並快取）模型的 RowSerializer。fields 為欄位名稱序列，None 表示所有欄位；
+    呼叫端需先驗證欄位名稱。
+    """
+    key = (model, tuple(fields) if fields else None)
+    serializer = _serializers.get(key)
+    if serializer is None:
+        serializer = _serializers[key] = RowSerializer(model, fields)
+    return serializer
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    以 orjson 編碼與解析 JSON。date / datetime 仍交給 Flask 預設的處理方式（HTTP 日期格式），
+    與原本 jsonify 的輸出相容；numpy 純量（pandas 分析結果）照常輸出為數字。
+    帶有其他參數（例如 indent）的呼叫，或 orjson 無法處理的值（例如超過 64 位元的整數），回退至標準函式庫。
+    """
+
+    def _options(self):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys: options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def _response_options(self):
+        options = self._options() | orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False: options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if kwargs: return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+        except orjson.JSONEncodeError:
+            return super().dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs: return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = orjson.dumps(obj, default=self.default, option=self._response_options())
+        except orjson.JSONEncodeError:
+            return super().response(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+def init_json_provider(app):
+    """若已安裝 orjson，將 app 的 JSON provider 換成 OrjsonProvider。"""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
+
+# --- END OF FILE backend/app/serializers.py ---
\ No newline at end of file
@@ -2,11 +2,18 @@
 
 import requests
 import json
-from datetime import datetime
-from ..models import ChatHistory, SheepHistoricalData
-from . import sheep_service
+import markdown
+from datetime import datetime, date
+from . import chat_memory
+from .gemini_client import get_gemini_client
+from .llm_cache import get_llm_cache, hash_api_key
+from .sheep_context import build_sheep_context
 
-def call_gemini_api(prompt_text_or_messages, api_key, generation_config_override=None):
+GEMINI_MODEL_NAME = "gemini-2.5-flash"
+CHAT_SYSTEM_PROMPT = "你是一位名叫『領頭羊博士』的AI羊隻飼養代理人，你非常了解台灣的氣候和常見飼養方式。請友善且專業地回答使用者的問題。"
+CHAT_SUMMARY_MAX_CHARS = 800
+
+def call_gemini_api(prompt_text_or_messages, api_key, generation_config_override=None, system_instruction=None):
     """
     通用的 Gemini API 調用函數。
 
@@ -14,47 +21,16 @@ def call_gemini_api(prompt_text_or_messages, api_key, generation_config_override
         prompt_text_or_messages (str or list): 可以是單一的字串提示，或是多輪對話的訊息列表。
         api_key (str): 使用者的 Gemini API 金鑰。
         generation_config_override (dict, optional): 用於覆蓋預設生成設定的字典。
+        system_instruction (str, optional): 以 systemInstruction 欄位送出的系統指示。
 
     Returns:
         dict: 包含 'text'、'error' 或其他 API 回應資訊的字典。
     """
-    GEMINI_MODEL_NAME = "gemini-2.5-flash"
-    GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL_NAME}:generateContent?key={api_key}"
-    
-    generation_config = {
-        "temperature": 0.4, 
-        "topK": 1, 
-        "topP": 0.95, 
-        "maxOutputTokens": 8192,
-    }
-    if generation_config_override: 
-        generation_config.update(generation_config_override)
-
-    safety_settings = [
-        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-    ]
-    
-    # 根據輸入類型組合 payload
-    payload_contents = []
-    if isinstance(prompt_text_or_messages, str):
-        payload_contents.append({"role": "user", "parts": [{"text": prompt_text_or_messages}]})
-    elif isinstance(prompt_text_or_messages, list):
-        payload_contents = prompt_text_or_messages
-
-    payload = {
-        "contents": payload_contents,
-        "generationConfig": generation_config,
-        "safetySettings": safety_settings
-    }
-    headers = {'Content-Type': 'application/json'}
+    payload = _build_gemini_payload(prompt_text_or_messages, generation_config_override, system_instruction)
 
     try:
-        response = requests.post(GEMINI_API_URL, headers=headers, data=json.dumps(payload), timeout=180)
-        response.raise_for_status()
-        result_json = response.json()
+        # 透過共用連線池的客戶端呼叫，內含併發限制與 429/5xx 重試
+        result_json = get_gemini_client().generate_content(GEMINI_MODEL_NAME, api_key, payload)
 
         if result_json.get("candidates"):
             candidate = result_json["candidates"][0]
@@ -68,21 +44,41 @@ def call_gemini_api(prompt_text_or_messages, api_key, generation_config_override
             return {"error": "API 回應格式不符合預期。", "raw_response": result_json}
 
     except requests.exceptions.HTTPError as e:
-        error_message = f"API 請求失敗 (HTTP 狀態碼: {e.response.status_code})"
-        try:
-            error_detail = e.response.json()
-            api_error_msg = error_detail.get("error", {}).get("message", "請檢查您的 API 金鑰是否有效或額度是否足夠。")
-            error_message += f": {api_error_msg}"
-        except (ValueError, json.JSONDecodeError):
-            error_message += f": {e.response.text}"
-        return {"error": error_message}
+        return {"error": _http_error_message(e)}
     except requests.exceptions.RequestException as e:
         return {"error": f"網路或請求錯誤: {e}"}
 
 
+def stream_gemini_api(prompt_text_or_messages, api_key, generation_config_override=None, system_instruction=None):
+    """
+    以 streamGenerateContent (SSE) 模式調用 Gemini API，逐段產生回覆。
+
+    Yields:
+        dict: 每段回覆為 {'text': ...}；發生錯誤時產生一個 {'error': ...} 後結束。
+    """
+    payload = _build_gemini_payload(prompt_text_or_messages, generation_config_override, system_instruction)
+    try:
+        for chunk in get_gemini_client().stream_generate_content(GEMINI_MODEL_NAME, api_key, payload):
+            if chunk.get("candidates"):
+                parts = chunk["candidates"][0].get("content", {}).get("parts", [])
+                text_content = "".join(part.get("text", "") for part in parts)
+                if text_content:
+                    yield {"text": text_content}
+            elif chunk.get("promptFeedback", {}).get("blockReason"):
+                yield {"error": f"提示詞被 Gemini 系統拒絕。原因：{chunk['promptFeedback']['blockReason']}。"}
+                return
+    except requests.exceptions.HTTPError as e:
+        yield {"error": _http_error_message(e)}
+    except requests.exceptions.RequestException as e:
+        yield {"error": f"網路或請求錯誤: {e}"}
+    except ValueError:
+        yield {"error": "API 串流回應格式不符合預期。"}
+
+
 def get_daily_tip(api_key):
     """
     獲取每日飼養小提示。
+    提示只依當前季節而定，因此以 (季節, 日期, API 金鑰雜湊) 為鍵快取已轉換好的 HTML。
     
     Returns:
         dict: 包含 'tip_html' 或 'error' 的字典。
@@ -93,12 +89,18 @@ def get_daily_tip(api_key):
     elif current_month in [9, 10, 11]: season = "秋季"
     else: season = "冬季"
     
-    prompt = (
-        f"作為『領頭羊博士』，請給我一條關於台灣當前「{season}」的實用山羊飼養小提示。"
-        "內容需簡短且易懂，請使用 Markdown 格式，並將重點字詞用 `**` 包裹起來。"
-    )
-    
-    return call_gemini_api(prompt, api_key, generation_config_override={"temperature": 0.7})
+    def generate_tip():
+        prompt = (
+            f"作為『領頭羊博士』，請給我一條關於台灣當前「{season}」的實用山羊飼養小提示。"
+            "內容需簡短且易懂，請使用 Markdown 格式，並將重點字詞用 `**` 包裹起來。"
+        )
+        result = call_gemini_api(prompt, api_key, generation_config_override={"temperature": 0.7})
+        if "error" in result:
+            return result
+        return {"tip_html": markdown.markdown(result.get("text", "無法獲取提示。"), extensions=['nl2br'])}
+
+    cache_key = f"daily_tip:{season}:{date.today().isoformat()}:{hash_api_key(api_key)}"
+    return get_llm_cache().get_or_compute(cache_key, generate_tip)
 
 
 def get_feeding_recommendation(api_key, user_id, form_data):
@@ -106,7 +108,7 @@ def get_feeding_recommendation(api_key, user_id, form_data):
     根據使用者提供的羊隻數據，產生飼養建議。
     """
     ear_num = form_data.get('EarNum')
-    context_str = _build_sheep_context_string(user_id, ear_num)
+    context_str = build_sheep_context(user_id, ear_num)
     prompt = _build_recommendation_prompt(form_data, context_str)
     
     return call_gemini_api(prompt, api_key)
@@ -116,61 +118,114 @@ def get_chat_response(api_key, user_id, session_id, user_message, ear_num_contex
     """
     處理與 AI 助手的多輪對話。
     """
-    history = ChatHistory.query.filter_by(
-        user_id=user_id, 
-        session_id=session_id
-    ).order_by(ChatHistory.timestamp.asc()).limit(20).all()
-    
-    chat_messages = _build_chat_history_for_api(history)
-    
-    sheep_context_str = _build_sheep_context_string(user_id, ear_num_context)
-    
-    current_user_message_with_context = user_message + sheep_context_str
-    chat_messages.append({"role": "user", "parts": [{"text": current_user_message_with_context}]})
-    
-    return call_gemini_api(chat_messages, api_key, generation_config_override={"temperature": 0.7})
+    system_instruction, chat_messages = _build_chat_messages(api_key, user_id, session_id, user_message, ear_num_context)
+    return call_gemini_api(chat_messages, api_key, generation_config_override={"temperature": 0.7}, system_instruction=system_instruction)
+
+
+def stream_chat_response(api_key, user_id, session_id, user_message, ear_num_context):
+    """
+    與 get_chat_response 相同的多輪對話，但以串流方式逐段產生回覆，格式同 stream_gemini_api。
+    """
+    system_instruction, chat_messages = _build_chat_messages(api_key, user_id, session_id, user_message, ear_num_context)
+    yield from stream_gemini_api(chat_messages, api_key, generation_config_override={"temperature": 0.7}, system_instruction=system_instruction)
 
 
 # --- Private Helper Functions ---
 
-def _build_sheep_context_string(user_id, ear_num):
+def _build_gemini_payload(prompt_text_or_messages, generation_config_override=None, system_instruction=None):
     """
-    (私有) 根據耳號組合羊隻背景資料字串，用於豐富提示詞。
+    (私有) 組合 generateContent / streamGenerateContent 共用的請求內容。
     """
-    if not ear_num:
-        return ""
+    generation_config = {
+        "temperature": 0.4, 
+        "topK": 1, 
+        "topP": 0.95, 
+        "maxOutputTokens": 8192,
+    }
+    if generation_config_override: 
+        generation_config.update(generation_config_override)
+
+    safety_settings = [
+        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    ]
     
-    sheep_info = sheep_service.get_sheep_details_by_ear_num(user_id, ear_num)
-    if not sheep_info:
-        return ""
-
-    context_parts = [f"\n\n--- 關於耳號 {sheep_info['EarNum']} 的額外背景資料 ---"]
-    if sheep_info.get('agent_notes'):
-        context_parts.append(f"我的觀察筆記: {sheep_info['agent_notes']}")
-
-    history_records = SheepHistoricalData.query.filter_by(
-        sheep_id=sheep_info['id'], user_id=user_id
-    ).order_by(SheepHistoricalData.record_date.desc()).limit(10).all()
-
-    if history_records:
-        history_by_type = {}
-        for rec in reversed(history_records):
-            rec_type = rec.record_type
-            if rec_type not in history_by_type:
-                history_by_type[rec_type] = []
-            history_by_type[rec_type].append(f"{rec.record_date}({rec.value})")
-        
-        context_parts.append("歷史數據趨勢:")
-        for rec_type, values_str in history_by_type.items():
-            context_parts.append(f"- {rec_type}: {', '.join(values_str)}")
+    # 根據輸入類型組合 payload
+    payload_contents = []
+    if isinstance(prompt_text_or_messages, str):
+        payload_contents.append({"role": "user", "parts": [{"text": prompt_text_or_messages}]})
+    elif isinstance(prompt_text_or_messages, list):
+        payload_contents = prompt_text_or_messages
 
-    if sheep_info.get('events'):
-        context_parts.append("近期事件:")
-        for event in sheep_info['events'][:5]: # 最多顯示 5 筆
-            desc = event.get('description') or '無描述'
-            context_parts.append(f"- {event['event_date']} {event['event_type']}: {desc}")
-            
-    return "\n".join(context_parts)
+    payload = {
+        "contents": payload_contents,
+        "generationConfig": generation_config,
+        "safetySettings": safety_settings
+    }
+    if system_instruction:
+        payload["systemInstruction"] = {"parts": [{"text": system_instruction}]}
+    return payload
+
+
+def _http_error_message(e):
+    """
+    (私有) 將 Gemini API 的 HTTPError 轉換為給使用者看的錯誤訊息。
+    """
+    error_message = f"API 請求失敗 (HTTP 狀態碼: {e.response.status_code})"
+    try:
+        error_detail = e.response.json()
+        api_error_msg = error_detail.get("error", {}).get("message", "請檢查您的 API 金鑰是否有效或額度是否足夠。")
+        error_message += f": {api_error_msg}"
+    except (ValueError, json.JSONDecodeError):
+        error_message += f": {e.response.text}"
+    return error_message
+
+
+def _build_chat_messages(api_key, user_id, session_id, user_message, ear_num_context):
+    """
+    (私有) 組合多輪對話：系統指示 (含先前對話摘要) + 最近幾輪逐字記錄 + 附帶羊隻背景資料的本次訊息。
+
+    Returns:
+        tuple: (system_instruction, 訊息列表)
+    """
+    summary, messages = chat_memory.load_conversation(user_id, session_id)
+
+    to_summarize = chat_memory.messages_to_summarize(messages)
+    if to_summarize:
+        new_summary = _summarize_chat(api_key, summary, to_summarize)
+        if new_summary:
+            chat_memory.save_summary(user_id, session_id, new_summary, to_summarize[-1].id)
+            summary = new_summary
+            messages = messages[len(to_summarize):]
+
+    system_instruction = CHAT_SYSTEM_PROMPT
+    if summary:
+        system_instruction += f"\n\n以下是與使用者先前對話的摘要：\n{summary}"
+
+    current_user_message_with_context = user_message + build_sheep_context(user_id, ear_num_context)
+    messages = chat_memory.fit_to_budget(messages, len(system_instruction) + len(current_user_message_with_context))
+
+    chat_messages = [{"role": m.role, "parts": [{"text": m.content}]} for m in messages]
+    chat_messages.append({"role": "user", "parts": [{"text": current_user_message_with_context}]})
+    return system_instruction, chat_messages
+
+
+def _summarize_chat(api_key, summary, messages):
+    """
+    (私有) 將既有摘要與一段較舊的對話整合成新的摘要；失敗時返回 None，下次再試。
+    """
+    transcript = "\n".join(f"{'使用者' if m.role == 'user' else '領頭羊博士'}: {m.content}" for m in messages)
+    prompt = (
+        "請將以下「既有摘要」與「新對話」整合成一份新的對話摘要，"
+        f"保留使用者的羊隻狀況、已提供的建議與尚未解決的問題，以繁體中文條列，不超過 {CHAT_SUMMARY_MAX_CHARS} 字。\n\n"
+        f"--- 既有摘要 ---\n{summary or '（無）'}\n\n--- 新對話 ---\n{transcript}"
+    )
+    result = call_gemini_api(prompt, api_key, generation_config_override={"temperature": 0.2})
+    if "error" in result or not result.get("text"):
+        return None
+    return result["text"][:CHAT_SUMMARY_MAX_CHARS * 2]
 
 
 def _build_recommendation_prompt(form_data, context_str):
@@ -223,19 +278,4 @@ def _build_recommendation_prompt(form_data, context_str):
     return full_prompt
 
 
-def _build_chat_history_for_api(history_from_db):
-    """
-    (私有) 將資料庫中的聊天記錄轉換為 API 需要的格式。
-    """
-    system_prompt = "你是一位名叫『領頭羊博士』的AI羊隻飼養代理人，你非常了解台灣的氣候和常見飼養方式。請友善且專業地回答使用者的問題。"
-    
-    messages = [
-        {"role": "user", "parts": [{"text": system_prompt}]},
-        {"role": "model", "parts": [{"text": "是的，領頭羊博士在此為您服務。請問有什麼問題嗎？"}]}
-    ]
-    for entry in history_from_db:
-        messages.append({"role": entry.role, "parts": [{"text": entry.content}]})
-        
-    return messages
-
 # --- END OF FILE backend/app/services/ai_service.py ---
\ No newline at end of file
@@ -0,0 +1,102 @@
+# --- START OF FILE backend/app/services/auth_service.py ---
+
+"""
+登入使用者的載入方式：
+
+- Session（預設）：Flask-Login 的 user_loader 依 session 中的使用者 id 載入使用者，
+  結果以短 TTL 的行程內快取保存（LOGIN_USER_CACHE_TTL 秒，設為 0 停用），登出與變更密碼時清除。
+- 簽章 token（選用，API_TOKEN_AUTH=True 時啟用）：/api 藍圖的請求可帶
+  `Authorization: Bearer <token>`，token 以 SECRET_KEY 簽章並包含使用者 id 與名稱，
+  驗證時不查詢資料庫。token 無法個別撤銷，有效期限由 API_TOKEN_MAX_AGE（秒）控制。
+"""
+
+from flask import current_app, jsonify
+from flask_login import UserMixin
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from .. import db, login_manager
+from ..models import User
+from .llm_cache import TTLCache
+
+API_TOKEN_SALT = 'api-token'
+
+class AuthenticatedUser(UserMixin):
+    """current_user 使用的輕量使用者物件，只保存 API 需要的欄位，可安全地跨請求快取。"""
+
+    def __init__(self, user_id, username):
+        self.id = user_id
+        self.username = username
+
+    def __repr__(self):
+        return f'<AuthenticatedUser {self.username}>'
+
+def get_user_cache():
+    """返回目前應用程式共用的使用者快取，第一次呼叫時依設定建立。"""
+    cache = current_app.extensions.get('login_user_cache')
+    if cache is None:
+        config = current_app.config
+        cache = current_app.extensions.setdefault('login_user_cache', TTLCache(
+            maxsize=config.get('LOGIN_USER_CACHE_MAXSIZE', 4096),
+            ttl=config.get('LOGIN_USER_CACHE_TTL', 30),
+        ))
+    return cache
+
+@login_manager.user_loader
+def load_user(user_id):
+    """Flask-Login 需要的回呼函數，用來根據 user_id 重新載入使用者物件；快取命中時不查詢資料庫。"""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    use_cache = current_app.config.get('LOGIN_USER_CACHE_TTL', 30) > 0
+    user = get_user_cache().get(user_id) if use_cache else None
+    if user is None:
+        row = db.session.execute(db.select(User.id, User.username).where(User.id == user_id)).first()
+        if row is None: return None
+        user = AuthenticatedUser(row.id, row.username)
+        if use_cache: get_user_cache().set(user_id, user)
+    return user
+
+def invalidate_user(user_id):
+    """清除使用者的快取項目，下次請求時重新查詢資料庫。"""
+    get_user_cache().delete(int(user_id))
+
+def api_token_enabled():
+    return bool(current_app.config.get('API_TOKEN_AUTH', False))
+
+def issue_api_token(user):
+    """為使用者簽發 API token，返回 (token, 有效秒數)。"""
+    return _token_serializer().dumps({"uid": user.id, "name": user.username}), _token_max_age()
+
+@login_manager.request_loader
+def load_user_from_request(req):
+    """
+    Flask-Login 的 request_loader：session 中沒有登入資訊時，驗證 /api 藍圖請求的 Bearer token。
+    簽章無效或已過期時返回 None（視為未登入）。
+    """
+    if not api_token_enabled() or req.blueprint != 'api':
+        return None
+    scheme, _, token = req.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    try:
+        data = _token_serializer().loads(token, max_age=_token_max_age())
+        return AuthenticatedUser(int(data['uid']), data['name'])
+    except (BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+@login_manager.unauthorized_handler
+def unauthorized():
+    """未登入或 token 無效時返回 401 JSON（login_view 指向的 auth.login 端點並不存在，原本會造成 500）。"""
+    return jsonify({"error": "請先登入"}), 401
+
+# --- Private Helper Functions ---
+
+def _token_serializer():
+    """(私有) 以 SECRET_KEY 建立 token 的簽章器。"""
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=API_TOKEN_SALT)
+
+def _token_max_age():
+    """(私有) token 的有效秒數。"""
+    return current_app.config.get('API_TOKEN_MAX_AGE', 3600)
+
+# --- END OF FILE backend/app/services/auth_service.py ---
\ No newline at end of file
@@ -0,0 +1,76 @@
+# --- START OF FILE backend/app/services/chat_memory.py ---
+
+from flask import current_app
+from .. import db
+from ..models import ChatHistory, ChatSession
+
+def load_conversation(user_id, session_id):
+    """
+    讀取對話的滾動摘要與尚未整合進摘要的最近訊息。
+
+    Returns:
+        tuple: (summary 或 None, 由舊到新的訊息列表，每筆含 id、role、content)
+    """
+    session = db.session.get(ChatSession, (user_id, session_id))
+    summarized_until_id = session.summarized_until_id if session else 0
+
+    # 只取視窗加上一次整合量的訊息；依 (user_id, session_id, timestamp) 索引由新到舊讀取
+    limit = (_window_turns() + _summary_every_turns()) * 2
+    rows = db.session.execute(
+        db.select(ChatHistory.id, ChatHistory.role, ChatHistory.content)
+        .where(ChatHistory.user_id == user_id, ChatHistory.session_id == session_id, ChatHistory.id > summarized_until_id)
+        .order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc())
+        .limit(limit)
+    ).all()
+    return (session.summary if session else None), list(reversed(rows))
+
+def messages_to_summarize(messages):
+    """
+    視窗外累積滿 CHAT_SUMMARY_EVERY_TURNS 輪時，返回應整合進摘要的最舊訊息；否則返回空列表。
+    """
+    fold_count = _summary_every_turns() * 2
+    if len(messages) < _window_turns() * 2 + fold_count:
+        return []
+    return messages[:fold_count]
+
+def save_summary(user_id, session_id, summary, summarized_until_id):
+    """寫入新的滾動摘要，並記錄已整合到哪一筆訊息。"""
+    session = db.session.get(ChatSession, (user_id, session_id))
+    if session is None:
+        session = ChatSession(user_id=user_id, session_id=session_id)
+        db.session.add(session)
+    session.summary = summary
+    session.summarized_until_id = summarized_until_id
+    db.session.commit()
+
+def fit_to_budget(messages, fixed_chars, max_chars=None):
+    """
+    由最舊的一輪開始捨棄逐字訊息，直到提示詞總字數不超過 CHAT_PROMPT_MAX_CHARS。
+    fixed_chars 為系統指示、摘要與本次訊息等一定會送出的字數。
+    """
+    max_chars = max_chars if max_chars is not None else _config('CHAT_PROMPT_MAX_CHARS', 12000)
+    total = fixed_chars + sum(len(m.content) for m in messages)
+    start = 0
+    while total > max_chars and start < len(messages):
+        total -= len(messages[start].content)
+        start += 1
+    # 保持以使用者訊息開頭，維持 user / model 交替
+    while start < len(messages) and messages[start].role != 'user':
+        start += 1
+    return messages[start:]
+
+# --- Private Helper Functions ---
+
+def _config(name, default):
+    """(私有) 讀取對話記憶相關設定。"""
+    return current_app.config.get(name, default)
+
+def _window_turns():
+    """(私有) 逐字保留的最近對話輪數 (一輪 = 使用者訊息 + 模型回覆)。"""
+    return _config('CHAT_WINDOW_TURNS', 6)
+
+def _summary_every_turns():
+    """(私有) 每累積幾輪超出視窗的對話就整合一次摘要。"""
+    return _config('CHAT_SUMMARY_EVERY_TURNS', 4)
+
+# --- END OF FILE backend/app/services/chat_memory.py ---
\ No newline at end of file
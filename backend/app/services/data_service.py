@@ -1,85 +1,138 @@
 # --- START OF FILE backend/app/services/data_service.py ---
 
 import pandas as pd
+import os
 import json
-from io import BytesIO
+import time
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
 from datetime import datetime
+from openpyxl import Workbook, load_workbook
+from sqlalchemy.dialects import postgresql, sqlite
 from .. import db
 from ..models import Sheep, SheepEvent, SheepHistoricalData, ChatHistory
 from . import sheep_service
+from .sheep_context import invalidate_sheep_context
+from .data_version import bump_data_version, touch_sheep
+from .date_utils import to_iso
+from . import history_rollup
 
-def export_user_data_to_excel(user_id):
+# 匯出時每次從資料庫游標取回的列數
+EXPORT_FETCH_ROWS = 2000
+
+# 匯出檔案在記憶體中的暫存上限，超過後改寫入磁碟暫存檔
+EXPORT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# 導入時每次從工作表讀取並處理的列數，使記憶體用量不隨檔案大小增加
+IMPORT_CHUNK_ROWS = 10000
+
+# 分析 Excel 時每個工作表返回的預覽列數
+ANALYZE_PREVIEW_ROWS = 3
+
+# 與 pandas read_excel 預設相同的缺值字串
+NA_STRINGS = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+
+# 每批 INSERT 的列數，避免單一語句的參數過多
+BULK_INSERT_BATCH_SIZE = 5000
+
+# 每個 UPSERT 語句的列數；每列約 20 個參數，需低於資料庫的參數上限
+BULK_UPSERT_BATCH_SIZE = 1000
+
+# 歷史數據工作表用途 -> (SheepHistoricalData.record_type, 數值欄位設定鍵)
+HISTORY_TYPE_MAP = {
+    'weight_record': ('Body_Weight_kg', 'Weight'),
+    'milk_yield_record': ('milk_yield_kg_day', 'Milk'),
+    'milk_analysis_record': ('milk_fat_percentage', 'AMFat')
+}
+
+def export_user_data_to_excel(user_id, progress_callback=None):
     """
-    將指定使用者的所有數據匯出成一個 Excel 檔案的二進位內容。
+    將指定使用者的所有數據以串流方式匯出成 Excel 檔案。
+    查詢結果以伺服器端游標分批讀取，逐列寫入 write_only 工作簿，並暫存於暫存檔。
 
     Args:
         user_id (int): 使用者的 ID。
+        progress_callback (callable, optional): 接收進度字典的回呼函數，格式同 import_data_from_excel。
 
     Returns:
-        BytesIO: 包含 Excel 檔案內容的 BytesIO 物件。
+        SpooledTemporaryFile: 已移至開頭的 Excel 暫存檔，由呼叫端負責關閉。
     """
-    db_engine = db.get_engine()
-
-    # 建立查詢
-    sheep_query = Sheep.query.filter_by(user_id=user_id).order_by(Sheep.EarNum)
-    events_query = SheepEvent.query.join(Sheep).filter(Sheep.user_id == user_id).order_by(Sheep.EarNum, SheepEvent.event_date.desc())
-    history_query = SheepHistoricalData.query.join(Sheep).filter(Sheep.user_id == user_id).order_by(Sheep.EarNum, SheepHistoricalData.record_date)
-    chat_query = ChatHistory.query.filter_by(user_id=user_id).order_by(ChatHistory.timestamp)
-
-    # 讀取數據到 DataFrame
-    df_sheep = pd.read_sql(sheep_query.statement, db_engine)
-    df_events = pd.read_sql(events_query.statement, db_engine)
-    df_history = pd.read_sql(history_query.statement, db_engine)
-    df_chat = pd.read_sql(chat_query.statement, db_engine)
-
-    # 建立 Excel 檔案
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        if not df_sheep.empty:
-            df_sheep.to_excel(writer, sheet_name='Sheep_Basic_Info', index=False)
-        
-        sheep_map = {s.id: s.EarNum for s in sheep_query.all()}
-        
-        if not df_events.empty:
-            df_events['EarNum'] = df_events['sheep_id'].map(sheep_map)
-            cols = ['EarNum'] + [col for col in df_events.columns if col not in ['EarNum', 'sheep_id', 'user_id']]
-            df_events[cols].to_excel(writer, sheet_name='Sheep_Events_Log', index=False)
-
-        if not df_history.empty:
-            df_history['EarNum'] = df_history['sheep_id'].map(sheep_map)
-            cols = ['EarNum'] + [col for col in df_history.columns if col not in ['EarNum', 'sheep_id', 'user_id']]
-            df_history[cols].to_excel(writer, sheet_name='Sheep_Historical_Data', index=False)
-        
-        if not df_chat.empty:
-            df_chat.to_excel(writer, sheet_name='Chat_History', index=False)
-            
+    def with_ear_num(model):
+        # 以 SQL JOIN 取得耳號，取代匯出後再以 sheep_id 對照
+        cols = [c for c in model.__table__.columns if c.name not in ['sheep_id', 'user_id']]
+        return db.select(Sheep.EarNum, *cols).join(Sheep, model.sheep_id == Sheep.id).where(Sheep.user_id == user_id)
+
+    sheets = [
+        ('Sheep_Basic_Info', db.select(*Sheep.__table__.columns).where(Sheep.user_id == user_id).order_by(Sheep.EarNum)),
+        ('Sheep_Events_Log', with_ear_num(SheepEvent).order_by(Sheep.EarNum, SheepEvent.event_date.desc())),
+        ('Sheep_Historical_Data', with_ear_num(SheepHistoricalData).order_by(Sheep.EarNum, SheepHistoricalData.record_date)),
+        ('Chat_History', db.select(*ChatHistory.__table__.columns).where(ChatHistory.user_id == user_id).order_by(ChatHistory.timestamp)),
+    ]
+
+    wb = Workbook(write_only=True)
+    progress = _ProgressTracker(progress_callback, len(sheets))
+    for sheet_name, stmt in sheets:
+        _write_query_to_sheet(wb, sheet_name, stmt, progress)
+        progress.sheet_done()
+    if not wb.worksheets:
+        # 沒有任何資料時仍輸出一個只有標題列的工作表，確保檔案有效
+        wb.create_sheet('Sheep_Basic_Info').append([c.name for c in Sheep.__table__.columns])
+
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    wb.save(output)
     output.seek(0)
     return output
 
+def _write_query_to_sheet(wb, sheet_name, stmt, progress):
+    """以伺服器端游標分批讀取查詢結果並寫入工作表；查詢沒有結果時不建立工作表。"""
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_FETCH_ROWS))
+    ws = None
+    for partition in result.partitions():
+        if ws is None:
+            ws = wb.create_sheet(sheet_name)
+            ws.append(list(result.keys()))
+        for row in partition:
+            # DATE 欄位以 'YYYY-MM-DD' 文字輸出，與匯入時接受的格式一致
+            ws.append([to_iso(value) for value in row])
+        progress.add_rows(len(partition))
+
 def analyze_excel_file(file_stream):
     """
     分析上傳的 Excel 檔案，返回其結構資訊。
     """
     try:
-        xls = pd.ExcelFile(file_stream)
-        sheets_data = {}
-        for sheet_name in xls.sheet_names:
-            df = pd.read_excel(xls, sheet_name=sheet_name, dtype=str)
-            df = df.where(pd.notna(df), None) # 將 NaN 轉換為 None
-            preview_data = df.head(3).to_dict(orient='records')
-            sheets_data[sheet_name] = {
-                "columns": list(df.columns),
-                "rows": len(df),
-                "preview": preview_data
-            }
-        return sheets_data
+        wb = _open_workbook(file_stream)
+        try:
+            sheets_data = {}
+            for sheet_name in wb.sheetnames:
+                ws = wb[sheet_name]
+                # 只讀取標題列與前 3 列預覽，不解析整個工作表
+                rows = ws.iter_rows(values_only=True, max_row=1 + ANALYZE_PREVIEW_ROWS)
+                header = next(rows, None)
+                columns = _header_to_columns(header) if header else []
+                preview_data = [dict(zip(columns, _row_to_strings(row, len(columns)))) for row in rows]
+                sheets_data[sheet_name] = {
+                    "columns": columns,
+                    "rows": _count_data_rows(ws) if header else 0,
+                    "preview": preview_data
+                }
+            return sheets_data
+        finally:
+            wb.close()
     except Exception as e:
         # 可以記錄更詳細的日誌
         raise ValueError(f"分析 Excel 檔案失敗: {e}")
 
-def import_data_from_excel(user_id, file_stream, config_str, is_default_mode):
+def import_data_from_excel(user_id, file_stream, config_str, is_default_mode, progress_callback=None):
     """
     根據提供的設定，從 Excel 檔案導入數據。
+
+    Args:
+        progress_callback (callable, optional): 接收進度字典
+            (sheets_done, sheets_total, rows_processed, rows_per_sec) 的回呼函數，供背景工作回報進度。
     """
     if is_default_mode:
         config = _get_default_import_config()
@@ -90,26 +143,36 @@ def import_data_from_excel(user_id, file_stream, config_str, is_default_mode):
             raise ValueError("手動模式請求的映射設定格式錯誤")
     
     try:
-        xls = pd.ExcelFile(file_stream)
-        report_details = []
-        
-        # 預加載資料以提高效能
-        sheep_id_cache = {s.EarNum: s.id for s in Sheep.query.filter_by(user_id=user_id).all()}
-        
-        # 1. 處理對照表
-        breed_map, sex_map = _process_mapping_sheets(xls, config)
-        
-        # 2. 處理基礎資料
-        report_basic, sheep_id_cache = _process_basic_info_sheet(xls, config, user_id, breed_map, sex_map, sheep_id_cache)
-        if report_basic:
-            report_details.append(report_basic)
-
-        # 3. 處理事件和歷史數據表
-        event_reports = _process_event_and_history_sheets(xls, config, user_id, sheep_id_cache)
-        report_details.extend(event_reports)
-        
-        db.session.commit()
-        return report_details
+        source = _open_sheet_source(file_stream, config)
+        try:
+            report_details = []
+            
+            sheets_total = sum(1 for name, sheet_config in config.get('sheets', {}).items() if name in source.sheetnames and sheet_config.get('purpose') != 'ignore')
+            progress = _ProgressTracker(progress_callback, sheets_total)
+            
+            # 預加載資料以提高效能
+            sheep_id_cache = dict(db.session.query(Sheep.EarNum, Sheep.id).filter_by(user_id=user_id).all())
+            
+            # 1. 處理對照表
+            breed_map, sex_map = _process_mapping_sheets(source, config, progress)
+            
+            # 2. 處理基礎資料
+            report_basic, sheep_id_cache = _process_basic_info_sheet(source, config, user_id, breed_map, sex_map, sheep_id_cache, progress)
+            if report_basic:
+                report_details.append(report_basic)
+
+            # 3. 處理事件和歷史數據表
+            event_reports = _process_event_and_history_sheets(source, config, user_id, sheep_id_cache, progress)
+            report_details.extend(event_reports)
+            
+            sheep_service.mark_dashboard_dirty(user_id)
+            bump_data_version(user_id)
+            db.session.commit()
+            invalidate_sheep_context(user_id)
+            progress.finish()
+            return report_details
+        finally:
+            source.close()
         
     except Exception as e:
         db.session.rollback()
@@ -117,6 +180,43 @@ def import_data_from_excel(user_id, file_stream, config_str, is_default_mode):
 
 # --- Private Helper Functions ---
 
+class _ProgressTracker:
+    """(私有) 累計導入/匯出進度，並以固定時間間隔透過回呼函數回報，避免過於頻繁地寫入進度。"""
+    REPORT_INTERVAL_SEC = 1.0
+
+    def __init__(self, callback, sheets_total):
+        self.callback = callback
+        self.sheets_total = sheets_total
+        self.sheets_done = 0
+        self.rows_processed = 0
+        self.start_time = time.perf_counter()
+        self.last_report = 0.0
+
+    def add_rows(self, n):
+        self.rows_processed += n
+        self.report()
+
+    def sheet_done(self):
+        self.sheets_done += 1
+        self.report(force=True)
+
+    def finish(self):
+        self.sheets_done = self.sheets_total
+        self.report(force=True)
+
+    def report(self, force=False):
+        if not self.callback: return
+        now = time.perf_counter()
+        if not force and now - self.last_report < self.REPORT_INTERVAL_SEC: return
+        self.last_report = now
+        elapsed = now - self.start_time
+        self.callback({
+            "sheets_done": self.sheets_done,
+            "sheets_total": self.sheets_total,
+            "rows_processed": self.rows_processed,
+            "rows_per_sec": round(self.rows_processed / elapsed, 1) if elapsed > 0 else None
+        })
+
 def _get_default_import_config():
     """返回預設導入模式的設定檔。"""
     return {
@@ -132,138 +232,344 @@ def _get_default_import_config():
         }
     }
 
-def _format_date(d):
-    """格式化日期，處理各種可能的輸入格式。"""
-    if not d or pd.isna(d): return None
+def _format_date_series(series):
+    """
+    date_utils.parse_date 的向量化版本：整欄轉換為 date 物件，無效或早於 1901 年的值為 None。
+    """
+    date_part = series.astype('string').str.split(' ', n=1).str[0]
+    dt = pd.to_datetime(date_part, format='%Y-%m-%d', errors='coerce')
+    # 非 ISO 格式（如 2023/03/04）的值再以逐值推斷格式的方式補解析
+    fallback = dt.isna() & date_part.notna() & (date_part != '')
+    if fallback.any():
+        dt[fallback] = pd.to_datetime(date_part[fallback], format='mixed', errors='coerce')
+    dt = dt.where(dt.dt.year >= 1901)
+    return dt.dt.date.astype(object).where(dt.notna(), None)
+
+def _column(df, col_name):
+    """取出指定欄位；設定未指定或工作表中不存在時返回全為 None 的欄位。"""
+    if col_name is not None and col_name in df.columns:
+        return df[col_name]
+    return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+def _open_workbook(file_stream):
+    """以唯讀串流模式開啟工作簿；工作表內容在逐列迭代時才解析。使用完畢需調用 close()。"""
+    return load_workbook(file_stream, read_only=True, data_only=True)
+
+def _cell_to_str(value):
+    """將儲存格值轉為與 pandas read_excel(dtype=str) 相同的字串，缺值返回 None。"""
+    if value is None: return None
+    if isinstance(value, float) and value.is_integer(): value = int(value)
+    value = str(value)
+    return None if value in NA_STRINGS else value
+
+def _row_to_strings(row, width):
+    """將一列資料轉為固定欄數的字串 list，不足的欄位補 None。"""
+    values = [_cell_to_str(v) for v in row[:width]]
+    return values + [None] * (width - len(values))
+
+def _header_to_columns(header):
+    """將標題列轉為欄名，空白標題命名為 'Unnamed: i'，重複的欄名加上 '.1'、'.2' 後綴。"""
+    columns, seen = [], {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None or str(value) == '' else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+def _count_data_rows(ws):
+    """優先使用工作表的 dimension 資訊計算資料列數，沒有時才逐列計數。"""
+    if ws.max_row is not None:
+        return max(ws.max_row - 1, 0)
+    return sum(1 for _ in ws.iter_rows(min_row=2, values_only=True))
+
+def _iter_sheet_chunks(wb, sheet_name, chunk_size=IMPORT_CHUNK_ROWS):
+    """
+    逐批讀取工作表，每批返回最多 chunk_size 列的字串 DataFrame。
+    即使工作表沒有資料列，也至少返回一個帶有欄名的空 DataFrame。
+    """
+    rows = wb[sheet_name].iter_rows(values_only=True)
+    header = next(rows, None)
+    columns = _header_to_columns(header) if header else []
+    chunk, offset, yielded = [], 0, False
+    for row in rows:
+        chunk.append(_row_to_strings(row, len(columns)))
+        if len(chunk) >= chunk_size:
+            yield pd.DataFrame(chunk, columns=columns, dtype=object, index=range(offset, offset + len(chunk)))
+            offset += len(chunk)
+            chunk, yielded = [], True
+    if chunk or not yielded:
+        yield pd.DataFrame(chunk, columns=columns, dtype=object, index=range(offset, offset + len(chunk)))
+
+def _read_sheet(wb, sheet_name):
+    """讀取整個工作表為字串 DataFrame；僅用於對照表等小型工作表。"""
+    return pd.concat(_iter_sheet_chunks(wb, sheet_name))
+
+def _parse_sheet_worker(path, sheet_name):
+    """(行程池工作函數) 在子行程中開啟工作簿並將單一工作表解析為字串 DataFrame。"""
+    wb = _open_workbook(path)
     try:
-        # 先轉為字串並取日期部分，避免時間戳問題
-        d_str = str(d).split(' ')[0]
-        # 使用 pandas 的 to_datetime 進行穩健的轉換
-        dt = pd.to_datetime(d_str, errors='coerce')
-        if pd.isna(dt) or dt.year < 1901: return None
-        return dt.strftime('%Y-%m-%d')
-    except Exception:
-        return None
-
-def _process_mapping_sheets(xls, config):
+        return _read_sheet(wb, sheet_name)
+    finally:
+        wb.close()
+
+class _StreamingSheetSource:
+    """(私有) 以唯讀串流模式逐批讀取工作表，記憶體用量與檔案大小無關。"""
+
+    def __init__(self, file_stream):
+        self.wb = _open_workbook(file_stream)
+        self.sheetnames = self.wb.sheetnames
+
+    def iter_chunks(self, sheet_name):
+        return _iter_sheet_chunks(self.wb, sheet_name)
+
+    def close(self):
+        self.wb.close()
+
+class _ParallelSheetSource:
+    """
+    (私有) 以行程池平行解析各工作表，每個工作表整張解析為一個 DataFrame。
+    工作依對照表、基礎資料、事件表的順序提交，讓後續工作表的解析與前面的資料庫寫入重疊進行。
+    """
+
+    def __init__(self, file_stream, sheet_names, workers):
+        fd, self.path = tempfile.mkstemp(suffix='.xlsx')
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(file_stream, f)
+        wb = _open_workbook(self.path)
+        self.sheetnames = wb.sheetnames
+        wb.close()
+        # 使用 spawn 避免在多執行緒的 Web 行程中 fork
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        self.futures = {name: self.pool.submit(_parse_sheet_worker, self.path, name) for name in sheet_names if name in self.sheetnames}
+
+    def iter_chunks(self, sheet_name):
+        yield self.futures[sheet_name].result()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+        os.remove(self.path)
+
+def _open_sheet_source(file_stream, config):
+    """依 IMPORT_PARSE_WORKERS 設定選擇串流讀取（預設）或行程池平行解析。"""
+    workers = current_app.config.get('IMPORT_PARSE_WORKERS', 1)
+    if workers <= 1:
+        return _StreamingSheetSource(file_stream)
+    phase = {'breed_mapping': 0, 'sex_mapping': 0, 'basic_info': 1}
+    sheets = [(name, sheet_config.get('purpose')) for name, sheet_config in config.get('sheets', {}).items() if sheet_config.get('purpose') != 'ignore']
+    ordered = [name for name, purpose in sorted(sheets, key=lambda item: phase.get(item[1], 2))]
+    return _ParallelSheetSource(file_stream, ordered, workers)
+
+def _transform_mapping_sheet(df, cols):
+    """將對照表工作表轉換為 {代碼: 名稱} 字典。"""
+    codes = _column(df, cols['Code'])
+    names = _column(df, cols['Name'])
+    valid = codes.notna() & (codes != '')
+    return dict(zip(codes[valid].astype(str), names[valid]))
+
+def _map_codes(series, code_map):
+    """以對照表轉換代碼，不在對照表中的值保持原樣。"""
+    if not code_map: return series
+    as_str = series.astype('string')
+    return series.where(~as_str.isin(list(code_map)), as_str.map(code_map))
+
+def _transform_basic_info_sheet(df, cols, breed_map, sex_map):
+    """
+    將基礎資料工作表轉換為以 Sheep 欄位為欄名的 DataFrame，
+    值為 None 的儲存格代表「不更新該欄位」。
+    """
+    ear_nums = _column(df, cols['EarNum'])
+    df = df[ear_nums.notna() & (ear_nums != '')]
+    records = pd.DataFrame(index=df.index)
+    for db_field, xls_col in cols.items():
+        if not hasattr(Sheep, db_field) or xls_col not in df.columns: continue
+        values = df[xls_col]
+        if db_field == 'Breed': values = _map_codes(values, breed_map)
+        elif db_field == 'Sex': values = _map_codes(values, sex_map)
+        elif 'Date' in db_field:
+            values = _format_date_series(values)
+            # 仍為文字型別的日期欄位（如 MoveDate）保存 'YYYY-MM-DD' 字串
+            if not isinstance(Sheep.__table__.c[db_field].type, db.Date): values = values.map(to_iso)
+        records[db_field] = values.astype(object).where(values.notna(), None)
+    records['EarNum'] = df[cols['EarNum']]
+    return records
+
+def _transform_event_sheet(df, purpose, cols, user_id, sheep_id_cache):
+    """
+    將事件或歷史數據工作表轉換為可直接批次寫入的列資料。
+
+    Returns:
+        tuple: (SheepEvent 列資料 list, SheepHistoricalData 列資料 list)
+    """
+    sheep_ids = _column(df, cols.get('EarNum')).map(sheep_id_cache)
+    df = df[sheep_ids.notna()]
+    sheep_ids = sheep_ids[sheep_ids.notna()].astype('int64')
+
+    event_frames, history_rows = [], []
+
+    def add_events(dates, event_type, descriptions):
+        valid = dates.notna()
+        event_frames.append(pd.DataFrame({
+            "user_id": user_id, "sheep_id": sheep_ids[valid], "event_date": dates[valid],
+            "event_type": event_type, "description": descriptions[valid]
+        }))
+
+    def prefixed(prefix, col_key, suffix=''):
+        # 與 f-string 行為一致：缺值會顯示為 'None'
+        return prefix + _column(df, cols.get(col_key)).astype(str) + suffix
+
+    no_desc = pd.Series([None] * len(df), index=df.index, dtype=object)
+    if purpose == 'kidding_record':
+        add_events(_format_date_series(_column(df, cols.get('YeanDate'))), '產仔', prefixed("產下仔羊: ", 'KidNum') if cols.get('KidNum') else no_desc)
+    elif purpose == 'mating_record':
+        add_events(_format_date_series(_column(df, cols.get('Mat_date'))), '配種', prefixed("配種公羊: ", 'Mat_grouM_Sire') if cols.get('Mat_grouM_Sire') else no_desc)
+    elif purpose == 'yean_record':
+        add_events(_format_date_series(_column(df, cols.get('YeanDate'))), '泌乳開始', prefixed("第 ", 'Lactation', " 胎次"))
+        add_events(_format_date_series(_column(df, cols.get('DryOffDate'))), '乾乳', prefixed("第 ", 'Lactation', " 胎次結束"))
+    elif purpose in HISTORY_TYPE_MAP:
+        hist_type, val_col = HISTORY_TYPE_MAP[purpose]
+        dates = _format_date_series(_column(df, cols.get('MeaDate')))
+        # 無法轉換為數字的值會變成 NaN，與日期無效的列一併略過
+        values = pd.to_numeric(_column(df, cols.get(val_col)), errors='coerce')
+        valid = dates.notna() & values.notna()
+        history_rows = pd.DataFrame({
+            "user_id": user_id, "sheep_id": sheep_ids[valid], "record_date": dates[valid],
+            "record_type": hist_type, "value": values[valid].astype(float)
+        }).to_dict(orient='records')
+
+    event_rows = pd.concat(event_frames).to_dict(orient='records') if event_frames else []
+    return event_rows, history_rows
+
+def _process_mapping_sheets(source, config, progress):
     """從 Excel 中讀取品種和性別的對照表。"""
     breed_map, sex_map = {}, {}
     for sheet_name, sheet_config in config.get('sheets', {}).items():
-        if sheet_name not in xls.sheet_names: continue
+        if sheet_name not in source.sheetnames: continue
         purpose = sheet_config.get('purpose')
         cols = sheet_config.get('columns', {})
-        df = pd.read_excel(xls, sheet_name=sheet_name, dtype=str).where(pd.notna, None)
-        
-        if purpose == 'breed_mapping' and all(k in cols for k in ['Code', 'Name']):
-            for _, row in df.iterrows():
-                if row.get(cols['Code']): breed_map[str(row[cols['Code']])] = row[cols['Name']]
-        elif purpose == 'sex_mapping' and all(k in cols for k in ['Code', 'Name']):
-            for _, row in df.iterrows():
-                if row.get(cols['Code']): sex_map[str(row[cols['Code']])] = row[cols['Name']]
-    return breed_map, sex_map
+        if purpose not in ['breed_mapping', 'sex_mapping'] or not all(k in cols for k in ['Code', 'Name']): continue
 
-def _process_basic_info_sheet(xls, config, user_id, breed_map, sex_map, sheep_id_cache):
-    """處理基礎資料工作表，創建或更新羊隻記錄。"""
-    created, updated = 0, 0
-    sheet_name_processed = None
+        df = pd.concat(source.iter_chunks(sheet_name))
+        (breed_map if purpose == 'breed_mapping' else sex_map).update(_transform_mapping_sheet(df, cols))
+        progress.add_rows(len(df))
+        progress.sheet_done()
+    return breed_map, sex_map
 
+def _process_basic_info_sheet(source, config, user_id, breed_map, sex_map, sheep_id_cache, progress):
+    """處理基礎資料工作表，以批次 UPSERT 創建或更新羊隻記錄。"""
     for sheet_name, sheet_config in config.get('sheets', {}).items():
         if sheet_config.get('purpose') == 'basic_info':
-            if sheet_name not in xls.sheet_names: continue
+            if sheet_name not in source.sheetnames: continue
             cols = sheet_config.get('columns', {})
             if 'EarNum' not in cols: continue
             
-            sheet_name_processed = sheet_name
-            df = pd.read_excel(xls, sheet_name=sheet_name, dtype=str).where(pd.notna, None)
-            
-            for _, row in df.iterrows():
-                ear_num = row.get(cols['EarNum'])
-                if not ear_num: continue
-
-                sheep = Sheep.query.filter_by(user_id=user_id, EarNum=ear_num).first()
-                if not sheep:
-                    sheep = Sheep(user_id=user_id, EarNum=ear_num)
-                    db.session.add(sheep)
-                    created += 1
-                else:
-                    updated += 1
-                
-                for db_field, xls_col in cols.items():
-                    if hasattr(sheep, db_field) and xls_col in row and row[xls_col] is not None:
-                        value = row[xls_col]
-                        if db_field == 'Breed': value = breed_map.get(str(value), value)
-                        elif db_field == 'Sex': value = sex_map.get(str(value), value)
-                        elif 'Date' in db_field: value = _format_date(value)
-                        
-                        if value is not None:
-                            setattr(sheep, db_field, value)
-            
-            db.session.flush() # 將變更寫入事務，以便更新 sheep_id_cache
-            new_sheep_id_cache = {s.EarNum: s.id for s in Sheep.query.filter_by(user_id=user_id).all()}
+            created, updated = 0, 0
+            new_sheep_id_cache = dict(sheep_id_cache)
+            for chunk in source.iter_chunks(sheet_name):
+                records = _transform_basic_info_sheet(chunk, cols, breed_map, sex_map)
+                returned = _upsert_sheep(user_id, records)
+
+                # 與逐列處理相同，以工作表的每一列計數：耳號第一次出現（資料庫與先前的列中都沒有）為新增，
+                # 其餘（包含同一批中重複的耳號）為更新；快取以 RETURNING 的結果更新
+                for ear_num in records['EarNum']:
+                    if ear_num in new_sheep_id_cache:
+                        updated += 1
+                    else:
+                        created += 1
+                        new_sheep_id_cache[ear_num] = returned[ear_num]
+                new_sheep_id_cache.update(returned)
+                progress.add_rows(len(chunk))
+            progress.sheet_done()
             
             report = {"sheet": sheet_name, "message": f"處理完成。新增 {created} 筆，更新 {updated} 筆基礎資料。"}
             return report, new_sheep_id_cache
 
     return None, sheep_id_cache # 如果沒有基礎資料表
 
-def _process_event_and_history_sheets(xls, config, user_id, sheep_id_cache):
-    """處理所有非基礎資料的工作表，轉換為事件或歷史數據。"""
+def _upsert_sheep(user_id, records):
+    """
+    以 INSERT ... ON CONFLICT (user_id, "EarNum") DO UPDATE 批次寫入羊隻基礎資料。
+    值為 None 的欄位不會覆蓋資料庫中的既有值。
+
+    Returns:
+        dict: {EarNum: sheep_id}，包含所有被新增或更新的羊隻。
+    """
+    if records.empty: return {}
+
+    # 同一批資料中重複的耳號無法在單一 UPSERT 中處理，先合併為一列（後出現的非空值優先）
+    records = records.groupby('EarNum', sort=False, as_index=False).last()
+    fields = [f for f in records.columns if f not in ('id', 'user_id')]
+    records = _coerce_numeric_fields(records[fields])
+    rows = [
+        {**row, "user_id": user_id, "last_updated": datetime.utcnow()}
+        for row in records.astype(object).where(records.notna(), None).to_dict(orient='records')
+    ]
+
+    table = Sheep.__table__
+    insert = postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    returned = {}
+    for i in range(0, len(rows), BULK_UPSERT_BATCH_SIZE):
+        stmt = insert(table).values(rows[i:i + BULK_UPSERT_BATCH_SIZE])
+        update_set = {f: db.func.coalesce(stmt.excluded[f], table.c[f]) for f in fields if f != 'EarNum'}
+        update_set['last_updated'] = stmt.excluded.last_updated
+        stmt = stmt.on_conflict_do_update(index_elements=['user_id', 'EarNum'], set_=update_set)
+        result = db.session.execute(stmt.returning(table.c.id, table.c.EarNum))
+        returned.update({ear_num: sheep_id for sheep_id, ear_num in result})
+    return returned
+
+def _coerce_numeric_fields(records):
+    """將數值欄位的字串轉為數字；無法轉換（或整數欄位非整數）的值視為空值。"""
+    records = records.copy()
+    for field in records.columns:
+        column_type = Sheep.__table__.c[field].type
+        if isinstance(column_type, (db.Float, db.Integer)):
+            values = pd.to_numeric(records[field], errors='coerce')
+            if isinstance(column_type, db.Integer):
+                values = values.where(values == values.round())
+                records[field] = pd.array(values, dtype='Int64')
+            else:
+                records[field] = values
+    return records
+
+def _process_event_and_history_sheets(source, config, user_id, sheep_id_cache, progress):
+    """處理所有非基礎資料的工作表，轉換為事件或歷史數據，並以批次 INSERT 寫入。"""
     reports = []
     for sheet_name, sheet_config in config.get('sheets', {}).items():
         purpose = sheet_config.get('purpose')
-        if purpose in ['ignore', 'basic_info', 'breed_mapping', 'sex_mapping'] or sheet_name not in xls.sheet_names:
+        if purpose in ['ignore', 'basic_info', 'breed_mapping', 'sex_mapping'] or sheet_name not in source.sheetnames:
             continue
             
+        start_time = time.perf_counter()
         cols = sheet_config.get('columns', {})
-        df = pd.read_excel(xls, sheet_name=sheet_name, dtype=str).where(pd.notna, None)
         count = 0
-        
-        for _, row in df.iterrows():
-            ear_num = row.get(cols.get('EarNum'))
-            sheep_id = sheep_id_cache.get(ear_num)
-            if not sheep_id: continue
-            
-            # 根據 purpose 創建事件或歷史數據
-            try:
-                if purpose == 'kidding_record':
-                    date = _format_date(row.get(cols.get('YeanDate')))
-                    if date:
-                        desc = f"產下仔羊: {row.get(cols.get('KidNum'))}" if cols.get('KidNum') else None
-                        db.session.add(SheepEvent(user_id=user_id, sheep_id=sheep_id, event_date=date, event_type='產仔', description=desc))
-                        count += 1
-                elif purpose == 'mating_record':
-                    date = _format_date(row.get(cols.get('Mat_date')))
-                    if date:
-                        desc = f"配種公羊: {row.get(cols.get('Mat_grouM_Sire'))}" if cols.get('Mat_grouM_Sire') else None
-                        db.session.add(SheepEvent(user_id=user_id, sheep_id=sheep_id, event_date=date, event_type='配種', description=desc))
-                        count += 1
-                elif purpose == 'yean_record':
-                    lactation = row.get(cols.get('Lactation'))
-                    if yean_date := _format_date(row.get(cols.get('YeanDate'))):
-                        db.session.add(SheepEvent(user_id=user_id, sheep_id=sheep_id, event_date=yean_date, event_type='泌乳開始', description=f"第 {lactation} 胎次"))
-                        count += 1
-                    if dry_off_date := _format_date(row.get(cols.get('DryOffDate'))):
-                        db.session.add(SheepEvent(user_id=user_id, sheep_id=sheep_id, event_date=dry_off_date, event_type='乾乳', description=f"第 {lactation} 胎次結束"))
-                        count += 1
-                elif purpose in ['weight_record', 'milk_yield_record', 'milk_analysis_record']:
-                    type_map = {
-                        'weight_record': ('Body_Weight_kg', 'Weight'),
-                        'milk_yield_record': ('milk_yield_kg_day', 'Milk'),
-                        'milk_analysis_record': ('milk_fat_percentage', 'AMFat')
-                    }
-                    hist_type, val_col = type_map[purpose]
-                    date = _format_date(row.get(cols.get('MeaDate')))
-                    value = row.get(cols.get(val_col))
-                    if date and value is not None:
-                        db.session.add(SheepHistoricalData(user_id=user_id, sheep_id=sheep_id, record_date=date, record_type=hist_type, value=float(value)))
-                        count += 1
-            except (ValueError, TypeError):
-                # 忽略無法轉換的行
-                continue
-
+        for chunk in source.iter_chunks(sheet_name):
+            event_rows, history_rows = _transform_event_sheet(chunk, purpose, cols, user_id, sheep_id_cache)
+            count += _bulk_insert(SheepEvent, event_rows) + _bulk_insert(SheepHistoricalData, history_rows)
+            history_rollup.apply_history_rows(history_rows)
+            touch_sheep(row['sheep_id'] for row in event_rows + history_rows)
+            progress.add_rows(len(chunk))
+        progress.sheet_done()
         if count > 0:
-            reports.append({"sheet": sheet_name, "message": f"成功導入 {count} 筆記錄。"})
+            elapsed = time.perf_counter() - start_time
+            reports.append({
+                "sheet": sheet_name,
+                "message": f"成功導入 {count} 筆記錄。",
+                "rows": count,
+                "rows_per_sec": round(count / elapsed, 1) if elapsed > 0 else None
+            })
             
     return reports
 
+def _bulk_insert(model, rows):
+    """
+    以 executemany 分批寫入多筆資料，不建立 ORM 物件。
+    寫入發生在目前的 session 事務中，由呼叫端統一 commit 或 rollback。
+    """
+    for i in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+        db.session.execute(db.insert(model), rows[i:i + BULK_INSERT_BATCH_SIZE])
+    return len(rows)
+
 # --- END OF FILE backend/app/services/data_service.py ---
\ No newline at end of file
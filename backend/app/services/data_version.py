@@ -0,0 +1,42 @@
+# --- START OF FILE backend/app/services/data_version.py ---
+
+"""
+讀取 API 的版本追蹤，供 ETag / 304 使用。
+
+- 使用者層級：User.data_version。任何改變使用者資料（羊隻、事件、歷史數據、事件選項）的寫入
+  都應在同一個事務中、commit 之前調用 bump_data_version。
+- 羊隻層級：Sheep.last_updated。除了羊隻本身的更新，該羊隻的事件或歷史數據有變動時，
+  也應調用 touch_sheep，讓單隻羊的詳細資料與歷史數據 API 能各自判斷是否變更。
+"""
+
+from datetime import datetime
+from .. import db
+from ..models import User, Sheep
+
+TOUCH_BATCH_SIZE = 500
+
+def bump_data_version(user_id):
+    """遞增使用者的資料版本號。"""
+    db.session.execute(db.update(User).where(User.id == user_id).values(data_version=User.data_version + 1))
+
+def get_data_version(user_id):
+    """返回使用者目前的資料版本號（單一主鍵查詢）。"""
+    return db.session.execute(db.select(User.data_version).where(User.id == user_id)).scalar()
+
+def touch_sheep(sheep_ids):
+    """將羊隻的 last_updated 更新為現在時間；sheep_ids 可為任意可迭代的 id 集合。"""
+    sheep_ids = list(set(sheep_ids))
+    now = datetime.utcnow()
+    for i in range(0, len(sheep_ids), TOUCH_BATCH_SIZE):
+        db.session.execute(
+            db.update(Sheep).where(Sheep.id.in_(sheep_ids[i:i + TOUCH_BATCH_SIZE])).values(last_updated=now),
+            execution_options={"synchronize_session": False}
+        )
+
+def get_sheep_version(user_id, ear_num):
+    """返回 (sheep_id, last_updated)；找不到羊隻時返回 None。"""
+    return db.session.execute(
+        db.select(Sheep.id, Sheep.last_updated).where(Sheep.user_id == user_id, Sheep.EarNum == ear_num)
+    ).first()
+
+# --- END OF FILE backend/app/services/data_version.py ---
\ No newline at end of file
@@ -0,0 +1,39 @@
+# --- START OF FILE backend/app/services/date_utils.py ---
+
+import pandas as pd
+from datetime import date, datetime
+
+def parse_date(value):
+    """
+    將各種日期輸入轉換為 date 物件，規則與 Excel 導入相同：
+    只取空白前的日期部分、由 pandas 推斷格式，無效或早於 1901 年的值返回 None。
+    """
+    if isinstance(value, datetime): return value.date()
+    if isinstance(value, date): return value
+    if value is None or value == '' or pd.isna(value): return None
+    try:
+        dt = pd.to_datetime(str(value).split(' ')[0], errors='coerce')
+        if pd.isna(dt) or dt.year < 1901: return None
+        return dt.date()
+    except Exception:
+        return None
+
+def require_date(value, label="日期"):
+    """同 parse_date，但空值或無法解析時拋出 ValueError，供必填的日期欄位使用。"""
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f"{label}格式無效: {value}" if value else f"{label}為必填")
+    return parsed
+
+def parse_optional_date(value, label="日期"):
+    """選填的日期欄位：空值返回 None，有值但無法解析時拋出 ValueError。"""
+    if value is None or value == '': return None
+    return require_date(value, label)
+
+def to_iso(value):
+    """date 物件轉為 'YYYY-MM-DD'，其他值原樣返回。"""
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+# --- END OF FILE backend/app/services/date_utils.py ---
\ No newline at end of file
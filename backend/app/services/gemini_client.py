@@ -0,0 +1,180 @@
+# --- START OF FILE backend/app/services/gemini_client.py ---
+
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+
+DEFAULT_GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+
+# 會重試的 HTTP 狀態碼：流量限制與伺服器端暫時性錯誤
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class GeminiConcurrencyError(requests.exceptions.RequestException):
+    """同一個 API 金鑰的併發請求已達上限，且在等待時間內未取得名額。"""
+
+class GeminiClient:
+    """
+    共用連線池的 Gemini HTTP 客戶端。
+
+    - 以單一 requests.Session 重用 keep-alive 連線。
+    - 每個 API 金鑰以 BoundedSemaphore 限制同時進行的請求數。
+    - 對 429/5xx 與連線錯誤進行帶隨機抖動的指數退避重試。
+    - 記錄每次呼叫的延遲，供 get_metrics() 查詢。
+    """
+
+    def __init__(self, base_url=DEFAULT_GEMINI_API_BASE, timeout=180, max_concurrency_per_key=4,
+                 max_retries=3, backoff_base=0.5, backoff_max=8.0, pool_maxsize=20):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_concurrency_per_key = max_concurrency_per_key
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self._counters = {"calls": 0, "retries": 0, "errors": 0}
+
+    def generate_content(self, model, api_key, payload):
+        """
+        呼叫 models/{model}:generateContent 並返回解析後的 JSON。
+
+        Raises:
+            requests.exceptions.HTTPError: 重試後仍為錯誤狀態碼。
+            requests.exceptions.RequestException: 網路錯誤或併發名額等待逾時。
+        """
+        response = self.post(f"models/{model}:generateContent", api_key, payload)
+        return response.json()
+
+    def stream_generate_content(self, model, api_key, payload):
+        """
+        呼叫 models/{model}:streamGenerateContent?alt=sse，逐一產生每個 SSE 事件解析後的 JSON。
+        併發名額一直保留到回應內容讀取完畢（或呼叫端中途關閉產生器）才釋放，記錄的延遲也涵蓋整段串流。
+
+        Raises:
+            ValueError: 某個 data: 行不是有效的 JSON（例如被截斷的事件）。
+        """
+        semaphore = self._acquire(api_key)
+        start = time.perf_counter()
+        error = True
+        try:
+            response = self._send(f"models/{model}:streamGenerateContent", api_key, payload, stream=True, params={"alt": "sse"})
+            with response:
+                # chunk_size=None：收到多少處理多少，不等待讀取緩衝區填滿；
+                # 以位元組處理再交給 json.loads (UTF-8)，避免 text/event-stream 未標 charset 時被當成 latin-1
+                for line in response.iter_lines(chunk_size=None):
+                    if line.startswith(b'data:'):
+                        yield json.loads(line[len(b'data:'):])
+            error = False
+        except GeneratorExit:
+            # 呼叫端中途停止讀取（例如客戶端斷線），不算 API 錯誤
+            error = False
+            raise
+        finally:
+            self._record(start, error=error)
+            semaphore.release()
+
+    def post(self, path, api_key, payload, params=None):
+        """送出 POST 請求（含併發限制與重試），返回狀態碼正常的 Response。"""
+        semaphore = self._acquire(api_key)
+        start = time.perf_counter()
+        try:
+            response = self._send(path, api_key, payload, params=params)
+        except Exception:
+            self._record(start, error=True)
+            raise
+        finally:
+            semaphore.release()
+        self._record(start)
+        return response
+
+    def get_metrics(self):
+        """返回呼叫次數、重試次數、錯誤次數與延遲統計（毫秒）。"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            metrics = dict(self._counters)
+        if latencies:
+            metrics.update({
+                "latency_ms_avg": round(sum(latencies) / len(latencies), 1),
+                "latency_ms_p50": round(latencies[len(latencies) // 2], 1),
+                "latency_ms_p95": round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 1),
+            })
+        return metrics
+
+    def _acquire(self, api_key):
+        """(私有) 取得此 API 金鑰的併發名額，返回需由呼叫端釋放的 semaphore。"""
+        semaphore = self._semaphore_for(api_key)
+        if not semaphore.acquire(timeout=self.timeout):
+            raise GeminiConcurrencyError("此 API 金鑰的同時請求數已達上限，請稍後再試。")
+        return semaphore
+
+    def _send(self, path, api_key, payload, stream=False, params=None):
+        """(私有) 送出請求並對 429/5xx 與連線錯誤重試，返回狀態碼正常的 Response；呼叫端需持有併發名額。"""
+        url = f"{self.base_url}/{path}"
+        params = {**(params or {}), "key": api_key}
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(url, params=params, json=payload, timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.max_retries: raise
+                self._sleep_before_retry(attempt)
+                continue
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                retry_after = response.headers.get('Retry-After')
+                response.close()
+                self._sleep_before_retry(attempt, retry_after)
+                continue
+            response.raise_for_status()
+            return response
+
+    def _semaphore_for(self, api_key):
+        # 以雜湊值作為字典鍵，避免在記憶體中長期保留原始金鑰
+        key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+        with self._lock:
+            if key_hash not in self._semaphores:
+                self._semaphores[key_hash] = threading.BoundedSemaphore(self.max_concurrency_per_key)
+            return self._semaphores[key_hash]
+
+    def _sleep_before_retry(self, attempt, retry_after=None):
+        with self._lock:
+            self._counters["retries"] += 1
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            # Full jitter：在 [0, base * 2^attempt] 之間隨機等待
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        time.sleep(min(delay, self.backoff_max))
+
+    def _record(self, start, error=False):
+        with self._lock:
+            self._counters["calls"] += 1
+            if error: self._counters["errors"] += 1
+            self._latencies.append((time.perf_counter() - start) * 1000)
+
+def get_gemini_client():
+    """返回目前應用程式共用的 GeminiClient，第一次呼叫時依設定建立。"""
+    client = current_app.extensions.get('gemini_client')
+    if client is None:
+        config = current_app.config
+        client = GeminiClient(
+            base_url=config.get('GEMINI_API_BASE') or DEFAULT_GEMINI_API_BASE,
+            timeout=config.get('GEMINI_TIMEOUT', 180),
+            max_concurrency_per_key=config.get('GEMINI_MAX_CONCURRENCY_PER_KEY', 4),
+            max_retries=config.get('GEMINI_MAX_RETRIES', 3),
+        )
+        client = current_app.extensions.setdefault('gemini_client', client)
+    return client
+
+# --- END OF FILE backend/app/services/gemini_client.py ---
\ No newline at end of file
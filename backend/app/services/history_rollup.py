@@ -0,0 +1,127 @@
+# --- START OF FILE backend/app/services/history_rollup.py ---
+
+from datetime import timedelta
+from sqlalchemy.dialects import postgresql, sqlite
+from .. import db
+from ..models import SheepHistoricalData, SheepHistoryRollup
+
+RESOLUTIONS = ('week', 'month')
+ROLLUP_UPSERT_BATCH_SIZE = 1000
+
+def bucket_start(day, resolution):
+    """返回日期所屬區間的起始日：週以週一起算，月為當月 1 日。"""
+    if resolution == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def apply_history_rows(rows, executor=None):
+    """
+    將新寫入的歷史數據增量合併進週 / 月彙總。
+    rows 為含 sheep_id、user_id、record_type、record_date (date)、value 的字典列表；
+    應與寫入歷史數據在同一個事務中調用，由呼叫端 commit。
+    """
+    if not rows: return
+    executor = executor or db.session
+    aggregates = list(_aggregate(rows).values())
+    for i in range(0, len(aggregates), ROLLUP_UPSERT_BATCH_SIZE):
+        _upsert(executor, aggregates[i:i + ROLLUP_UPSERT_BATCH_SIZE])
+
+def rebuild_buckets(sheep_id, record_type, day, executor=None):
+    """
+    刪除歷史數據後調用：以原始數據重新計算包含 day 的週與月彙總（最小值、最大值無法增量扣除）。
+    """
+    executor = executor or db.session
+    rollup = SheepHistoryRollup.__table__
+    for resolution in RESOLUTIONS:
+        start = bucket_start(day, resolution)
+        end = start + timedelta(days=7) if resolution == 'week' else bucket_start(start + timedelta(days=31), 'month')
+        executor.execute(db.delete(rollup).where(
+            rollup.c.sheep_id == sheep_id, rollup.c.record_type == record_type,
+            rollup.c.resolution == resolution, rollup.c.bucket_start == start
+        ))
+        rows = _raw_rows(executor, SheepHistoricalData.sheep_id == sheep_id, SheepHistoricalData.record_type == record_type,
+                         SheepHistoricalData.record_date >= start, SheepHistoricalData.record_date < end)
+        aggregates = list(_aggregate(rows, [resolution]).values())
+        if aggregates:
+            executor.execute(db.insert(rollup), aggregates)
+
+def rebuild_user(user_id, executor=None):
+    """以原始數據重建某位使用者的全部彙總，供資料遷移回填或修復使用。"""
+    executor = executor or db.session
+    rollup = SheepHistoryRollup.__table__
+    executor.execute(db.delete(rollup).where(rollup.c.user_id == user_id))
+    aggregates = list(_aggregate(_raw_rows(executor, SheepHistoricalData.user_id == user_id)).values())
+    for i in range(0, len(aggregates), ROLLUP_UPSERT_BATCH_SIZE):
+        executor.execute(db.insert(rollup), aggregates[i:i + ROLLUP_UPSERT_BATCH_SIZE])
+
+def get_rollups(sheep_id, resolution, date_from=None, date_to=None):
+    """返回單隻羊在指定粒度下、依區間起始日排序的彙總列表。"""
+    query = SheepHistoryRollup.query.filter_by(sheep_id=sheep_id, resolution=resolution)
+    if date_from: query = query.filter(SheepHistoryRollup.bucket_start >= bucket_start(date_from, resolution))
+    if date_to: query = query.filter(SheepHistoryRollup.bucket_start <= date_to)
+    return [r.to_dict() for r in query.order_by(SheepHistoryRollup.bucket_start, SheepHistoryRollup.record_type)]
+
+# --- Private Helper Functions ---
+
+def _raw_rows(executor, *criteria):
+    """(私有) 依日期、id 排序讀取原始歷史數據，確保「最後一筆」與 get_history_for_sheep 的順序一致。"""
+    h = SheepHistoricalData
+    result = executor.execute(
+        db.select(h.sheep_id, h.user_id, h.record_type, h.record_date, h.value).where(*criteria).order_by(h.record_date, h.id)
+    )
+    return [row._asdict() for row in result]
+
+def _aggregate(rows, resolutions=RESOLUTIONS):
+    """(私有) 將原始數據依 (羊隻, 類型, 粒度, 區間) 彙總；同一天的多筆以較後出現者為「最後一筆」。"""
+    aggregates = {}
+    for row in rows:
+        value, day = float(row['value']), row['record_date']
+        for resolution in resolutions:
+            start = bucket_start(day, resolution)
+            key = (row['sheep_id'], row['record_type'], resolution, start)
+            agg = aggregates.get(key)
+            if agg is None:
+                aggregates[key] = {
+                    "sheep_id": row['sheep_id'], "user_id": row['user_id'], "record_type": row['record_type'],
+                    "resolution": resolution, "bucket_start": start, "min_value": value, "max_value": value,
+                    "sum_value": value, "count": 1, "last_value": value, "last_date": day,
+                }
+                continue
+            agg["min_value"] = min(agg["min_value"], value)
+            agg["max_value"] = max(agg["max_value"], value)
+            agg["sum_value"] += value
+            agg["count"] += 1
+            if day >= agg["last_date"]:
+                agg["last_value"], agg["last_date"] = value, day
+    return aggregates
+
+def _upsert(executor, aggregates):
+    """(私有) INSERT ... ON CONFLICT DO UPDATE，將本批彙總與資料庫中既有的區間合併。"""
+    table = SheepHistoryRollup.__table__
+    is_postgresql = _dialect_name(executor) == 'postgresql'
+    insert = postgresql.insert if is_postgresql else sqlite.insert
+    # PostgreSQL 以 LEAST / GREATEST 取兩值較小 / 較大者；SQLite 的多參數 min() / max() 為同義的純量函數
+    least, greatest = (db.func.least, db.func.greatest) if is_postgresql else (db.func.min, db.func.max)
+
+    stmt = insert(table).values(aggregates)
+    excluded = stmt.excluded
+    newer = excluded.last_date >= table.c.last_date
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['sheep_id', 'record_type', 'resolution', 'bucket_start'],
+        set_={
+            "min_value": least(table.c.min_value, excluded.min_value),
+            "max_value": greatest(table.c.max_value, excluded.max_value),
+            "sum_value": table.c.sum_value + excluded.sum_value,
+            "count": table.c.count + excluded.count,
+            "last_value": db.case((newer, excluded.last_value), else_=table.c.last_value),
+            "last_date": db.case((newer, excluded.last_date), else_=table.c.last_date),
+        }
+    )
+    executor.execute(stmt)
+
+def _dialect_name(executor):
+    """(私有) executor 可以是 db.session 或 Connection（資料遷移時）。"""
+    bind = executor.get_bind() if hasattr(executor, 'get_bind') else executor
+    return bind.dialect.name
+
+# --- END OF FILE backend/app/services/history_rollup.py ---
\ No newline at end of file
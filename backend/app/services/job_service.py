@@ -0,0 +1,213 @@
+# --- START OF FILE backend/app/services/job_service.py ---
+
+import os
+import time
+import uuid
+import shutil
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from .. import db
+from ..models import Job
+from . import data_service
+
+# 執行緒池在第一次提交工作時才建立，大小由 JOB_WORKERS 設定
+_executor = None
+_executor_lock = threading.Lock()
+
+# 本行程中執行中工作的即時進度 {job_id: progress}
+_live_progress = {}
+
+# 匯出檔案保留時間（秒），由 JOB_RESULT_TTL 設定；過期後檔案刪除，需重新匯出
+DEFAULT_JOB_RESULT_TTL = 24 * 3600
+# 超過此時間（秒）仍未結束的工作一律視為中斷，由 JOB_STALE_AFTER 設定；
+# 用於無法確認執行行程是否存活的情況（例如其他主機上的 worker）
+DEFAULT_JOB_STALE_AFTER = 6 * 3600
+
+ORPHANED_JOB_ERROR = "伺服器重新啟動，工作已中斷，請重新提交。"
+
+def submit_import_job(user_id, file_stream, config_str, is_default_mode):
+    """
+    建立 Excel 導入背景工作並立即返回工作 ID。
+    上傳的檔案會先複製到暫存目錄，因為請求結束後 file_stream 即失效。
+    """
+    upload_path = _save_upload(file_stream)
+    return _submit(user_id, 'import', _run_import, upload_path, config_str, is_default_mode)
+
+def submit_export_job(user_id):
+    """建立 Excel 匯出背景工作並立即返回工作 ID。"""
+    return _submit(user_id, 'export', _run_export)
+
+def get_job(user_id, job_id):
+    """返回使用者的工作；找不到時返回 None。"""
+    return Job.query.filter_by(id=job_id, user_id=user_id).first()
+
+def get_job_status(user_id, job_id):
+    """返回工作狀態字典；若工作在本行程中執行，使用記憶體中的即時進度。"""
+    job = get_job(user_id, job_id)
+    if not job: return None
+    job_dict = job.to_dict()
+    if job_id in _live_progress:
+        job_dict['progress'] = _live_progress[job_id]
+    return job_dict
+
+def recover_orphaned_jobs():
+    """
+    將執行行程已不存在的 pending / running 工作標記為失敗，返回標記的數量。應用程式啟動時調用。
+    執行行程在本機時以 PID 判斷是否存活；其他主機或無法判斷的工作，超過 JOB_STALE_AFTER 才視為中斷。
+    """
+    table = Job.__table__
+    stale_before = datetime.utcnow() - timedelta(seconds=current_app.config.get('JOB_STALE_AFTER', DEFAULT_JOB_STALE_AFTER))
+    with db.engine.begin() as conn:
+        rows = conn.execute(
+            db.select(table.c.id, table.c.worker, table.c.created_at).where(table.c.status.in_(('pending', 'running')))
+        ).all()
+        orphaned = [row.id for row in rows if _is_orphaned(row.worker, row.created_at, stale_before)]
+        if orphaned:
+            conn.execute(
+                db.update(table).where(table.c.id.in_(orphaned))
+                .values(status='failed', error=ORPHANED_JOB_ERROR, finished_at=datetime.utcnow())
+            )
+    return len(orphaned)
+
+def cleanup_expired_results():
+    """
+    刪除超過 JOB_RESULT_TTL 的匯出檔案（並清除工作的 result_path），以及結果目錄中同樣過期的殘留檔案
+    （例如行程中斷時未刪除的上傳檔）。應用程式啟動與每次提交工作時調用，返回刪除的檔案數。
+    """
+    app = current_app._get_current_object()
+    ttl = app.config.get('JOB_RESULT_TTL', DEFAULT_JOB_RESULT_TTL)
+    table = Job.__table__
+    expired_before = datetime.utcnow() - timedelta(seconds=ttl)
+    with db.engine.begin() as conn:
+        expired = conn.execute(
+            db.select(table.c.id, table.c.result_path)
+            .where(table.c.result_path.is_not(None), table.c.finished_at < expired_before)
+        ).all()
+        if expired:
+            conn.execute(db.update(table).where(table.c.id.in_([row.id for row in expired])).values(result_path=None))
+    removed = sum(_remove_file(row.result_path) for row in expired)
+
+    result_dir = _result_dir(app)
+    mtime_before = time.time() - ttl
+    for entry in os.scandir(result_dir):
+        if entry.is_file() and entry.stat().st_mtime < mtime_before:
+            removed += _remove_file(entry.path)
+    return removed
+
+# --- Private Helper Functions ---
+
+def _worker():
+    """(私有) 目前行程的識別 "主機名稱:PID"；在調用時計算，fork 出的 worker 會得到各自的 PID。"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _is_orphaned(worker, created_at, stale_before):
+    """(私有) 判斷未結束的工作是否已無行程執行。"""
+    if created_at is not None and created_at < stale_before: return True
+    if not worker: return True # worker 欄位加入前建立的工作
+    host, _, pid = worker.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit(): return False
+    pid = int(pid)
+    # 本行程剛啟動，尚未執行任何工作；相同 PID 的工作屬於先前的行程
+    if pid == os.getpid(): return True
+    return not _pid_alive(pid)
+
+def _pid_alive(pid):
+    """(私有) 檢查本機的 PID 是否存在。Windows 的 os.kill 會終止行程，無法用來檢查，一律視為存活。"""
+    if os.name == 'nt': return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _remove_file(path):
+    """(私有) 刪除檔案，返回是否確實刪除；檔案已不存在時略過。"""
+    try:
+        os.remove(path)
+        return 1
+    except FileNotFoundError:
+        return 0
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config.get('JOB_WORKERS', 2), thread_name_prefix='job')
+        return _executor
+
+def _result_dir(app):
+    path = app.config.get('JOB_RESULT_DIR') or os.path.join(tempfile.gettempdir(), 'goat_jobs')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _save_upload(file_stream):
+    fd, path = tempfile.mkstemp(suffix='.xlsx', dir=_result_dir(current_app))
+    with os.fdopen(fd, 'wb') as f:
+        shutil.copyfileobj(file_stream, f)
+    return path
+
+def _submit(user_id, kind, runner, *args):
+    job = Job(id=uuid.uuid4().hex, user_id=user_id, kind=kind, status='pending', progress={}, worker=_worker())
+    db.session.add(job)
+    db.session.commit()
+    app = current_app._get_current_object()
+    # 順便清理過期的匯出檔案，清理失敗不影響工作提交
+    try:
+        cleanup_expired_results()
+    except Exception as e:
+        app.logger.warning(f"清理過期的工作結果失敗: {e}")
+    _get_executor(app).submit(_run_job, app, job.id, user_id, runner, *args)
+    return job.id
+
+def _update_job(job_id, **values):
+    """
+    以獨立連線更新工作狀態並立即提交。
+    導入工作在 session 的事務中進行，若共用 session 提交進度，會把未完成的導入一併提交。
+    """
+    with db.engine.begin() as conn:
+        conn.execute(db.update(Job.__table__).where(Job.__table__.c.id == job_id).values(**values))
+
+def _report_progress(app, job_id, progress):
+    _live_progress[job_id] = progress
+    # SQLite 在導入事務進行中無法由其他連線寫入，只保留記憶體中的進度
+    if db.engine.dialect.name == 'sqlite': return
+    # 進度回報失敗不應中斷工作本身
+    try:
+        _update_job(job_id, progress=progress)
+    except Exception as e:
+        app.logger.warning(f"更新背景工作 {job_id} 進度失敗: {e}")
+
+def _run_job(app, job_id, user_id, runner, *args):
+    with app.app_context():
+        _update_job(job_id, status='running')
+        try:
+            result_values = runner(job_id, user_id, *args, progress_callback=lambda progress: _report_progress(app, job_id, progress))
+            _update_job(job_id, status='succeeded', finished_at=datetime.utcnow(), progress=_live_progress.get(job_id, {}), **result_values)
+        except Exception as e:
+            app.logger.error(f"背景工作 {job_id} 失敗: {e}")
+            _update_job(job_id, status='failed', error=str(e), finished_at=datetime.utcnow(), progress=_live_progress.get(job_id, {}))
+        finally:
+            _live_progress.pop(job_id, None)
+            db.session.remove()
+
+def _run_import(job_id, user_id, upload_path, config_str, is_default_mode, progress_callback):
+    try:
+        with open(upload_path, 'rb') as f:
+            report_details = data_service.import_data_from_excel(user_id, f, config_str, is_default_mode, progress_callback=progress_callback)
+        return {'result': report_details}
+    finally:
+        os.remove(upload_path)
+
+def _run_export(job_id, user_id, progress_callback):
+    result_path = os.path.join(_result_dir(current_app), f"export_{job_id}.xlsx")
+    with data_service.export_user_data_to_excel(user_id, progress_callback=progress_callback) as excel_file, open(result_path, 'wb') as f:
+        shutil.copyfileobj(excel_file, f)
+    return {'result_path': result_path}
+
+# --- END OF FILE backend/app/services/job_service.py ---
\ No newline at end of file
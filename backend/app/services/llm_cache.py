@@ -0,0 +1,146 @@
+# --- START OF FILE backend/app/services/llm_cache.py ---
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+from .. import db
+from ..models import LlmCacheEntry
+
+class TTLCache:
+    """
+    執行緒安全的 LRU + TTL 記憶體快取。
+    超過 maxsize 時淘汰最久未使用的項目；過期項目在讀取時移除。
+    """
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """返回快取值；不存在或已過期時返回 None。"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None: return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (ttl if ttl is not None else self.ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+class SqlCacheTier:
+    """
+    以資料庫資料表保存的第二層快取，讓多個 worker 行程與重新啟動後都能共用結果。
+    使用獨立連線讀寫，不影響目前請求的 session 事務。
+    """
+
+    def get(self, key):
+        table = LlmCacheEntry.__table__
+        with db.engine.connect() as conn:
+            row = conn.execute(db.select(table.c.value, table.c.expires_at).where(table.c.key == key)).first()
+        if row is None or row.expires_at < datetime.utcnow(): return None
+        return row.value
+
+    def set(self, key, value, ttl):
+        """
+        以 upsert 寫入，多個 worker 同時未命中同一個鍵時不會因主鍵衝突而失敗；
+        同一個事務中順便刪除已過期的項目，避免資料表每天為每個鍵累積一列。
+        """
+        table = LlmCacheEntry.__table__
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl)
+        with db.engine.begin() as conn:
+            insert = postgresql.insert if conn.dialect.name == 'postgresql' else sqlite.insert
+            stmt = insert(table).values(key=key, value=value, expires_at=expires_at)
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.key], set_={"value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at}
+            ))
+            conn.execute(db.delete(table).where(table.c.expires_at < now))
+
+class LLMResponseCache:
+    """
+    LLM 回應快取：記憶體 LRU+TTL 為第一層，可選的 SQL 資料表為第二層。
+    只快取成功的回應，並統計各層的命中與未命中次數。
+    """
+
+    def __init__(self, memory, sql_tier=None):
+        self.memory = memory
+        self.sql_tier = sql_tier
+        self._counters = {"memory_hits": 0, "sql_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        if self.sql_tier:
+            value = self.sql_tier.get(key)
+            if value is not None:
+                self._count("sql_hits")
+                self.memory.set(key, value)
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.memory.ttl
+        self.memory.set(key, value, ttl)
+        if self.sql_tier:
+            self.sql_tier.set(key, value, ttl)
+
+    def get_or_compute(self, key, compute, ttl=None):
+        """
+        返回快取值；未命中時調用 compute()。compute 返回含 'error' 的字典時不寫入快取。
+        """
+        value = self.get(key)
+        if value is not None: return value
+        value = compute()
+        if not (isinstance(value, dict) and "error" in value):
+            self.set(key, value, ttl)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+def hash_api_key(api_key):
+    """以 API 金鑰的雜湊值作為快取鍵的一部分，避免在快取中保存原始金鑰。"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+def get_llm_cache():
+    """返回目前應用程式共用的 LLM 回應快取，第一次呼叫時依設定建立。"""
+    cache = current_app.extensions.get('llm_cache')
+    if cache is None:
+        config = current_app.config
+        memory = TTLCache(maxsize=config.get('LLM_CACHE_MAXSIZE', 256), ttl=config.get('LLM_CACHE_TTL', 24 * 3600))
+        sql_tier = SqlCacheTier() if config.get('LLM_CACHE_SQL_TIER') else None
+        cache = current_app.extensions.setdefault('llm_cache', LLMResponseCache(memory, sql_tier))
+    return cache
+
+# --- END OF FILE backend/app/services/llm_cache.py ---
\ No newline at end of file
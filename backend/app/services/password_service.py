@@ -0,0 +1,104 @@
+# --- START OF FILE backend/app/services/password_service.py ---
+
+"""
+密碼雜湊服務。
+
+- 雜湊參數由設定決定：PASSWORD_HASH_METHOD（Werkzeug 的 method 字串，例如 'scrypt'、
+  'scrypt:16384:8:1'、'pbkdf2:sha256:600000'，預設 'scrypt'）與 PASSWORD_SALT_LENGTH（預設 16）。
+- 雜湊與驗證都在有上限的執行緒池中執行（PASSWORD_HASH_WORKERS 個執行緒），同一時間最多只有這麼多個
+  雜湊運算佔用 CPU，其餘請求處理執行緒不會被大量登入拖垮；排隊超過 PASSWORD_HASH_TIMEOUT 秒時
+  拋出 PasswordHashBusy。
+- 登入成功時若儲存的雜湊參數與目前設定不同，會在執行緒池中以新參數重新雜湊並寫回，不延遲登入回應。
+"""
+
+import os
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+from .. import db
+from ..models import User
+
+DEFAULT_PASSWORD_HASH_METHOD = 'scrypt'
+
+class PasswordHashBusy(Exception):
+    """雜湊執行緒池忙碌，等待超過 PASSWORD_HASH_TIMEOUT。"""
+
+def get_hash_params():
+    """返回目前設定的 (method, salt_length)。"""
+    config = current_app.config
+    return config.get('PASSWORD_HASH_METHOD', DEFAULT_PASSWORD_HASH_METHOD), config.get('PASSWORD_SALT_LENGTH', 16)
+
+def get_hash_executor():
+    """返回目前應用程式共用的雜湊執行緒池，第一次呼叫時依設定建立。"""
+    executor = current_app.extensions.get('password_hash_executor')
+    if executor is None:
+        workers = current_app.config.get('PASSWORD_HASH_WORKERS') or min(4, os.cpu_count() or 1)
+        executor = current_app.extensions.setdefault(
+            'password_hash_executor', ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        )
+    return executor
+
+def hash_password(password):
+    """以目前設定的參數雜湊密碼（在雜湊執行緒池中執行）。"""
+    method, salt_length = get_hash_params()
+    return _run_in_pool(generate_password_hash, password, method=method, salt_length=salt_length)
+
+def hash_passwords(passwords):
+    """批次雜湊多個密碼：工作分散到雜湊執行緒池並行執行，結果順序與輸入相同。"""
+    method, salt_length = get_hash_params()
+    return list(get_hash_executor().map(lambda password: generate_password_hash(password, method=method, salt_length=salt_length), passwords))
+
+def verify_password(user, password):
+    """
+    核對使用者的密碼（在雜湊執行緒池中執行）。
+    驗證成功且儲存的雜湊參數已過時時，在背景以目前的參數重新雜湊。
+    """
+    if not password or not user.password_hash:
+        return False
+    if not _run_in_pool(check_password_hash, user.password_hash, password):
+        return False
+    if needs_rehash(user.password_hash):
+        get_hash_executor().submit(_rehash_password, current_app._get_current_object(), user.id, user.password_hash, password)
+    return True
+
+def needs_rehash(password_hash):
+    """儲存的雜湊是否使用與目前設定不同的演算法或參數。"""
+    method, _ = get_hash_params()
+    return password_hash.split('$', 1)[0] != _resolved_method(method)
+
+# --- Private Helper Functions ---
+
+@lru_cache(maxsize=16)
+def _resolved_method(method):
+    """
+    (私有) 將設定的 method 轉為 Werkzeug 實際寫入雜湊字串的完整形式（例如 'scrypt' -> 'scrypt:32768:8:1'），
+    以一次真實雜湊取得，避免自行維護 Werkzeug 的預設參數。
+    """
+    return generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+
+def _run_in_pool(func, *args, **kwargs):
+    """(私有) 在雜湊執行緒池中執行 func 並等待結果；等待逾時時取消尚未開始的工作並拋出 PasswordHashBusy。"""
+    future = get_hash_executor().submit(func, *args, **kwargs)
+    try:
+        return future.result(timeout=current_app.config.get('PASSWORD_HASH_TIMEOUT', 30))
+    except FutureTimeoutError:
+        future.cancel()
+        raise PasswordHashBusy("登入請求過多，請稍後再試")
+
+def _rehash_password(app, user_id, old_hash, password):
+    """
+    (私有) 背景工作：以目前的參數重新雜湊並寫回。只在雜湊仍是 old_hash 時更新，
+    避免覆蓋期間內變更過的密碼。
+    """
+    with app.app_context():
+        try:
+            method, salt_length = get_hash_params()
+            new_hash = generate_password_hash(password, method=method, salt_length=salt_length)
+            table = User.__table__
+            with db.engine.begin() as conn:
+                conn.execute(db.update(table).where(table.c.id == user_id, table.c.password_hash == old_hash).values(password_hash=new_hash))
+        except Exception as e:
+            app.logger.warning(f"使用者 {user_id} 的密碼重新雜湊失敗: {e}")
+
+# --- END OF FILE backend/app/services/password_service.py ---
\ No newline at end of file
@@ -0,0 +1,144 @@
+# --- START OF FILE backend/app/services/sheep_context.py ---
+
+import threading
+from flask import current_app
+from .. import db
+from ..models import Sheep, SheepEvent, SheepHistoricalData
+from .llm_cache import TTLCache
+from .data_version import get_sheep_version
+
+CONTEXT_HISTORY_LIMIT = 10 # 最多帶入的歷史數據筆數
+CONTEXT_EVENT_LIMIT = 5 # 最多帶入的近期事件筆數
+
+class SheepContextCache:
+    """
+    以 (user_id, EarNum) 為鍵的羊隻背景資料快取。
+    每個項目綁定羊隻的 (id, last_updated)，讀取時比對，其他 worker 寫入後也不會讀到舊資料；
+    invalidate 只是讓本行程提早釋放項目。
+    每位使用者另有一個世代編號，批次匯入等大範圍變更時遞增世代，舊項目自然過期淘汰。
+    """
+
+    def __init__(self, maxsize=1024, ttl=600):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def key(self, user_id, ear_num):
+        with self._lock:
+            return (user_id, self._generations.get(user_id, 0), ear_num)
+
+    def invalidate(self, user_id, ear_num=None):
+        """清除單一羊隻的快取；ear_num 為 None 時清除該使用者的全部快取。"""
+        if ear_num is None:
+            with self._lock:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        else:
+            self.entries.delete(self.key(user_id, ear_num))
+
+def get_sheep_context_cache():
+    """返回目前應用程式共用的背景資料快取，第一次呼叫時依設定建立。"""
+    cache = current_app.extensions.get('sheep_context_cache')
+    if cache is None:
+        config = current_app.config
+        cache = current_app.extensions.setdefault('sheep_context_cache', SheepContextCache(
+            maxsize=config.get('AI_CONTEXT_CACHE_MAXSIZE', 1024),
+            ttl=config.get('AI_CONTEXT_CACHE_TTL', 600),
+        ))
+    return cache
+
+def build_sheep_context(user_id, ear_num):
+    """
+    返回附加在提示詞後的羊隻背景資料字串（觀察筆記、歷史數據趨勢、近期事件）。
+    結果依 (user_id, EarNum) 快取，長度不超過 AI_CONTEXT_MAX_CHARS。
+    每次讀取以一個查詢取得羊隻的 (id, last_updated)；羊隻本身、其事件或歷史數據的寫入都會更新
+    last_updated（見 data_version.touch_sheep），版本不符時重新組合。
+    """
+    if not ear_num:
+        return ""
+
+    version = get_sheep_version(user_id, ear_num)
+    if version is None:
+        return ""
+    version = tuple(version)
+
+    cache = get_sheep_context_cache()
+    key = cache.key(user_id, ear_num)
+    cached = cache.entries.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    context = _assemble_context(user_id, ear_num, current_app.config.get('AI_CONTEXT_MAX_CHARS', 2000))
+    if context:
+        cache.entries.set(key, (version, context))
+    return context
+
+def invalidate_sheep_context(user_id, ear_num=None):
+    """羊隻、事件或歷史數據變更（並提交）後調用，使下次對話重新組合背景資料。"""
+    get_sheep_context_cache().invalidate(user_id, ear_num)
+
+# --- Private Helper Functions ---
+
+def _assemble_context(user_id, ear_num, max_chars):
+    """
+    (私有) 以一批只取必要欄位的查詢讀取資料並組合字串。
+    超過字數預算時，依序捨棄最舊的歷史數據與最舊的事件，最後才截斷觀察筆記。
+    """
+    sheep = db.session.execute(
+        db.select(Sheep.id, Sheep.EarNum, Sheep.agent_notes).where(Sheep.user_id == user_id, Sheep.EarNum == ear_num)
+    ).first()
+    if not sheep:
+        return ""
+
+    history_rows = db.session.execute(
+        db.select(SheepHistoricalData.record_type, SheepHistoricalData.record_date, SheepHistoricalData.value)
+        .where(SheepHistoricalData.sheep_id == sheep.id, SheepHistoricalData.user_id == user_id)
+        .order_by(SheepHistoricalData.record_date.desc())
+        .limit(CONTEXT_HISTORY_LIMIT)
+    ).all()
+    event_rows = db.session.execute(
+        db.select(SheepEvent.event_date, SheepEvent.event_type, SheepEvent.description)
+        .where(SheepEvent.sheep_id == sheep.id)
+        .order_by(SheepEvent.event_date.desc(), SheepEvent.id.desc())
+        .limit(CONTEXT_EVENT_LIMIT)
+    ).all()
+
+    history = list(reversed(history_rows)) # 由舊到新
+    events = list(event_rows) # 由新到舊
+    notes = sheep.agent_notes
+
+    while True:
+        context = _format_context(sheep.EarNum, notes, history, events)
+        if len(context) <= max_chars:
+            return context
+        if history:
+            history.pop(0)
+        elif events:
+            events.pop()
+        elif notes:
+            overflow = len(context) - max_chars
+            notes = notes[:max(0, len(notes) - overflow - 1)] + "…" if len(notes) > overflow + 1 else None
+        else:
+            return context[:max_chars]
+
+def _format_context(ear_num, notes, history, events):
+    """(私有) 依原本的提示詞格式輸出背景資料。"""
+    context_parts = [f"\n\n--- 關於耳號 {ear_num} 的額外背景資料 ---"]
+    if notes:
+        context_parts.append(f"我的觀察筆記: {notes}")
+
+    if history:
+        history_by_type = {}
+        for rec in history:
+            history_by_type.setdefault(rec.record_type, []).append(f"{rec.record_date}({rec.value})")
+        context_parts.append("歷史數據趨勢:")
+        for rec_type, values_str in history_by_type.items():
+            context_parts.append(f"- {rec_type}: {', '.join(values_str)}")
+
+    if events:
+        context_parts.append("近期事件:")
+        for event in events:
+            desc = event.description or '無描述'
+            context_parts.append(f"- {event.event_date} {event.event_type}: {desc}")
+
+    return "\n".join(context_parts)
+
+# --- END OF FILE backend/app/services/sheep_context.py ---
\ No newline at end of file
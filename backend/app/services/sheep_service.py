@@ -1,8 +1,16 @@
 # --- START OF FILE backend/app/services/sheep_service.py ---
 
 from .. import db
-from ..models import User, Sheep, SheepEvent, SheepHistoricalData, ChatHistory
+from ..serializers import model_serializer
+from ..models import User, Sheep, SheepEvent, SheepHistoricalData, ChatHistory, DashboardSnapshot
+from sqlalchemy.exc import IntegrityError
+from .sheep_context import invalidate_sheep_context
+from .data_version import bump_data_version, touch_sheep
+from .date_utils import parse_optional_date, require_date
+from . import history_rollup
 from datetime import datetime, date, timedelta
+import base64
+import json
 
 # --- Sheep (羊隻) CRUD 服務 ---
 
@@ -15,16 +23,77 @@ def add_sheep(user_id, data):
     
     # 清理所有不应由用户在创建时指定的键
     allowed_fields = {field.name for field in Sheep.__table__.columns if field.name not in ['id', 'user_id']}
-    clean_data = {key: value for key, value in data.items() if key in allowed_fields}
+    clean_data = _parse_sheep_dates({key: value for key, value in data.items() if key in allowed_fields})
 
     new_sheep = Sheep(user_id=user_id, **clean_data)
     db.session.add(new_sheep)
+    mark_dashboard_dirty(user_id)
+    bump_data_version(user_id)
     db.session.commit()
     return new_sheep.to_dict()
 
 def get_all_sheep_by_user(user_id):
-    sheep_list = Sheep.query.filter_by(user_id=user_id).order_by(Sheep.EarNum).all()
-    return [s.to_dict() for s in sheep_list]
+    serializer = model_serializer(Sheep)
+    return serializer.fetch_all(serializer.select().where(Sheep.user_id == user_id).order_by(Sheep.EarNum))
+
+SHEEP_PAGE_DEFAULT_LIMIT = 50
+SHEEP_PAGE_MAX_LIMIT = 500
+SHEEP_LIST_FILTERS = ('status', 'Breed', 'Sex', 'FarmNum')
+
+def list_sheep_page(user_id, cursor=None, limit=None, fields=None, filters=None):
+    """
+    以 (EarNum, id) 為鍵分頁列出羊隻，返回 {"items", "next_cursor", "has_more"}。
+    cursor 為上一頁返回的 next_cursor；fields 為要返回的欄位名稱列表（SQL 只查詢這些欄位，
+    id 與 EarNum 一律包含）；filters 為 {欄位: 值或值列表}，僅支援 SHEEP_LIST_FILTERS 中的欄位。
+    """
+    try:
+        limit = int(limit) if limit not in (None, '') else SHEEP_PAGE_DEFAULT_LIMIT
+    except (TypeError, ValueError):
+        raise ValueError(f"limit 必須為整數: {limit}")
+    if limit < 1: raise ValueError("limit 必須大於 0")
+    limit = min(limit, SHEEP_PAGE_MAX_LIMIT)
+
+    columns = Sheep.__table__.columns
+    allowed_fields = [c.name for c in columns if c.name != 'user_id']
+    if fields:
+        unknown = [f for f in fields if f not in allowed_fields]
+        if unknown: raise ValueError(f"不支援的欄位: {', '.join(unknown)}")
+        selected = ['id', 'EarNum'] + [f for f in allowed_fields if f in fields and f not in ('id', 'EarNum')]
+    else:
+        selected = allowed_fields
+
+    serializer = model_serializer(Sheep, selected)
+    query = serializer.select().where(Sheep.user_id == user_id)
+    for name, value in (filters or {}).items():
+        if name not in SHEEP_LIST_FILTERS: raise ValueError(f"不支援的篩選欄位: {name}")
+        values = value if isinstance(value, (list, tuple)) else [value]
+        query = query.where(columns[name].in_(values))
+    if cursor:
+        after_ear_num, after_id = _decode_sheep_cursor(cursor)
+        query = query.where(db.tuple_(Sheep.EarNum, Sheep.id) > (after_ear_num, after_id))
+    # 多取一筆以判斷是否還有下一頁
+    rows = db.session.execute(query.order_by(Sheep.EarNum, Sheep.id).limit(limit + 1)).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = serializer.rows_to_dicts(rows)
+    next_cursor = _encode_sheep_cursor(rows[-1].EarNum, rows[-1].id) if has_more else None
+    return {"items": items, "next_cursor": next_cursor, "has_more": has_more}
+
+def _encode_sheep_cursor(ear_num, sheep_id):
+    """(私有) 將分頁位置 (EarNum, id) 編碼為不透明的 URL 安全字串。"""
+    raw = json.dumps([ear_num, sheep_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_sheep_cursor(cursor):
+    """(私有) 解碼 _encode_sheep_cursor 產生的字串，格式不符時拋出 ValueError。"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        ear_num, sheep_id = json.loads(raw.decode('utf-8'))
+        if not isinstance(ear_num, str) or not isinstance(sheep_id, int): raise TypeError
+        return ear_num, sheep_id
+    except (ValueError, TypeError):
+        raise ValueError("無效的分頁游標")
 
 def get_sheep_details_by_ear_num(user_id, ear_num):
     sheep = Sheep.query.filter_by(user_id=user_id, EarNum=ear_num).first()
@@ -38,38 +107,156 @@ def update_sheep_data(user_id, ear_num, data):
     sheep_to_update = db.session.query(Sheep).filter_by(user_id=user_id, EarNum=ear_num).first()
     if not sheep_to_update: raise ValueError(f"找不到耳號為 {ear_num} 的羊隻")
 
-    record_date = data.pop('record_date', date.today().strftime('%Y-%m-%d'))
-    if not record_date: record_date = date.today().strftime('%Y-%m-%d')
-    
+    record_date = parse_optional_date(data.pop('record_date', None), "記錄日期") or date.today()
+    data = _check_sheep_values(_parse_sheep_dates(data))
+    new_history = _apply_sheep_changes(sheep_to_update, user_id, data, record_date)
+    _insert_history_rows(new_history)
+    mark_dashboard_dirty(user_id)
+    bump_data_version(user_id)
+    db.session.commit()
+    invalidate_sheep_context(user_id, ear_num)
+    return sheep_to_update.to_dict()
+
+BATCH_MAX_ITEMS = 1000
+
+def batch_update_sheep(user_id, items):
+    """
+    批次更新多隻羊（例如秤重日）。items 為 [{"EarNum": ..., 欄位..., "record_date": 選填}]，
+    每一項的處理方式與 update_sheep_data 相同（含自動記錄體重、產奶量、乳脂率的歷史數據），
+    但所有耳號以一次查詢取得、歷史數據批次寫入、整批只 commit 一次。
+    單一項目的錯誤（找不到耳號、日期格式錯誤、欄位值無法寫入）只會讓該項失敗，不影響其他項目。
+
+    Returns:
+        dict: {"results": [{"EarNum", "success", "history_added" 或 "error"}], "succeeded", "failed"}
+    """
+    items = _validate_batch(items)
+    sheep_by_ear = {
+        sheep.EarNum: sheep for sheep in
+        Sheep.query.filter(Sheep.user_id == user_id, Sheep.EarNum.in_({item['EarNum'] for item in items})).all()
+    }
+
+    results, new_history, updated = [], [], set()
+    for item in items:
+        ear_num = item['EarNum']
+        sheep = sheep_by_ear.get(ear_num)
+        if sheep is None:
+            results.append({"EarNum": ear_num, "success": False, "error": f"找不到耳號為 {ear_num} 的羊隻"})
+            continue
+        try:
+            record_date = parse_optional_date(item.get('record_date'), "記錄日期") or date.today()
+            data = _check_sheep_values(_parse_sheep_dates({key: value for key, value in item.items() if key not in ('EarNum', 'record_date')}))
+        except ValueError as e:
+            results.append({"EarNum": ear_num, "success": False, "error": str(e)})
+            continue
+        history = _apply_sheep_changes(sheep, user_id, data, record_date)
+        new_history.extend(history)
+        updated.add(ear_num)
+        results.append({"EarNum": ear_num, "success": True, "history_added": len(history)})
+
+    if updated:
+        _insert_history_rows(new_history)
+        mark_dashboard_dirty(user_id)
+        bump_data_version(user_id)
+        db.session.commit()
+        for ear_num in updated:
+            invalidate_sheep_context(user_id, ear_num)
+    return _batch_report(results)
+
+def delete_sheep_by_ear_num(user_id, ear_num):
+    sheep = Sheep.query.filter_by(user_id=user_id, EarNum=ear_num).first_or_404()
+    db.session.delete(sheep)
+    mark_dashboard_dirty(user_id)
+    bump_data_version(user_id)
+    db.session.commit()
+    invalidate_sheep_context(user_id, ear_num)
+
+def _apply_sheep_changes(sheep, user_id, data, record_date):
+    """
+    (私有) 將 data 中允許的欄位寫入 sheep（data 的日期欄位需已由 _parse_sheep_dates 轉換）。
+    體重、產奶量、乳脂率有變動時產生歷史數據列，以字典列表返回，由呼叫端以 _insert_history_rows 寫入。
+    """
     historical_fields = ['Body_Weight_kg', 'milk_yield_kg_day', 'milk_fat_percentage']
     
     allowed_fields = {field.name for field in Sheep.__table__.columns if field.name not in ['id', 'user_id', 'EarNum']}
 
+    new_history = []
     for key, value in data.items():
         if key in allowed_fields:
-            old_value = getattr(sheep_to_update, key)
+            old_value = getattr(sheep, key)
             new_value = value if value != '' else None
             
             if key in historical_fields and new_value is not None:
                 try:
-                    if old_value is None or float(old_value) != float(new_value):
-                        history_record = SheepHistoricalData(
-                            sheep_id=sheep_to_update.id, user_id=user_id, record_date=record_date,
-                            record_type=key, value=float(new_value), notes=f"從 {old_value} 更新為 {new_value}"
-                        )
-                        db.session.add(history_record)
+                    numeric_value = float(new_value)
+                    if old_value is None or float(old_value) != numeric_value:
+                        new_history.append({
+                            "sheep_id": sheep.id, "user_id": user_id, "record_date": record_date,
+                            "record_type": key, "value": numeric_value, "notes": f"從 {old_value} 更新為 {new_value}"
+                        })
+                    # 與資料庫讀回的值一致，同一批次再次更新同一隻羊時，備註中的舊值格式相同
+                    new_value = numeric_value
                 except (ValueError, TypeError): pass
             
-            setattr(sheep_to_update, key, new_value)
+            setattr(sheep, key, new_value)
     
-    sheep_to_update.last_updated = datetime.utcnow()
-    db.session.commit()
-    return sheep_to_update.to_dict()
+    sheep.last_updated = datetime.utcnow()
+    return new_history
 
-def delete_sheep_by_ear_num(user_id, ear_num):
-    sheep = Sheep.query.filter_by(user_id=user_id, EarNum=ear_num).first_or_404()
-    db.session.delete(sheep)
-    db.session.commit()
+def _insert_history_rows(rows):
+    """(私有) 以一次 executemany 寫入歷史數據並更新週/月彙總，由呼叫端 commit。"""
+    if not rows: return
+    db.session.execute(db.insert(SheepHistoricalData), rows)
+    history_rollup.apply_history_rows(rows)
+
+def _validate_batch(items):
+    """(私有) 檢查批次請求的項目列表，格式不符時拋出 ValueError。"""
+    if not isinstance(items, list) or not items:
+        raise ValueError("items 必須為非空的列表")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValueError(f"單次最多 {BATCH_MAX_ITEMS} 筆")
+    if not all(isinstance(item, dict) and isinstance(item.get('EarNum'), str) and item['EarNum'] for item in items):
+        raise ValueError("items 的每一項都必須為包含耳號 (EarNum) 的物件")
+    return items
+
+def _batch_report(results):
+    """(私有) 整理批次 API 的回應。"""
+    succeeded = sum(1 for result in results if result['success'])
+    return {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+
+def _check_sheep_values(data):
+    """
+    (私有) 檢查數值與文字欄位的值能否寫入資料庫（日期欄位由 _parse_sheep_dates 處理），不符時拋出 ValueError。
+    只檢查不轉換，寫入的值與歷史數據的備註維持原樣；空字串與 None 表示清除，不檢查。
+    """
+    columns = Sheep.__table__.c
+    for key, value in data.items():
+        if key not in columns or value is None or value == '': continue
+        column_type = columns[key].type
+        if isinstance(column_type, db.Date): continue
+        if isinstance(value, (bool, dict, list)):
+            raise ValueError(f"欄位 {key} 的值無效: {value!r}")
+        if isinstance(column_type, db.Integer):
+            try:
+                if isinstance(value, float) and not value.is_integer(): raise ValueError
+                int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"欄位 {key} 必須為整數: {value!r}")
+        elif isinstance(column_type, db.Float):
+            try:
+                float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"欄位 {key} 必須為數字: {value!r}")
+        elif isinstance(column_type, db.String) and column_type.length and len(str(value)) > column_type.length:
+            raise ValueError(f"欄位 {key} 不可超過 {column_type.length} 個字元")
+    return data
+
+def _parse_sheep_dates(data):
+    """(私有) 將 Sheep 的 DATE 欄位由字串轉為 date 物件；空字串視為清除，無法解析時拋出 ValueError。"""
+    parsed = dict(data)
+    for key, value in data.items():
+        if key in Sheep.__table__.c and isinstance(Sheep.__table__.c[key].type, db.Date):
+            parsed[key] = parse_optional_date(value, key)
+    return parsed
 
 # --- SheepEvent (事件) CRUD 服務 ---
 
@@ -82,6 +269,7 @@ def add_sheep_event(user_id, ear_num, data):
 
     if not event_date or not event_type:
         raise ValueError("事件日期和類型為必填")
+    event_date = require_date(event_date, "事件日期")
         
     new_event = SheepEvent(
         user_id=user_id,
@@ -92,13 +280,65 @@ def add_sheep_event(user_id, ear_num, data):
         notes=data.get('notes')
     )
     db.session.add(new_event)
+    touch_sheep([sheep.id])
+    bump_data_version(user_id)
     db.session.commit()
+    invalidate_sheep_context(user_id, ear_num)
     return new_event.to_dict()
 
+def batch_add_sheep_events(user_id, items):
+    """
+    批次記錄事件（例如全群疫苗接種）。items 為 [{"EarNum": ..., "event": {event_date, event_type, description, notes}}]，
+    驗證規則與 add_sheep_event 相同；所有耳號以一次查詢取得，事件以批次 INSERT 寫入，整批只 commit 一次。
+    單一項目的錯誤只會讓該項失敗，不影響其他項目。
+
+    Returns:
+        dict: {"results": [{"EarNum", "success", "event_id" 或 "error"}], "succeeded", "failed"}
+    """
+    items = _validate_batch(items)
+    sheep_ids = dict(db.session.execute(
+        db.select(Sheep.EarNum, Sheep.id).where(Sheep.user_id == user_id, Sheep.EarNum.in_({item['EarNum'] for item in items}))
+    ).all())
+
+    results, event_rows, pending = [], [], []
+    for item in items:
+        ear_num = item['EarNum']
+        event = item.get('event') or {}
+        if ear_num not in sheep_ids:
+            results.append({"EarNum": ear_num, "success": False, "error": f"找不到耳號為 {ear_num} 的羊隻"})
+            continue
+        try:
+            if not isinstance(event, dict) or not event.get('event_date') or not event.get('event_type'):
+                raise ValueError("事件日期和類型為必填")
+            event_date = require_date(event.get('event_date'), "事件日期")
+        except ValueError as e:
+            results.append({"EarNum": ear_num, "success": False, "error": str(e)})
+            continue
+        event_rows.append({
+            "user_id": user_id, "sheep_id": sheep_ids[ear_num], "event_date": event_date, "event_type": event['event_type'],
+            "description": event.get('description'), "notes": event.get('notes')
+        })
+        result = {"EarNum": ear_num, "success": True}
+        results.append(result)
+        pending.append(result)
+
+    if event_rows:
+        event_ids = db.session.execute(
+            db.insert(SheepEvent.__table__).returning(SheepEvent.__table__.c.id, sort_by_parameter_order=True), event_rows
+        ).scalars().all()
+        for result, event_id in zip(pending, event_ids):
+            result['event_id'] = event_id
+        touch_sheep(row['sheep_id'] for row in event_rows)
+        bump_data_version(user_id)
+        db.session.commit()
+        for ear_num in {result['EarNum'] for result in pending}:
+            invalidate_sheep_context(user_id, ear_num)
+    return _batch_report(results)
+
 def get_events_for_sheep(user_id, ear_num):
     sheep = Sheep.query.filter_by(user_id=user_id, EarNum=ear_num).first_or_404()
-    events = SheepEvent.query.filter_by(sheep_id=sheep.id).order_by(SheepEvent.event_date.desc(), SheepEvent.id.desc()).all()
-    return [e.to_dict() for e in events]
+    serializer = model_serializer(SheepEvent)
+    return serializer.fetch_all(serializer.select().where(SheepEvent.sheep_id == sheep.id).order_by(SheepEvent.event_date.desc(), SheepEvent.id.desc()))
 
 def update_sheep_event(user_id, event_id, data):
     """【重大修正V4】只更新允許的欄位"""
@@ -109,29 +349,59 @@ def update_sheep_event(user_id, event_id, data):
 
     if not event_date or not event_type:
         raise ValueError("事件日期和類型為必填")
+    event_date = require_date(event_date, "事件日期")
         
     event.event_date = event_date
     event.event_type = event_type
     event.description = data.get('description')
     event.notes = data.get('notes')
+    touch_sheep([event.sheep_id])
+    bump_data_version(user_id)
     db.session.commit()
+    invalidate_sheep_context(user_id, event.sheep.EarNum)
     return event.to_dict()
 
 def delete_sheep_event(user_id, event_id):
     event = SheepEvent.query.filter_by(id=event_id, user_id=user_id).first_or_404()
+    ear_num = event.sheep.EarNum
     db.session.delete(event)
+    touch_sheep([event.sheep_id])
+    bump_data_version(user_id)
     db.session.commit()
+    invalidate_sheep_context(user_id, ear_num)
 
 # --- SheepHistoricalData (歷史數據) 服務 ---
-def get_history_for_sheep(user_id, ear_num):
+def get_history_for_sheep(user_id, ear_num, resolution='raw', date_from=None, date_to=None):
+    """
+    返回羊隻的歷史數據。resolution 為 'raw' 時返回原始紀錄；'week' / 'month' 時返回彙總
+    （含 min、max、mean、count、last，並以 record_date / value 表示區間起始日與平均值）。
+    date_from、date_to 為選填的日期範圍（含端點）。
+    """
+    if resolution not in ('raw',) + history_rollup.RESOLUTIONS:
+        raise ValueError(f"不支援的 resolution: {resolution}")
+    date_from = parse_optional_date(date_from, "起始日期")
+    date_to = parse_optional_date(date_to, "結束日期")
     sheep = Sheep.query.filter_by(user_id=user_id, EarNum=ear_num).first_or_404()
-    history = SheepHistoricalData.query.filter_by(sheep_id=sheep.id).order_by(SheepHistoricalData.record_date.asc(), SheepHistoricalData.id.asc()).all()
-    return [h.to_dict() for h in history]
+    if resolution != 'raw':
+        return history_rollup.get_rollups(sheep.id, resolution, date_from, date_to)
+
+    serializer = model_serializer(SheepHistoricalData)
+    query = serializer.select().where(SheepHistoricalData.sheep_id == sheep.id)
+    if date_from: query = query.where(SheepHistoricalData.record_date >= date_from)
+    if date_to: query = query.where(SheepHistoricalData.record_date <= date_to)
+    return serializer.fetch_all(query.order_by(SheepHistoricalData.record_date.asc(), SheepHistoricalData.id.asc()))
 
 def delete_sheep_history(user_id, record_id):
     record = SheepHistoricalData.query.filter_by(id=record_id, user_id=user_id).first_or_404()
+    ear_num = record.sheep.EarNum
     db.session.delete(record)
+    db.session.flush()
+    history_rollup.rebuild_buckets(record.sheep_id, record.record_type, record.record_date)
+    touch_sheep([record.sheep_id])
+    mark_dashboard_dirty(user_id)
+    bump_data_version(user_id)
     db.session.commit()
+    invalidate_sheep_context(user_id, ear_num)
 
 # --- ChatHistory (聊天記錄) 服務 ---
 def save_chat_messages(user_id, session_id, ear_num_context, user_message, model_reply):
@@ -150,33 +420,94 @@ def get_dashboard_data(user_id):
     reminder_fields = { "next_vaccination_due_date": "疫苗接種", "next_deworming_due_date": "驅蟲", "expected_lambing_date": "預產期" }
     for field, desc in reminder_fields.items():
         field_attr = getattr(Sheep, field)
-        overdue_sheep = user_sheep_query.filter(field_attr != None, field_attr < today.strftime('%Y-%m-%d')).all()
-        for s in overdue_sheep: reminders.append({"ear_num": s.EarNum, "type": desc, "due_date": getattr(s, field), "status": "已過期"})
-        upcoming_sheep = user_sheep_query.filter(field_attr >= today.strftime('%Y-%m-%d'), field_attr <= seven_days_later.strftime('%Y-%m-%d')).all()
-        for s in upcoming_sheep: reminders.append({"ear_num": s.EarNum, "type": desc, "due_date": getattr(s, field), "status": "即將到期"})
+        overdue_sheep = user_sheep_query.filter(field_attr != None, field_attr < today).all()
+        for s in overdue_sheep: reminders.append({"ear_num": s.EarNum, "type": desc, "due_date": getattr(s, field).isoformat(), "status": "已過期"})
+        upcoming_sheep = user_sheep_query.filter(field_attr >= today, field_attr <= seven_days_later).all()
+        for s in upcoming_sheep: reminders.append({"ear_num": s.EarNum, "type": desc, "due_date": getattr(s, field).isoformat(), "status": "即將到期"})
     flock_status_summary = db.session.query(Sheep.status, db.func.count(Sheep.status)).filter(Sheep.user_id == user_id, Sheep.status != None, Sheep.status != '').group_by(Sheep.status).all()
     flock_summary_list = [{"status": status, "count": count} for status, count in flock_status_summary]
-    health_alerts = []
-    user_sheep = user_sheep_query.all()
-    thirty_days_ago = today - timedelta(days=30)
-    for sheep in user_sheep:
-        recent_weights = SheepHistoricalData.query.filter(SheepHistoricalData.sheep_id == sheep.id, SheepHistoricalData.record_type == 'Body_Weight_kg',).order_by(SheepHistoricalData.record_date.desc()).limit(2).all()
-        if len(recent_weights) == 2:
-            latest, prev = recent_weights[0], recent_weights[1]
-            if datetime.strptime(latest.record_date, '%Y-%m-%d').date() >= thirty_days_ago and latest.value < prev.value and prev.value > 0:
-                decrease_perc = ((prev.value - latest.value) / prev.value) * 100
-                if decrease_perc > 5: health_alerts.append({ "ear_num": sheep.EarNum, "type": "體重顯著下降", "message": f"從 {prev.value}kg ({prev.record_date}) 降至 {latest.value}kg ({latest.record_date})，降幅 {decrease_perc:.1f}%。" })
-        if sheep.status and 'lactating' in sheep.status:
-            recent_milks = SheepHistoricalData.query.filter(SheepHistoricalData.sheep_id == sheep.id, SheepHistoricalData.record_type == 'milk_yield_kg_day',).order_by(SheepHistoricalData.record_date.desc()).limit(2).all()
-            if len(recent_milks) == 2:
-                latest, prev = recent_milks[0], recent_milks[1]
-                if datetime.strptime(latest.record_date, '%Y-%m-%d').date() >= thirty_days_ago and latest.value < prev.value and prev.value > 0:
-                    decrease_perc = ((prev.value - latest.value) / prev.value) * 100
-                    if decrease_perc > 15: health_alerts.append({ "ear_num": sheep.EarNum, "type": "產奶量驟降", "message": f"日產奶量從 {prev.value}kg ({prev.record_date}) 降至 {latest.value}kg ({latest.record_date})，降幅 {decrease_perc:.1f}%。" })
+    health_alerts = _get_health_alerts(user_id, today - timedelta(days=30))
     return {
         "reminders": sorted(reminders, key=lambda x: (x["due_date"] or "9999-99-99", x["status"])),
         "health_alerts": health_alerts,
         "flock_status_summary": flock_summary_list
     }
 
+def get_dashboard_snapshot(user_id, fresh=False):
+    """
+    返回使用者的儀表板快照；快照過期、跨日或指定 fresh 時才重新計算並寫回。
+    """
+    today_str = date.today().strftime('%Y-%m-%d')
+    snapshot = db.session.get(DashboardSnapshot, user_id)
+    if snapshot and not fresh and not snapshot.is_dirty and snapshot.snapshot_date == today_str:
+        return snapshot.payload
+
+    # 先記下計算前的版本；若計算期間有新的寫入，快照會維持過期狀態
+    current_version = snapshot.version if snapshot else 0
+    payload = get_dashboard_data(user_id)
+    if snapshot is None:
+        snapshot = DashboardSnapshot(user_id=user_id, version=current_version)
+        db.session.add(snapshot)
+    snapshot.payload = payload
+    snapshot.snapshot_date = today_str
+    snapshot.computed_version = current_version
+    snapshot.computed_at = datetime.utcnow()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 另一個請求同時建立了快照，直接返回本次計算結果
+        db.session.rollback()
+    return payload
+
+def mark_dashboard_dirty(user_id):
+    """將使用者的儀表板快照標記為過期。應在寫入操作的同一個事務中、commit 之前調用。"""
+    DashboardSnapshot.query.filter_by(user_id=user_id).update(
+        {DashboardSnapshot.version: DashboardSnapshot.version + 1}, synchronize_session=False
+    )
+
+# 健康警示規則：record_type -> (降幅閾值 %, 是否僅限泌乳中羊隻, 警示類型, 訊息前綴)
+HEALTH_ALERT_RULES = {
+    'Body_Weight_kg': (5, False, "體重顯著下降", "從"),
+    'milk_yield_kg_day': (15, True, "產奶量驟降", "日產奶量從"),
+}
+
+def _get_health_alerts(user_id, since_date):
+    """
+    (私有) 以單一窗口查詢取得每隻羊每種紀錄類型最新的兩筆數據，並判斷是否需要發出健康警示。
+    查詢次數固定，不會隨羊群規模增加。
+    """
+    ranked = db.session.query(
+        Sheep.id.label('sheep_id'),
+        Sheep.EarNum.label('ear_num'),
+        Sheep.status.label('status'),
+        SheepHistoricalData.record_type.label('record_type'),
+        SheepHistoricalData.record_date.label('record_date'),
+        SheepHistoricalData.value.label('value'),
+        db.func.row_number().over(
+            partition_by=(SheepHistoricalData.sheep_id, SheepHistoricalData.record_type),
+            order_by=(SheepHistoricalData.record_date.desc(), SheepHistoricalData.id.desc())
+        ).label('rn')
+    ).join(Sheep, SheepHistoricalData.sheep_id == Sheep.id).filter(
+        Sheep.user_id == user_id,
+        SheepHistoricalData.record_type.in_(list(HEALTH_ALERT_RULES))
+    ).subquery()
+    rows = db.session.query(ranked).filter(ranked.c.rn <= 2).order_by(ranked.c.sheep_id, ranked.c.record_type, ranked.c.rn).all()
+
+    # 將結果整理為 {(sheep_id, record_type): [最新, 前一筆]}
+    readings = {}
+    for row in rows:
+        readings.setdefault((row.sheep_id, row.record_type), []).append(row)
+
+    health_alerts = []
+    for sheep_id in sorted({key[0] for key in readings}):
+        for record_type, (threshold, lactating_only, alert_type, prefix) in HEALTH_ALERT_RULES.items():
+            pair = readings.get((sheep_id, record_type))
+            if not pair or len(pair) < 2: continue
+            latest, prev = pair
+            if lactating_only and not (latest.status and 'lactating' in latest.status): continue
+            if latest.record_date >= since_date and latest.value < prev.value and prev.value > 0:
+                decrease_perc = ((prev.value - latest.value) / prev.value) * 100
+                if decrease_perc > threshold: health_alerts.append({ "ear_num": latest.ear_num, "type": alert_type, "message": f"{prefix} {prev.value}kg ({prev.record_date}) 降至 {latest.value}kg ({latest.record_date})，降幅 {decrease_perc:.1f}%。" })
+    return health_alerts
+
 # --- END OF FILE backend/app/services/sheep_service.py ---
\ No newline at end of file
@@ -1,7 +1,29 @@
 # --- START OF FILE backend/app/services/user_service.py ---
 
+import json
+import time
+import hashlib
+from flask import current_app
 from .. import db
 from ..models import User, EventTypeOption, EventDescriptionOption
+from .data_version import bump_data_version, get_data_version
+from .auth_service import invalidate_user
+from .password_service import hash_password, hash_passwords, verify_password
+from .llm_cache import TTLCache
+
+# 新使用者的預設事件類型及其簡要描述
+DEFAULT_EVENT_OPTIONS = {
+    "疫苗接種": ["口蹄疫疫苗", "炭疽病疫苗", "破傷風類毒素"],
+    "疾病治療": ["盤尼西林注射", "抗生素治療", "消炎藥"],
+    "配種": ["自然配種", "人工授精"],
+    "產仔": ["單胎", "雙胎", "三胎以上"],
+    "體重記錄": [],
+    "飼料調整": ["更換精料", "增加草料", "補充礦物質"],
+    "驅蟲": ["內寄生蟲 (口服)", "外寄生蟲 (噴灑)"],
+    "特殊觀察": ["食慾不振", "跛行", "精神沉鬱"],
+    "AI飼養建議諮詢": [],
+    "其他": []
+}
 
 def create_user_with_defaults(username, password):
     """
@@ -25,10 +47,12 @@ def create_user_with_defaults(username, password):
     if User.query.filter_by(username=username).first():
         raise ValueError('此使用者名稱已被註冊')
 
+    # 雜湊在有上限的執行緒池中進行，忙碌時拋出 PasswordHashBusy（於事務開始之前）
+    password_hash = hash_password(password)
+
     try:
         # 1. 創建使用者
-        new_user = User(username=username)
-        new_user.set_password(password)
+        new_user = User(username=username, password_hash=password_hash)
         db.session.add(new_user)
         
         # 2. Flush a session: 將變更寫入資料庫事務，以便獲取 new_user.id
@@ -48,6 +72,71 @@ def create_user_with_defaults(username, password):
         # 記錄錯誤日誌會更好，這裡我們先拋出異常
         raise Exception(f"創建使用者時發生錯誤: {e}")
 
+PROVISION_BATCH_SIZE = 500
+
+def provision_users(accounts, batch_size=PROVISION_BATCH_SIZE, progress_callback=None):
+    """
+    批次建立多位使用者（例如整個合作社的帳號），並為每位使用者建立預設事件選項。
+
+    每批以少數幾個集合式 INSERT 寫入使用者與預設選項後 commit；密碼雜湊在雜湊執行緒池中並行。
+    缺少帳號或密碼、與檔案中前面的帳號重複、或已被註冊的使用者會被略過並列入報告。
+
+    Args:
+        accounts (iterable): (username, password) 的序列。
+        batch_size (int): 每批處理的使用者數。
+        progress_callback (callable, optional): 每批完成後以累計建立的人數調用。
+
+    Returns:
+        dict: {"created", "skipped": [{"username", "reason"}], "elapsed_sec", "users_per_sec"}
+    """
+    started = time.perf_counter()
+    created, skipped, seen = 0, [], set()
+    batch = []
+
+    def flush_batch():
+        nonlocal created
+        if not batch: return
+        existing = set(db.session.execute(
+            db.select(User.username).where(User.username.in_([username for username, _ in batch]))
+        ).scalars())
+        for username in existing:
+            skipped.append({"username": username, "reason": "此使用者名稱已被註冊"})
+        pending = [(username, password) for username, password in batch if username not in existing]
+        batch.clear()
+        if not pending: return
+        hashes = hash_passwords([password for _, password in pending])
+        user_table = User.__table__
+        user_ids = db.session.execute(
+            db.insert(user_table).returning(user_table.c.id),
+            [{"username": username, "password_hash": password_hash} for (username, _), password_hash in zip(pending, hashes)]
+        ).scalars().all()
+        _seed_default_event_options(user_ids)
+        db.session.commit()
+        created += len(user_ids)
+        if progress_callback: progress_callback(created)
+
+    try:
+        for username, password in accounts:
+            username = (username or '').strip()
+            if not username or not password:
+                skipped.append({"username": username, "reason": "使用者名稱和密碼為必填項"})
+            elif username in seen:
+                skipped.append({"username": username, "reason": "與前面的帳號重複"})
+            else:
+                seen.add(username)
+                batch.append((username, password))
+                if len(batch) >= batch_size: flush_batch()
+        flush_batch()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    elapsed = time.perf_counter() - started
+    return {
+        "created": created, "skipped": skipped, "elapsed_sec": round(elapsed, 2),
+        "users_per_sec": round(created / elapsed, 1) if elapsed > 0 else None
+    }
+
 def authenticate_user(username, password):
     """
     驗證使用者身份。
@@ -60,22 +149,59 @@ def authenticate_user(username, password):
         User or None: 如果驗證成功，返回使用者物件；否則返回 None。
     """
     user = User.query.filter_by(username=username).first()
-    if user and user.check_password(password):
+    if user and verify_password(user, password):
         return user
     return None
 
+def change_password(user_id, current_password, new_password):
+    """
+    變更使用者密碼。
+
+    Raises:
+        ValueError: 如果新密碼為空或目前密碼不正確。
+    """
+    if not new_password:
+        raise ValueError('新密碼為必填項')
+    user = db.session.get(User, user_id)
+    if user is None or not verify_password(user, current_password):
+        raise ValueError('目前密碼不正確')
+    user.password_hash = hash_password(new_password)
+    db.session.commit()
+    invalidate_user(user_id)
+
 def get_all_event_options(user_id):
     """
     獲取指定使用者的所有事件類型及對應的描述選項。
     """
-    types = EventTypeOption.query.filter_by(user_id=user_id).order_by(EventTypeOption.is_default.desc(), EventTypeOption.name).all()
-    options_data = []
-    for type_option in types:
-        descriptions = [desc.to_dict() for desc in type_option.descriptions.order_by(EventDescriptionOption.is_default.desc(), EventDescriptionOption.description).all()]
-        type_dict = type_option.to_dict()
-        type_dict['descriptions'] = descriptions
-        options_data.append(type_dict)
-    return options_data
+    options_data, _ = get_event_options_with_version(user_id)
+    return [dict(type_dict, descriptions=list(type_dict['descriptions'])) for type_dict in options_data]
+
+def get_event_options_with_version(user_id):
+    """
+    返回 (事件選項樹, 版本標籤)。樹以單一 JOIN 查詢載入並依使用者快取；
+    快取項目綁定使用者的資料版本號，其他 worker 寫入後也不會讀到舊資料。
+    版本標籤為內容的雜湊值，內容未變時不會改變，可直接作為 ETag。返回的樹不可修改。
+    """
+    version = get_data_version(user_id)
+    cache = get_event_options_cache()
+    cached = cache.get(user_id)
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2]
+    options_data = _load_event_options_tree(user_id)
+    tag = hashlib.sha1(json.dumps(options_data, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    cache.set(user_id, (version, options_data, tag))
+    return options_data, tag
+
+def get_event_options_cache():
+    """返回目前應用程式共用的事件選項快取，第一次呼叫時依設定建立。"""
+    cache = current_app.extensions.get('event_options_cache')
+    if cache is None:
+        config = current_app.config
+        cache = current_app.extensions.setdefault('event_options_cache', TTLCache(
+            maxsize=config.get('EVENT_OPTIONS_CACHE_MAXSIZE', 4096),
+            ttl=config.get('EVENT_OPTIONS_CACHE_TTL', 3600),
+        ))
+    return cache
 
 def add_event_type(user_id, name):
     """為使用者新增一個事件類型。"""
@@ -84,7 +210,9 @@ def add_event_type(user_id, name):
     
     new_type = EventTypeOption(user_id=user_id, name=name, is_default=False)
     db.session.add(new_type)
+    bump_data_version(user_id)
     db.session.commit()
+    get_event_options_cache().delete(user_id)
     return new_type.to_dict()
 
 def delete_event_type(user_id, option_id):
@@ -94,7 +222,9 @@ def delete_event_type(user_id, option_id):
         raise ValueError("不能刪除預設的事件類型")
     
     db.session.delete(option)
+    bump_data_version(user_id)
     db.session.commit()
+    get_event_options_cache().delete(user_id)
 
 def add_event_description(user_id, type_id, description_text):
     """為指定的事件類型新增一個簡要描述。"""
@@ -109,7 +239,9 @@ def add_event_description(user_id, type_id, description_text):
         is_default=False
     )
     db.session.add(new_desc)
+    bump_data_version(user_id)
     db.session.commit()
+    get_event_options_cache().delete(user_id)
     return new_desc.to_dict()
 
 def delete_event_description(user_id, option_id):
@@ -119,40 +251,63 @@ def delete_event_description(user_id, option_id):
         raise ValueError("不能刪除預設的簡要描述")
         
     db.session.delete(option)
+    bump_data_version(user_id)
     db.session.commit()
+    get_event_options_cache().delete(user_id)
 
 # --- Private Helper Functions ---
 
+def _load_event_options_tree(user_id):
+    """(私有) 以一次 LEFT JOIN 查詢載入使用者的事件類型與描述，整理為 [{..., 'descriptions': [...]}]。"""
+    types, descs = EventTypeOption.__table__, EventDescriptionOption.__table__
+    rows = db.session.execute(
+        db.select(
+            types.c.id, types.c.name, types.c.is_default,
+            descs.c.id.label('desc_id'), descs.c.event_type_option_id, descs.c.description, descs.c.is_default.label('desc_is_default')
+        ).select_from(types.outerjoin(descs, descs.c.event_type_option_id == types.c.id))
+        .where(types.c.user_id == user_id)
+        .order_by(types.c.is_default.desc(), types.c.name, types.c.id, descs.c.is_default.desc(), descs.c.description)
+    )
+    options_data, by_id = [], {}
+    for row in rows:
+        type_dict = by_id.get(row.id)
+        if type_dict is None:
+            type_dict = by_id[row.id] = {'id': row.id, 'name': row.name, 'is_default': row.is_default, 'descriptions': []}
+            options_data.append(type_dict)
+        if row.desc_id is not None:
+            type_dict['descriptions'].append({
+                'id': row.desc_id, 'event_type_option_id': row.event_type_option_id,
+                'description': row.description, 'is_default': row.desc_is_default
+            })
+    return options_data
+
 def _create_default_event_options(user):
     """
     (私有) 為新使用者創建一套預設的事件類型和描述選項。
     這個函數假設它在一個更大的資料庫事務中被調用。
     """
-    default_options = {
-        "疫苗接種": ["口蹄疫疫苗", "炭疽病疫苗", "破傷風類毒素"],
-        "疾病治療": ["盤尼西林注射", "抗生素治療", "消炎藥"],
-        "配種": ["自然配種", "人工授精"],
-        "產仔": ["單胎", "雙胎", "三胎以上"],
-        "體重記錄": [],
-        "飼料調整": ["更換精料", "增加草料", "補充礦物質"],
-        "驅蟲": ["內寄生蟲 (口服)", "外寄生蟲 (噴灑)"],
-        "特殊觀察": ["食慾不振", "跛行", "精神沉鬱"],
-        "AI飼養建議諮詢": [],
-        "其他": []
-    }
-    
-    for type_name, descriptions in default_options.items():
-        event_type = EventTypeOption(user_id=user.id, name=type_name, is_default=True)
-        db.session.add(event_type)
-        db.session.flush() # 獲取 event_type.id
-        
-        for desc_text in descriptions:
-            description = EventDescriptionOption(
-                user_id=user.id,
-                event_type_option_id=event_type.id,
-                description=desc_text,
-                is_default=True
-            )
-            db.session.add(description)
+    _seed_default_event_options([user.id])
+
+def _seed_default_event_options(user_ids):
+    """
+    (私有) 以集合式 INSERT 為多位使用者建立預設的事件類型和描述選項：
+    事件類型以多列 INSERT ... RETURNING 取得 id，描述再以多列 INSERT 寫入
+    （SQLAlchemy 依資料庫的參數上限自動分成少數幾個陳述式），不需逐筆 flush。由呼叫端 commit。
+    """
+    if not user_ids: return
+    type_rows = [
+        {"user_id": user_id, "name": type_name, "is_default": True}
+        for user_id in user_ids for type_name in DEFAULT_EVENT_OPTIONS
+    ]
+    type_table = EventTypeOption.__table__
+    returned = db.session.execute(
+        db.insert(type_table).returning(type_table.c.id, type_table.c.user_id, type_table.c.name), type_rows
+    )
+    description_rows = [
+        {"user_id": user_id, "event_type_option_id": type_id, "description": desc_text, "is_default": True}
+        for type_id, user_id, type_name in returned
+        for desc_text in DEFAULT_EVENT_OPTIONS[type_name]
+    ]
+    db.session.execute(db.insert(EventDescriptionOption.__table__), description_rows)
 
 # --- END OF FILE backend/app/services/user_service.py ---
\ No newline at end of file
@@ -0,0 +1,5 @@
+# --- START OF FILE backend/benchmarks/__init__.py ---
+
+# 效能基準測試腳本。以 `python -m benchmarks.<腳本名稱>` 在 backend 目錄下執行。
+
+# --- END OF FILE backend/benchmarks/__init__.py ---
\ No newline at end of file
@@ -0,0 +1,59 @@
+# --- START OF FILE backend/benchmarks/bench_auth_loader.py ---
+
+"""
+登入使用者載入基準測試：/api/sheep 在三種驗證方式下每秒可處理的請求數。
+
+- session，停用使用者快取（LOGIN_USER_CACHE_TTL=0，等同改版前每個請求都查詢 user 表格）
+- session，啟用使用者快取（預設）
+- Bearer token（API_TOKEN_AUTH=True），不查詢 user 表格
+
+用法:
+    python -m benchmarks.bench_auth_loader [請求數] [資料庫 URI]
+"""
+
+import sys
+import time
+
+from app import create_app, db
+from app.models import User, Sheep
+
+def _make_app(db_uri, **config):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": db_uri, "SECRET_KEY": "benchmark", "API_TOKEN_AUTH": True, **config})
+    client = app.test_client()
+    client.post('/api/auth/register', json={"username": "bench", "password": "bench-password"})
+    client.post('/api/auth/login', json={"username": "bench", "password": "bench-password"})
+    with app.app_context():
+        user_id = db.session.execute(db.select(User.id).where(User.username == 'bench')).scalar()
+        if not db.session.execute(db.select(Sheep.id).where(Sheep.user_id == user_id).limit(1)).first():
+            db.session.execute(db.insert(Sheep), [{"user_id": user_id, "EarNum": f"S{i:03d}", "Breed": '努比亞'} for i in range(20)])
+            db.session.commit()
+    return app, client
+
+def _requests_per_sec(client, n_requests, headers=None):
+    client.get('/api/sheep', headers=headers) # 暖身
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        response = client.get('/api/sheep', headers=headers)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    return n_requests / elapsed
+
+def run(n_requests, db_uri):
+    results = []
+    app, client = _make_app(db_uri, LOGIN_USER_CACHE_TTL=0)
+    results.append(("session，無快取（改版前）", _requests_per_sec(client, n_requests)))
+    app, client = _make_app(db_uri)
+    results.append(("session，使用者快取", _requests_per_sec(client, n_requests)))
+    token = client.post('/api/auth/token').get_json()['token']
+    token_client = app.test_client()
+    results.append(("Bearer token", _requests_per_sec(token_client, n_requests, {"Authorization": f"Bearer {token}"})))
+
+    baseline = results[0][1]
+    print(f"GET /api/sheep × {n_requests}（{db_uri.split(':')[0]}）")
+    for label, rps in results:
+        print(f"{label:<20} {rps:>8.0f} req/s  ({rps / baseline:.2f}x)")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, sys.argv[2] if len(sys.argv) > 2 else "sqlite://")
+
+# --- END OF FILE backend/benchmarks/bench_auth_loader.py ---
\ No newline at end of file
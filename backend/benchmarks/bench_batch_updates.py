@@ -0,0 +1,67 @@
+# --- START OF FILE backend/benchmarks/bench_batch_updates.py ---
+
+"""
+批次更新基準測試：以 N 隻羊的秤重日（體重、產奶量）與全群疫苗接種為例，
+比較逐筆呼叫 PUT /api/sheep/<耳號>、POST /api/sheep/<耳號>/events 與一次批次請求的耗時與 SQL 查詢數。
+
+用法:
+    python -m benchmarks.bench_batch_updates [羊隻數]
+"""
+
+import sys
+import time
+
+from app import create_app, db
+
+def _measure(app, func):
+    statements = []
+    listener = lambda *args: statements.append(1)
+    with app.app_context():
+        db.event.listen(db.engine, 'before_cursor_execute', listener)
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    with app.app_context():
+        db.event.remove(db.engine, 'before_cursor_execute', listener)
+    return elapsed * 1000, len(statements)
+
+def _new_client(n_sheep, username):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "benchmark", "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000"})
+    client = app.test_client()
+    client.post('/api/auth/register', json={"username": username, "password": "bench-password"})
+    for i in range(n_sheep):
+        client.post('/api/sheep', json={"EarNum": f"S{i:05d}", "Body_Weight_kg": 40, "milk_yield_kg_day": 1.5})
+    return app, client
+
+def run(n_sheep):
+    updates = [{"EarNum": f"S{i:05d}", "Body_Weight_kg": 41 + i % 7, "milk_yield_kg_day": 1.6, "record_date": "2024-05-01"} for i in range(n_sheep)]
+    event = {"event_date": "2024-05-01", "event_type": "疫苗接種", "description": "三價疫苗"}
+
+    app, client = _new_client(n_sheep, "sequential")
+    def sequential_updates():
+        for item in updates:
+            data = dict(item)
+            client.put(f"/api/sheep/{data.pop('EarNum')}", json=data)
+    def sequential_events():
+        for item in updates:
+            client.post(f"/api/sheep/{item['EarNum']}/events", json=event)
+    sequential = [_measure(app, sequential_updates), _measure(app, sequential_events)]
+
+    app, client = _new_client(n_sheep, "batch")
+    batch = [
+        _measure(app, lambda: client.post('/api/sheep/batch_update', json={"items": updates})),
+        _measure(app, lambda: client.post('/api/sheep/batch_events', json={"items": [{"EarNum": item['EarNum'], "event": event} for item in updates]})),
+    ]
+
+    print(f"{n_sheep} 隻羊")
+    print(f"{'做法':<28} {'耗時(ms)':>10} {'查詢數':>8}")
+    for label, (elapsed, statements) in (
+        ("逐筆 PUT（秤重）", sequential[0]), ("批次 batch_update", batch[0]),
+        ("逐筆 POST 事件", sequential[1]), ("批次 batch_events", batch[1]),
+    ):
+        print(f"{label:<28} {elapsed:>10.1f} {statements:>8}")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
+
+# --- END OF FILE backend/benchmarks/bench_batch_updates.py ---
\ No newline at end of file
@@ -0,0 +1,53 @@
+# --- START OF FILE backend/benchmarks/bench_chat_ttfb.py ---
+
+"""
+AI 對話首位元組時間 (TTFB) 基準測試：/api/chat_with_agent 對比 /api/chat_with_agent/stream。
+
+模擬伺服器先延遲 latency 秒，再以 chunks 段、每段間隔 chunk_delay 秒「生成」回覆。
+非串流端點必須等整段回覆完成才能返回；串流端點在第一段生成後即送出首個 SSE 事件。
+
+用法:
+    python -m benchmarks.bench_chat_ttfb [請求數]
+"""
+
+import sys
+import time
+import statistics
+
+from app import create_app
+from benchmarks.gemini_stub import start_stub_server
+
+def _login(client):
+    client.post('/api/auth/register', json={"username": "bench", "password": "bench-password"})
+    client.post('/api/auth/login', json={"username": "bench", "password": "bench-password"})
+
+def _measure(client, path, n_requests):
+    ttfb, total = [], []
+    for i in range(n_requests):
+        start = time.perf_counter()
+        response = client.post(path, json={"api_key": "bench", "message": "你好", "session_id": f"s{i}"}, buffered=False)
+        first = None
+        for chunk in response.response:
+            if first is None and chunk:
+                first = time.perf_counter() - start
+        total.append(time.perf_counter() - start)
+        ttfb.append(first if first is not None else total[-1])
+        response.close()
+    return ttfb, total
+
+def run(n_requests):
+    server, base_url = start_stub_server(latency=0.2, reply_text="模擬回覆" * 50, chunks=20, chunk_delay=0.05)
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "benchmark", "GEMINI_API_BASE": base_url})
+    client = app.test_client()
+    _login(client)
+
+    print(f"{'端點':<28} {'TTFB 中位數':>12} {'總時間中位數':>12}")
+    for path in ('/api/chat_with_agent', '/api/chat_with_agent/stream'):
+        ttfb, total = _measure(client, path, n_requests)
+        print(f"{path:<28} {statistics.median(ttfb) * 1000:>10.0f}ms {statistics.median(total) * 1000:>10.0f}ms")
+    server.shutdown()
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
+
+# --- END OF FILE backend/benchmarks/bench_chat_ttfb.py ---
\ No newline at end of file
@@ -0,0 +1,56 @@
+# --- START OF FILE backend/benchmarks/bench_conditional_get.py ---
+
+"""
+條件式 GET 基準測試：比較讀取 API 完整回應（200）與帶 If-None-Match 的重新驗證（304）的耗時與傳輸量。
+
+用法:
+    python -m benchmarks.bench_conditional_get [羊隻數]
+"""
+
+import sys
+import time
+from datetime import date, timedelta
+
+from app import create_app, db
+from app.models import User, Sheep, SheepHistoricalData
+
+def _seed(user_id, n_sheep):
+    db.session.execute(db.insert(Sheep), [{
+        "user_id": user_id, "EarNum": f"S{i:05d}", "Breed": '努比亞', "Sex": '母', "status": 'lactating',
+        "BirthDate": date(2020, 1, 1) + timedelta(days=i % 900), "other_remarks": '食慾正常，反芻良好。' * 10,
+    } for i in range(n_sheep)])
+    sheep_id = db.session.execute(db.select(Sheep.id).where(Sheep.EarNum == 'S00000')).scalar()
+    db.session.execute(db.insert(SheepHistoricalData), [{
+        "sheep_id": sheep_id, "user_id": user_id, "record_type": 'milk_yield_kg_day',
+        "record_date": date(2022, 1, 1) + timedelta(days=i), "value": 2.5 + (i % 30) / 10,
+    } for i in range(1000)])
+    db.session.commit()
+
+def _best(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = func()
+        best = min(best, time.perf_counter() - start)
+    return best, response
+
+def run(n_sheep):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "benchmark"})
+    client = app.test_client()
+    client.post('/api/auth/register', json={"username": "bench", "password": "bench-password"})
+    client.post('/api/auth/login', json={"username": "bench", "password": "bench-password"})
+    with app.app_context():
+        _seed(db.session.execute(db.select(User.id)).scalar(), n_sheep)
+    print(f"{n_sheep} 隻羊")
+    print(f"{'端點':<28} {'200 耗時(ms)':>12} {'大小':>10} {'304 耗時(ms)':>12} {'大小':>6}")
+    for url in ('/api/sheep?all=1', '/api/sheep/S00000', '/api/sheep/S00000/history', '/api/event_options', '/api/dashboard_data'):
+        full_time, full = _best(lambda: client.get(url))
+        etag = full.headers['ETag']
+        cached_time, cached = _best(lambda: client.get(url, headers={"If-None-Match": etag}))
+        assert cached.status_code == 304, url
+        print(f"{url:<28} {full_time * 1000:>12.1f} {len(full.data):>8} B {cached_time * 1000:>12.1f} {len(cached.data):>4} B")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
+
+# --- END OF FILE backend/benchmarks/bench_conditional_get.py ---
\ No newline at end of file
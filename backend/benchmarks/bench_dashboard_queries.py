@@ -0,0 +1,68 @@
+# --- START OF FILE backend/benchmarks/bench_dashboard_queries.py ---
+
+"""
+儀表板查詢次數基準測試。
+
+以 SQLite 記憶體資料庫建立不同規模的羊群，統計 `get_dashboard_data` 每次呼叫發出的 SQL 數量與耗時，
+用來確認查詢次數不會隨羊群規模增加。
+
+用法:
+    python -m benchmarks.bench_dashboard_queries [羊隻數量 ...]
+"""
+
+import sys
+import time
+from datetime import date, timedelta
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import User, Sheep, SheepHistoricalData
+from app.services import sheep_service
+
+DEFAULT_FLOCK_SIZES = [10, 100, 1000, 3000]
+
+def _seed_flock(user_id, flock_size):
+    """建立指定數量的羊隻，每隻各有兩筆體重與產奶量紀錄（部分會觸發警示）。"""
+    today = date.today()
+    sheep_rows = [
+        {"user_id": user_id, "EarNum": f"B{i:05d}", "status": "lactating_peak" if i % 2 else "maintenance"}
+        for i in range(flock_size)
+    ]
+    db.session.execute(db.insert(Sheep), sheep_rows)
+    sheep_ids = [row.id for row in db.session.query(Sheep.id).filter_by(user_id=user_id).order_by(Sheep.id)]
+
+    history_rows = []
+    for i, sheep_id in enumerate(sheep_ids):
+        for record_type, prev_value, latest_value in [('Body_Weight_kg', 50.0, 45.0 if i % 3 == 0 else 50.5), ('milk_yield_kg_day', 3.0, 2.0 if i % 4 == 0 else 3.1)]:
+            history_rows.append({"user_id": user_id, "sheep_id": sheep_id, "record_type": record_type, "record_date": today - timedelta(days=20), "value": prev_value})
+            history_rows.append({"user_id": user_id, "sheep_id": sheep_id, "record_type": record_type, "record_date": today - timedelta(days=2), "value": latest_value})
+    db.session.execute(db.insert(SheepHistoricalData), history_rows)
+    db.session.commit()
+
+def run(flock_sizes):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "benchmark"})
+    with app.app_context():
+        query_count = {"n": 0}
+
+        @event.listens_for(db.engine, "before_cursor_execute")
+        def _count_queries(conn, cursor, statement, parameters, context, executemany):
+            query_count["n"] += 1
+
+        print(f"{'羊隻數':>8} {'SQL 數':>8} {'警示數':>8} {'耗時(ms)':>10}")
+        for n, flock_size in enumerate(flock_sizes):
+            user = User(username=f"bench_{n}", password_hash="x")
+            db.session.add(user)
+            db.session.commit()
+            _seed_flock(user.id, flock_size)
+
+            query_count["n"] = 0
+            start = time.perf_counter()
+            result = sheep_service.get_dashboard_data(user.id)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"{flock_size:>8} {query_count['n']:>8} {len(result['health_alerts']):>8} {elapsed_ms:>10.1f}")
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_FLOCK_SIZES
+    run(sizes)
+
+# --- END OF FILE backend/benchmarks/bench_dashboard_queries.py ---
\ No newline at end of file
@@ -0,0 +1,87 @@
+# --- START OF FILE backend/benchmarks/bench_date_queries.py ---
+
+"""
+提醒事項與趨勢查詢基準測試。
+
+建立 flock_size 隻羊（各有疫苗、驅蟲、預產期日期與 records_per_sheep 筆體重、產奶量紀錄），
+計時 get_dashboard_data（到期提醒 + 健康警示）與 get_history_for_sheep（單隻羊的趨勢資料）。
+日期欄位為字串或 DATE 型別時皆可執行，用來比較欄位型別變更前後的差異。
+
+用法:
+    python -m benchmarks.bench_date_queries [羊隻數量] [每隻羊的紀錄數] [資料庫 URI]
+"""
+
+import os
+import sys
+import time
+import tempfile
+from datetime import date, timedelta
+
+from app import create_app, db
+from app.models import User, Sheep, SheepHistoricalData
+from app.services import sheep_service
+
+def _date_value(column, value):
+    """依欄位型別返回 date 物件或 'YYYY-MM-DD' 字串，讓同一份資料可寫入新舊兩種結構。"""
+    return value if isinstance(column.type, db.Date) else value.strftime('%Y-%m-%d')
+
+def _seed(flock_size, records_per_sheep):
+    user = User(username='bench')
+    user.set_password('bench')
+    db.session.add(user)
+    db.session.commit()
+
+    today = date.today()
+    cols = Sheep.__table__.c
+    db.session.execute(db.insert(Sheep), [{
+        "user_id": user.id, "EarNum": f"D{i:05d}", "status": "lactating_peak" if i % 2 else "maintenance",
+        "next_vaccination_due_date": _date_value(cols.next_vaccination_due_date, today + timedelta(days=i % 60 - 20)),
+        "next_deworming_due_date": _date_value(cols.next_deworming_due_date, today + timedelta(days=i % 90 - 30)),
+        "expected_lambing_date": _date_value(cols.expected_lambing_date, today + timedelta(days=i % 150)),
+    } for i in range(flock_size)])
+    sheep_ids = db.session.execute(db.select(Sheep.id).order_by(Sheep.id)).scalars().all()
+
+    record_date = SheepHistoricalData.__table__.c.record_date
+    rows = []
+    for n, sheep_id in enumerate(sheep_ids):
+        for k in range(records_per_sheep):
+            day = today - timedelta(days=(records_per_sheep - k) * 7)
+            rows.append({"user_id": user.id, "sheep_id": sheep_id, "record_type": 'Body_Weight_kg' if k % 2 else 'milk_yield_kg_day',
+                         "record_date": _date_value(record_date, day), "value": 50.0 - (k % 5) * (n % 3)})
+        if len(rows) >= 10000:
+            db.session.execute(db.insert(SheepHistoricalData), rows)
+            rows = []
+    if rows: db.session.execute(db.insert(SheepHistoricalData), rows)
+    db.session.commit()
+    return user.id
+
+def _timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def run(flock_size, records_per_sheep, db_uri=None):
+    tmp_dir = None
+    if db_uri is None:
+        tmp_dir = tempfile.mkdtemp()
+        db_uri = f"sqlite:///{os.path.join(tmp_dir, 'dates.db')}"
+    app = create_app({"SQLALCHEMY_DATABASE_URI": db_uri, "SECRET_KEY": "benchmark"})
+    with app.app_context():
+        user_id = _seed(flock_size, records_per_sheep)
+        ear_nums = [f"D{i:05d}" for i in range(0, flock_size, max(1, flock_size // 50))]
+        column_type = type(SheepHistoricalData.__table__.c.record_date.type).__name__
+        print(f"{flock_size} 隻羊 x {records_per_sheep} 筆紀錄，日期欄位型別 {column_type}（{db.engine.dialect.name}）")
+        print(f"get_dashboard_data          {_timed(lambda: sheep_service.get_dashboard_data(user_id), 5):>9.1f} ms")
+        trend_ms = _timed(lambda: [sheep_service.get_history_for_sheep(user_id, ear) for ear in ear_nums], 5)
+        print(f"get_history_for_sheep x{len(ear_nums):<4} {trend_ms:>9.1f} ms")
+        db.session.remove()
+        db.engine.dispose()
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 5000, int(args[1]) if len(args) > 1 else 40, args[2] if len(args) > 2 else None)
+
+# --- END OF FILE backend/benchmarks/bench_date_queries.py ---
\ No newline at end of file
@@ -0,0 +1,73 @@
+# --- START OF FILE backend/benchmarks/bench_event_options.py ---
+
+"""
+事件選項基準測試：比較改版前的 N+1 查詢、單一 JOIN 查詢（快取未命中）、快取命中與 304 重新驗證
+在 /api/event_options 的耗時與 SQL 查詢數。
+
+用法:
+    python -m benchmarks.bench_event_options [自訂類型數]
+"""
+
+import sys
+import time
+
+from app import create_app, db
+from app.models import User, EventTypeOption, EventDescriptionOption
+from app.services import user_service
+
+def _legacy_event_options(user_id):
+    """改版前 get_all_event_options 的做法（每個類型各查詢一次描述），作為對照組。"""
+    types = EventTypeOption.query.filter_by(user_id=user_id).order_by(EventTypeOption.is_default.desc(), EventTypeOption.name).all()
+    options_data = []
+    for type_option in types:
+        type_dict = type_option.to_dict()
+        type_dict['descriptions'] = [desc.to_dict() for desc in type_option.descriptions.order_by(EventDescriptionOption.is_default.desc(), EventDescriptionOption.description).all()]
+        options_data.append(type_dict)
+    return options_data
+
+def _measure(func, repeat=20):
+    statements = []
+    listener = lambda *args: statements.append(1)
+    db.event.listen(db.engine, 'before_cursor_execute', listener)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    db.event.remove(db.engine, 'before_cursor_execute', listener)
+    return elapsed * 1000, len(statements) / repeat
+
+def run(n_custom_types):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "benchmark", "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000"})
+    client = app.test_client()
+    client.post('/api/auth/register', json={"username": "bench", "password": "bench-password"})
+    with app.app_context():
+        user_id = db.session.execute(db.select(User.id)).scalar()
+        for i in range(n_custom_types):
+            event_type = EventTypeOption(user_id=user_id, name=f"自訂類型{i:03d}")
+            db.session.add(event_type)
+            db.session.flush()
+            db.session.add_all([EventDescriptionOption(user_id=user_id, event_type_option_id=event_type.id, description=f"描述{j}") for j in range(5)])
+        db.session.commit()
+        assert _legacy_event_options(user_id) == user_service.get_all_event_options(user_id)
+
+        print(f"{10 + n_custom_types} 個事件類型")
+        print(f"{'做法':<26} {'耗時(ms)':>10} {'查詢數':>8}")
+        rows = [
+            ("改版前：N+1 查詢", lambda: _legacy_event_options(user_id)),
+            ("單一 JOIN（快取未命中）", lambda: (user_service.get_event_options_cache().clear(), user_service.get_all_event_options(user_id))),
+            ("快取命中", lambda: user_service.get_all_event_options(user_id)),
+        ]
+        for label, func in rows:
+            elapsed, statements = _measure(func)
+            print(f"{label:<26} {elapsed:>10.2f} {statements:>8.1f}")
+
+    etag = client.get('/api/event_options').headers['ETag']
+    for label, headers in (("GET /api/event_options", None), ("GET 帶 If-None-Match（304）", {"If-None-Match": etag})):
+        with app.app_context():
+            elapsed, statements = _measure(lambda: client.get('/api/event_options', headers=headers))
+        print(f"{label:<26} {elapsed:>10.2f} {statements:>8.1f}")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
+
+# --- END OF FILE backend/benchmarks/bench_event_options.py ---
\ No newline at end of file
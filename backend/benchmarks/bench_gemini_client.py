@@ -0,0 +1,59 @@
+# --- START OF FILE backend/benchmarks/bench_gemini_client.py ---
+
+"""
+Gemini 客戶端基準測試：每次新建連線的 requests.post 對比共用連線池的 GeminiClient。
+
+對本機模擬伺服器併發送出請求（每 10 個請求有一個 429），
+比較吞吐量，並印出 GeminiClient 的重試次數與延遲統計。
+
+用法:
+    python -m benchmarks.bench_gemini_client [請求數] [併發數]
+"""
+
+import sys
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app
+from app.services import ai_service
+from app.services.gemini_client import get_gemini_client
+from benchmarks.gemini_stub import start_stub_server
+
+def _legacy_call(base_url):
+    """原本的做法：每次呼叫都以 requests.post 建立新連線，且不重試。"""
+    url = f"{base_url}/models/{ai_service.GEMINI_MODEL_NAME}:generateContent?key=bench"
+    try:
+        response = requests.post(url, json={"contents": []}, timeout=180)
+        response.raise_for_status()
+        return {"text": response.json()["candidates"][0]["content"]["parts"][0]["text"]}
+    except requests.exceptions.RequestException as e:
+        return {"error": str(e)}
+
+def _run(label, func, n_requests, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: func(), range(n_requests)))
+    elapsed = time.perf_counter() - start
+    errors = sum(1 for r in results if "error" in r)
+    print(f"{label:<14} {elapsed:>8.2f}s {n_requests / elapsed:>10.1f} req/s  失敗 {errors}")
+
+def run(n_requests, concurrency):
+    server, base_url = start_stub_server(latency=0.02, fail_every=10)
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "benchmark", "GEMINI_API_BASE": base_url, "GEMINI_MAX_CONCURRENCY_PER_KEY": concurrency})
+
+    def pooled_call():
+        with app.app_context():
+            return ai_service.call_gemini_api("你好", "bench")
+
+    _run("requests.post", lambda: _legacy_call(base_url), n_requests, concurrency)
+    _run("GeminiClient", pooled_call, n_requests, concurrency)
+    with app.app_context():
+        print("GeminiClient 統計:", get_gemini_client().get_metrics())
+    server.shutdown()
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(args[0] if args else 200, args[1] if len(args) > 1 else 8)
+
+# --- END OF FILE backend/benchmarks/bench_gemini_client.py ---
\ No newline at end of file
@@ -0,0 +1,56 @@
+# --- START OF FILE backend/benchmarks/bench_history_rollups.py ---
+
+"""
+歷史數據彙總基準測試：/api/sheep/<耳號>/history 在 raw、week、month 三種粒度下的資料點數、回應大小與耗時。
+
+建立一隻有 years 年每日產奶量與每週體重紀錄的羊，寫入方式與 Excel 導入相同（批次 INSERT + 增量彙總）。
+
+用法:
+    python -m benchmarks.bench_history_rollups [年數]
+"""
+
+import sys
+import time
+from datetime import date, timedelta
+
+from app import create_app, db
+from app.models import User, Sheep, SheepHistoricalData
+from app.services import history_rollup
+
+def _seed(user_id, years):
+    sheep = Sheep(user_id=user_id, EarNum='TS001')
+    db.session.add(sheep)
+    db.session.flush()
+    start = date.today() - timedelta(days=365 * years)
+    rows = []
+    for day in range(365 * years):
+        record_date = start + timedelta(days=day)
+        rows.append({"sheep_id": sheep.id, "user_id": user_id, "record_type": 'milk_yield_kg_day', "record_date": record_date, "value": 2.5 + (day % 30) / 10})
+        if day % 7 == 0:
+            rows.append({"sheep_id": sheep.id, "user_id": user_id, "record_type": 'Body_Weight_kg', "record_date": record_date, "value": 40 + (day % 90) / 10})
+    db.session.execute(db.insert(SheepHistoricalData), rows)
+    history_rollup.apply_history_rows(rows)
+    db.session.commit()
+    return len(rows)
+
+def run(years):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "benchmark"})
+    client = app.test_client()
+    client.post('/api/auth/register', json={"username": "bench", "password": "bench-password"})
+    client.post('/api/auth/login', json={"username": "bench", "password": "bench-password"})
+    with app.app_context():
+        n_rows = _seed(db.session.execute(db.select(User.id)).scalar(), years)
+    print(f"{years} 年資料，共 {n_rows} 筆原始紀錄")
+    print(f"{'resolution':<10} {'資料點':>8} {'回應大小':>12} {'耗時(ms)':>10}")
+    for resolution in ('raw', 'week', 'month'):
+        best = float('inf')
+        for _ in range(5):
+            start = time.perf_counter()
+            response = client.get(f'/api/sheep/TS001/history?resolution={resolution}')
+            best = min(best, time.perf_counter() - start)
+        print(f"{resolution:<10} {len(response.get_json()):>8} {len(response.data):>10} B {best * 1000:>10.1f}")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
+
+# --- END OF FILE backend/benchmarks/bench_history_rollups.py ---
\ No newline at end of file
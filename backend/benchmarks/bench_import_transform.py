@@ -0,0 +1,113 @@
+# --- START OF FILE backend/benchmarks/bench_import_transform.py ---
+
+"""
+Excel 導入轉換階段基準測試：逐列 iterrows（舊做法）對比整欄向量化（新做法）。
+
+產生一個含基礎資料與產乳紀錄的合成工作簿，讀入後分別以兩種方式轉換，
+只計時轉換階段（不含讀檔與資料庫寫入），並確認兩者輸出一致。
+
+用法:
+    python -m benchmarks.bench_import_transform [列數]
+"""
+
+import sys
+import time
+import tempfile
+import numpy as np
+from openpyxl import Workbook
+
+from app.models import Sheep
+from app.services.data_service import (
+    _open_workbook, _read_sheet, _transform_basic_info_sheet, _transform_event_sheet, HISTORY_TYPE_MAP
+)
+from app.services.date_utils import parse_date
+
+DEFAULT_ROWS = 100_000
+BASIC_COLS = {"EarNum": "EarNum", "Breed": "Breed", "Sex": "Sex", "BirthDate": "BirthDate", "BirWei": "BirWei"}
+MILK_COLS = {"EarNum": "EarNum", "MeaDate": "MeaDate", "Milk": "Milk"}
+BREED_MAP = {"1": "Saanen", "2": "Alpine", "3": "Nubian"}
+SEX_MAP = {"1": "公", "2": "母"}
+
+def _write_workbook(path, n_rows):
+    """以 write_only 模式寫出合成工作簿，避免產生測試資料本身耗費過多記憶體。"""
+    rng = np.random.default_rng(42)
+    n_sheep = max(n_rows // 20, 1)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Basic")
+    ws.append(list(BASIC_COLS.values()))
+    for i in range(n_sheep):
+        ws.append([f"E{i:06d}", str(rng.integers(1, 5)), str(rng.integers(1, 3)), f"20{rng.integers(10, 24)}-0{rng.integers(1, 10)}-1{rng.integers(0, 10)}", float(rng.random() * 4)])
+    ws = wb.create_sheet("Milk")
+    ws.append(list(MILK_COLS.values()))
+    for i in range(n_rows):
+        value = "N/A" if i % 997 == 0 else round(float(rng.random() * 5), 2)
+        ws.append([f"E{rng.integers(0, n_sheep + 10):06d}", f"2023/{rng.integers(1, 13)}/{rng.integers(1, 29)}", value])
+    wb.save(path)
+    return n_sheep
+
+def _legacy_basic_info(df, cols, breed_map, sex_map):
+    """原本逐列處理基礎資料的轉換邏輯（不含資料庫查詢）。"""
+    records = []
+    for _, row in df.iterrows():
+        ear_num = row.get(cols['EarNum'])
+        if not ear_num: continue
+        record = {}
+        for db_field, xls_col in cols.items():
+            if hasattr(Sheep, db_field) and xls_col in row and row[xls_col] is not None:
+                value = row[xls_col]
+                if db_field == 'Breed': value = breed_map.get(str(value), value)
+                elif db_field == 'Sex': value = sex_map.get(str(value), value)
+                elif 'Date' in db_field: value = parse_date(value)
+                if value is not None: record[db_field] = value
+        records.append(record)
+    return records
+
+def _legacy_history(df, cols, user_id, sheep_id_cache):
+    """原本逐列處理產乳紀錄的轉換邏輯。"""
+    hist_type, val_col = HISTORY_TYPE_MAP['milk_yield_record']
+    rows = []
+    for _, row in df.iterrows():
+        sheep_id = sheep_id_cache.get(row.get(cols.get('EarNum')))
+        if not sheep_id: continue
+        try:
+            date = parse_date(row.get(cols.get('MeaDate')))
+            value = row.get(cols.get(val_col))
+            if date and value is not None:
+                rows.append({"user_id": user_id, "sheep_id": sheep_id, "record_date": date, "record_type": hist_type, "value": float(value)})
+        except (ValueError, TypeError):
+            continue
+    return rows
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def run(n_rows):
+    with tempfile.NamedTemporaryFile(suffix='.xlsx') as tmp:
+        print(f"產生 {n_rows} 列的合成工作簿...")
+        n_sheep = _write_workbook(tmp.name, n_rows)
+        wb = _open_workbook(tmp.name)
+        df_basic = _read_sheet(wb, "Basic")
+        df_milk = _read_sheet(wb, "Milk")
+        wb.close()
+
+    sheep_id_cache = {f"E{i:06d}": i + 1 for i in range(n_sheep)}
+
+    legacy_basic, t_legacy_basic = _timed(_legacy_basic_info, df_basic, BASIC_COLS, BREED_MAP, SEX_MAP)
+    new_basic, t_new_basic = _timed(_transform_basic_info_sheet, df_basic, BASIC_COLS, BREED_MAP, SEX_MAP)
+    new_basic_records = [{k: v for k, v in r.items() if v is not None} for r in new_basic.to_dict(orient='records')]
+    assert legacy_basic == new_basic_records, "基礎資料轉換結果不一致"
+
+    legacy_hist, t_legacy_hist = _timed(_legacy_history, df_milk, MILK_COLS, 1, sheep_id_cache)
+    (_, new_hist), t_new_hist = _timed(_transform_event_sheet, df_milk, 'milk_yield_record', MILK_COLS, 1, sheep_id_cache)
+    assert legacy_hist == new_hist, "產乳紀錄轉換結果不一致"
+
+    print(f"{'工作表':<10} {'列數':>8} {'iterrows(s)':>12} {'向量化(s)':>10} {'加速':>7}")
+    print(f"{'Basic':<10} {len(df_basic):>8} {t_legacy_basic:>12.3f} {t_new_basic:>10.3f} {t_legacy_basic / t_new_basic:>6.1f}x")
+    print(f"{'Milk':<10} {len(df_milk):>8} {t_legacy_hist:>12.3f} {t_new_hist:>10.3f} {t_legacy_hist / t_new_hist:>6.1f}x")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
+
+# --- END OF FILE backend/benchmarks/bench_import_transform.py ---
\ No newline at end of file
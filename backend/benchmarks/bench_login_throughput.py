@@ -0,0 +1,79 @@
+# --- START OF FILE backend/benchmarks/bench_login_throughput.py ---
+
+"""
+登入吞吐量基準測試：以多執行緒 HTTP 伺服器承受一波並發登入，測量每秒登入數，
+以及同一時間其他輕量請求（/api/auth/status）的延遲是否被密碼雜湊拖慢。
+
+比較的設定：
+- 不限制雜湊並行數（PASSWORD_HASH_WORKERS 等於並發數，等同改版前在請求執行緒中直接雜湊）
+- 雜湊執行緒池上限為 CPU 核心數
+- 同上，並以 PASSWORD_HASH_METHOD 調低 scrypt 成本
+
+用法:
+    python -m benchmarks.bench_login_throughput [並發數] [每個客戶端的登入次數]
+"""
+
+import os
+import sys
+import logging
+import time
+import tempfile
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+from app import create_app
+
+def _scenario(label, concurrency, logins_per_client, **config):
+    tmp_dir = tempfile.mkdtemp()
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp_dir, 'login.db')}", "SECRET_KEY": "benchmark", **config
+    })
+    app.test_client().post('/api/auth/register', json={"username": "bench", "password": "bench-password"})
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    probe_latencies = []
+    stop = threading.Event()
+    def probe():
+        while not stop.is_set():
+            start = time.perf_counter()
+            requests.get(f"{base}/api/auth/status")
+            probe_latencies.append(time.perf_counter() - start)
+            time.sleep(0.02)
+
+    def client(_):
+        for _ in range(logins_per_client):
+            assert requests.post(f"{base}/api/auth/login", json={"username": "bench", "password": "bench-password"}).status_code == 200
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+    server.shutdown()
+
+    logins = concurrency * logins_per_client
+    p95 = statistics.quantiles(probe_latencies, n=20)[-1] if len(probe_latencies) >= 20 else max(probe_latencies)
+    print(f"{label:<34} {logins / elapsed:>8.1f} {statistics.median(probe_latencies) * 1000:>12.1f} {p95 * 1000:>12.1f}")
+
+def run(concurrency, logins_per_client):
+    logging.getLogger('werkzeug').setLevel(logging.ERROR) # 不輸出每個請求的存取紀錄
+    cpus = os.cpu_count() or 1
+    print(f"並發 {concurrency} 個客戶端，每個登入 {logins_per_client} 次，CPU 核心數 {cpus}")
+    print(f"{'設定':<30} {'登入/秒':>8} {'status p50(ms)':>14} {'status p95(ms)':>14}")
+    _scenario("scrypt 預設，不限制並行", concurrency, logins_per_client, PASSWORD_HASH_WORKERS=concurrency)
+    _scenario(f"scrypt 預設，執行緒池 {min(4, cpus)}", concurrency, logins_per_client)
+    _scenario(f"scrypt:16384:8:1，執行緒池 {min(4, cpus)}", concurrency, logins_per_client, PASSWORD_HASH_METHOD='scrypt:16384:8:1')
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 16, int(sys.argv[2]) if len(sys.argv) > 2 else 5)
+
+# --- END OF FILE backend/benchmarks/bench_login_throughput.py ---
\ No newline at end of file
@@ -0,0 +1,81 @@
+# --- START OF FILE backend/benchmarks/bench_parallel_import.py ---
+
+"""
+多工作表 Excel 導入的平行解析擴展性基準測試。
+
+依預設導入設定的八個工作表產生合成工作簿，分別以 1/2/4/8 個解析行程
+（IMPORT_PARSE_WORKERS，1 代表串流逐批讀取）導入 SQLite 記憶體資料庫，比較總耗時。
+
+用法:
+    python -m benchmarks.bench_parallel_import [每個事件工作表的列數]
+"""
+
+import sys
+import time
+import tempfile
+import numpy as np
+from openpyxl import Workbook
+
+from app import create_app, db
+from app.models import User
+from app.services import data_service
+
+DEFAULT_ROWS = 50_000
+WORKER_COUNTS = [1, 2, 4, 8]
+
+def _write_workbook(path, n_rows):
+    """依 _get_default_import_config 的工作表與欄位產生合成資料。"""
+    rng = np.random.default_rng(7)
+    n_sheep = max(n_rows // 25, 1)
+    ears = [f"E{i:06d}" for i in range(n_sheep)]
+
+    def date():
+        return f"20{rng.integers(15, 24)}-{rng.integers(1, 13):02d}-{rng.integers(1, 29):02d}"
+
+    wb = Workbook(write_only=True)
+    for sheet_name, sheet_config in data_service._get_default_import_config()['sheets'].items():
+        ws = wb.create_sheet(sheet_name)
+        columns = list(sheet_config['columns'].values())
+        ws.append(columns)
+        purpose = sheet_config['purpose']
+        if purpose == 'breed_mapping':
+            for code, name in [("1", "Saanen"), ("2", "Alpine"), ("3", "Nubian")]: ws.append([code, name])
+        elif purpose == 'sex_mapping':
+            for code, name in [("1", "公"), ("2", "母")]: ws.append([code, name])
+        elif purpose == 'basic_info':
+            for ear in ears:
+                ws.append([ear if c == "EarNum" else date() if "Date" in c else str(rng.integers(1, 4)) for c in columns])
+        else:
+            for _ in range(n_rows):
+                ws.append([ears[rng.integers(0, n_sheep)] if c == "EarNum" else date() if "Date" in c else round(float(rng.random() * 5), 2) for c in columns])
+    wb.save(path)
+
+def _run_import(path, workers):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "benchmark", "IMPORT_PARSE_WORKERS": workers})
+    with app.app_context():
+        user = User(username="bench", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        start = time.perf_counter()
+        with open(path, 'rb') as f:
+            data_service.import_data_from_excel(user.id, f, '{}', True)
+        elapsed = time.perf_counter() - start
+        db.session.remove()
+        return elapsed
+
+def run(n_rows):
+    with tempfile.NamedTemporaryFile(suffix='.xlsx') as tmp:
+        print(f"產生每個事件工作表 {n_rows} 列的合成工作簿...")
+        _write_workbook(tmp.name, n_rows)
+
+        baseline = None
+        print(f"{'解析行程數':>10} {'總耗時(s)':>10} {'加速':>7}")
+        for workers in WORKER_COUNTS:
+            elapsed = _run_import(tmp.name, workers)
+            baseline = baseline or elapsed
+            print(f"{workers:>10} {elapsed:>10.2f} {baseline / elapsed:>6.2f}x")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
+
+# --- END OF FILE backend/benchmarks/bench_parallel_import.py ---
\ No newline at end of file
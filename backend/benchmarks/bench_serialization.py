@@ -0,0 +1,78 @@
+# --- START OF FILE backend/benchmarks/bench_serialization.py ---
+
+"""
+序列化微基準測試：以 10k 筆羊隻與 10k 筆歷史數據比較兩種做法的耗時。
+
+- 舊做法：ORM 查詢建立物件，逐欄 getattr 的反射式 to_dict，再以 Flask 預設（標準函式庫 json）編碼
+- 新做法：RowSerializer 直接轉換 Core 查詢的結果 tuple，再以 OrjsonProvider 編碼
+
+用法:
+    python -m benchmarks.bench_serialization [筆數]
+"""
+
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app, db
+from app.models import User, Sheep, SheepHistoricalData
+from app.serializers import OrjsonProvider, model_serializer
+
+def _reflective_to_dict(obj):
+    """改版前 models._columns_to_dict 的做法，作為對照組。"""
+    data = {}
+    for c in obj.__table__.columns:
+        value = getattr(obj, c.name)
+        if isinstance(value, date) and not isinstance(value, datetime):
+            value = value.isoformat()
+        data[c.name] = value
+    return data
+
+def _seed(n_rows):
+    user = User(username='bench', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    now = datetime.utcnow()
+    db.session.execute(db.insert(Sheep), [{
+        "user_id": user.id, "EarNum": f"S{i:06d}", "Breed": '努比亞', "Sex": '母', "BirthDate": date(2020, 1, 1) + timedelta(days=i % 900),
+        "status": 'lactating', "Body_Weight_kg": 45.5, "other_remarks": '食慾正常，反芻良好。', "last_updated": now,
+    } for i in range(n_rows)])
+    sheep_id = db.session.execute(db.select(Sheep.id).limit(1)).scalar()
+    db.session.execute(db.insert(SheepHistoricalData), [{
+        "sheep_id": sheep_id, "user_id": user.id, "record_type": 'milk_yield_kg_day',
+        "record_date": date(2020, 1, 1) + timedelta(days=i), "value": 2.5 + (i % 30) / 10, "recorded_at": now,
+    } for i in range(n_rows)])
+    db.session.commit()
+    return user.id
+
+def _best(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def run(n_rows):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "benchmark"})
+    legacy_json, fast_json = DefaultJSONProvider(app), OrjsonProvider(app)
+    with app.app_context():
+        user_id = _seed(n_rows)
+        print(f"每個模型 {n_rows} 筆")
+        print(f"{'模型':<22} {'做法':<8} {'查詢+轉字典(ms)':>16} {'JSON(ms)':>10} {'合計(ms)':>10}")
+        for model in (Sheep, SheepHistoricalData):
+            serializer = model_serializer(model)
+            legacy_rows = lambda: [_reflective_to_dict(obj) for obj in model.query.filter_by(user_id=user_id).all()]
+            fast_rows = lambda: serializer.fetch_all(serializer.select().where(model.user_id == user_id))
+            for label, to_rows, provider in (('舊做法', legacy_rows, legacy_json), ('新做法', fast_rows, fast_json)):
+                rows_time, rows = _best(to_rows)
+                json_time, _ = _best(lambda: provider.response(rows).get_data())
+                print(f"{model.__name__:<22} {label:<8} {rows_time * 1000:>16.1f} {json_time * 1000:>10.1f} {(rows_time + json_time) * 1000:>10.1f}")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
+
+# --- END OF FILE backend/benchmarks/bench_serialization.py ---
\ No newline at end of file
@@ -0,0 +1,66 @@
+# --- START OF FILE backend/benchmarks/bench_sheep_list.py ---
+
+"""
+羊隻列表基準測試：比較 /api/sheep?all=1（舊版完整列表）與分頁、欄位投影後的回應大小與耗時。
+
+每隻羊的備註類 Text 欄位填入約 300 字，模擬實際使用者的紀錄量。
+
+用法:
+    python -m benchmarks.bench_sheep_list [羊隻數]
+"""
+
+import sys
+import time
+from datetime import date
+
+from app import create_app, db
+from app.models import User, Sheep
+
+LIST_FIELDS = 'EarNum,Breed,Sex,BirthDate,FarmNum,status'
+
+def _seed(user_id, n_sheep):
+    note = '觀察紀錄：食慾正常，反芻良好。' * 20
+    rows = [{
+        "user_id": user_id, "EarNum": f"S{i:06d}", "Breed": ('努比亞', '阿爾拜因', '撒能')[i % 3], "Sex": '母' if i % 4 else '公',
+        "BirthDate": date(2018 + i % 6, 1 + i % 12, 1), "FarmNum": f"F{i % 5}", "status": 'lactating' if i % 3 == 0 else 'maintenance',
+        "status_description": note, "other_remarks": note, "agent_notes": note,
+    } for i in range(n_sheep)]
+    db.session.execute(db.insert(Sheep), rows)
+    db.session.commit()
+
+def _measure(client, url):
+    best = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        response = client.get(url)
+        best = min(best, time.perf_counter() - start)
+    return response, best
+
+def run(n_sheep):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "benchmark"})
+    client = app.test_client()
+    client.post('/api/auth/register', json={"username": "bench", "password": "bench-password"})
+    client.post('/api/auth/login', json={"username": "bench", "password": "bench-password"})
+    with app.app_context():
+        _seed(db.session.execute(db.select(User.id)).scalar(), n_sheep)
+    print(f"{n_sheep} 隻羊")
+    print(f"{'請求':<44} {'筆數':>6} {'回應大小':>12} {'耗時(ms)':>10}")
+    urls = [
+        '/api/sheep?all=1',
+        '/api/sheep?limit=50',
+        f'/api/sheep?limit=50&fields={LIST_FIELDS}',
+        f'/api/sheep?limit=50&fields={LIST_FIELDS}&Breed=努比亞&status=lactating',
+    ]
+    first_page = client.get(f'/api/sheep?limit=50&fields={LIST_FIELDS}').get_json()
+    urls.append(f"/api/sheep?limit=50&fields={LIST_FIELDS}&cursor={first_page['next_cursor']}")
+    for url in urls:
+        response, best = _measure(client, url)
+        body = response.get_json()
+        count = len(body) if isinstance(body, list) else len(body['items'])
+        label = url if len(url) <= 44 else url[:41] + '...'
+        print(f"{label:<44} {count:>6} {len(response.data):>10} B {best * 1000:>10.1f}")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
+
+# --- END OF FILE backend/benchmarks/bench_sheep_list.py ---
\ No newline at end of file
@@ -0,0 +1,69 @@
+# --- START OF FILE backend/benchmarks/bench_user_provisioning.py ---
+
+"""
+使用者批次建立基準測試：比較三種建立方式的速度（位/秒）與每位使用者的 SQL 陳述式數。
+
+- 改版前：逐一註冊，每個預設事件類型 flush 一次以取得 id
+- 逐一註冊（create_user_with_defaults），預設選項改為集合式 INSERT
+- 批次建立（provision_users）
+
+預設以低成本的 pbkdf2 雜湊排除密碼雜湊的耗時，只比較資料庫寫入；
+可用第二個參數指定 PASSWORD_HASH_METHOD（例如 scrypt）測量實際設定下的速度。
+
+用法:
+    python -m benchmarks.bench_user_provisioning [人數] [PASSWORD_HASH_METHOD]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from app import create_app, db
+from app.models import User, EventTypeOption, EventDescriptionOption
+from app.services import user_service
+
+def _legacy_create_user(username, password):
+    """改版前 create_user_with_defaults 的寫入方式，作為對照組。"""
+    user = User(username=username)
+    user.set_password(password)
+    db.session.add(user)
+    db.session.flush()
+    for type_name, descriptions in user_service.DEFAULT_EVENT_OPTIONS.items():
+        event_type = EventTypeOption(user_id=user.id, name=type_name, is_default=True)
+        db.session.add(event_type)
+        db.session.flush()
+        for desc_text in descriptions:
+            db.session.add(EventDescriptionOption(user_id=user.id, event_type_option_id=event_type.id, description=desc_text, is_default=True))
+    db.session.commit()
+
+def _measure(label, n_users, method, create):
+    tmp_dir = tempfile.mkdtemp()
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp_dir, 'provision.db')}", "SECRET_KEY": "benchmark",
+        "PASSWORD_HASH_METHOD": method,
+    })
+    statements = []
+    with app.app_context():
+        db.event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(1))
+        accounts = [(f"user{i:05d}", f"password-{i}") for i in range(n_users)]
+        start = time.perf_counter()
+        create(accounts)
+        elapsed = time.perf_counter() - start
+        assert db.session.query(User).count() == n_users
+        assert db.session.query(EventDescriptionOption).count() == n_users * 19
+        db.session.remove()
+        db.engine.dispose()
+    print(f"{label:<28} {n_users / elapsed:>10.1f} {len(statements) / n_users:>14.2f}")
+
+def run(n_users, method):
+    print(f"建立 {n_users} 位使用者（PASSWORD_HASH_METHOD={method}，SQLite）")
+    print(f"{'方式':<26} {'位/秒':>10} {'陳述式/位':>12}")
+    _measure("改版前：逐一註冊", n_users, method, lambda accounts: [_legacy_create_user(*account) for account in accounts])
+    _measure("逐一註冊（集合式選項）", n_users, method, lambda accounts: [user_service.create_user_with_defaults(*account) for account in accounts])
+    _measure("provision_users 批次", n_users, method, lambda accounts: user_service.provision_users(accounts))
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500, sys.argv[2] if len(sys.argv) > 2 else 'pbkdf2:sha256:1000')
+
+# --- END OF FILE backend/benchmarks/bench_user_provisioning.py ---
\ No newline at end of file
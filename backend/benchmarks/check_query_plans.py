@@ -0,0 +1,157 @@
+# --- START OF FILE backend/benchmarks/check_query_plans.py ---
+
+"""
+查詢計畫檢查：確認儀表板、歷史數據、事件、對話與事件選項的查詢都走索引，而非全表掃描。
+
+建立一份約 history_rows 筆歷史數據的資料集（預設 100 萬筆，另有 1/5 的事件與 1/10 的對話訊息），
+執行 ANALYZE 後呼叫實際的服務函數，攔截其發出的每一個 SELECT，
+再以 EXPLAIN（PostgreSQL 為 EXPLAIN (FORMAT JSON)，SQLite 為 EXPLAIN QUERY PLAN）檢查計畫。
+任何熱點表格出現全表掃描即列出計畫並以非零狀態碼結束，可放在部署前的檢查流程中。
+
+用法:
+    python -m benchmarks.check_query_plans [歷史數據筆數] [資料庫 URI]
+
+未指定資料庫 URI 時使用暫存的 SQLite 檔案；指定 PostgreSQL 時請使用專用的空資料庫。
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+from datetime import date, timedelta
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import User, Sheep, SheepEvent, SheepHistoricalData, ChatHistory, EventTypeOption, EventDescriptionOption
+from app.services import sheep_service, user_service, chat_memory
+
+N_USERS = 100
+HOT_TABLES = {'sheep', 'sheep_event', 'sheep_historical_data', 'chat_history', 'chat_session', 'event_type_option', 'event_description_option'}
+
+def _seed(history_rows):
+    """依 history_rows 建立使用者、羊隻、歷史數據、事件、對話與事件選項。"""
+    sheep_per_user = max(1, history_rows // N_USERS // 100) # 每隻羊約 100 筆歷史數據
+    db.session.execute(db.insert(User), [{"username": f"plan{u}", "password_hash": "-"} for u in range(N_USERS)])
+    user_ids = db.session.execute(db.select(User.id).order_by(User.id)).scalars().all()
+    db.session.execute(db.insert(Sheep), [
+        {"user_id": user_id, "EarNum": f"P{i:05d}", "status": "lactating_peak" if i % 2 else "maintenance",
+         "next_vaccination_due_date": date.today() + timedelta(days=i % 30 - 10)}
+        for user_id in user_ids for i in range(sheep_per_user)
+    ])
+    sheep = db.session.execute(db.select(Sheep.id, Sheep.user_id)).all()
+
+    start = date(2020, 1, 1)
+    def batches(make_row, total):
+        batch = []
+        for n in range(total):
+            batch.append(make_row(n))
+            if len(batch) == 10000:
+                yield batch
+                batch = []
+        if batch: yield batch
+
+    def history_row(n):
+        sheep_id, user_id = sheep[n % len(sheep)]
+        return {"sheep_id": sheep_id, "user_id": user_id, "record_type": 'Body_Weight_kg' if n % 2 else 'milk_yield_kg_day',
+                "record_date": start + timedelta(days=n // len(sheep)), "value": 40 + n % 17}
+    def event_row(n):
+        sheep_id, user_id = sheep[n % len(sheep)]
+        return {"sheep_id": sheep_id, "user_id": user_id, "event_type": "疫苗", "event_date": start + timedelta(days=n // len(sheep))}
+    def chat_row(n):
+        user_id = user_ids[n % N_USERS]
+        return {"user_id": user_id, "session_id": f"s{n // N_USERS % 20}", "role": 'user' if n % 2 else 'model', "content": "訊息"}
+
+    for model, make_row, total in [(SheepHistoricalData, history_row, history_rows), (SheepEvent, event_row, history_rows // 5), (ChatHistory, chat_row, history_rows // 10)]:
+        for batch in batches(make_row, total):
+            db.session.execute(db.insert(model), batch)
+
+    for user_id in user_ids:
+        for t in range(8):
+            option = EventTypeOption(user_id=user_id, name=f"類型{t}", is_default=t < 4)
+            db.session.add(option)
+            db.session.flush()
+            db.session.add_all([EventDescriptionOption(user_id=user_id, event_type_option_id=option.id, description=f"描述{d}") for d in range(5)])
+    db.session.commit()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    return user_ids[N_USERS // 2]
+
+def _capture_selects(func):
+    """執行 func 並返回其發出的所有 (SQL, 參數)。"""
+    statements = []
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return statements
+
+def _full_scans(conn, statement, parameters):
+    """返回 (熱點表格的全表掃描列表, 可讀的查詢計畫)。"""
+    if conn.dialect.name == 'postgresql':
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        plan = plan if isinstance(plan, list) else json.loads(plan)
+        scans, stack = [], [plan[0]['Plan']]
+        while stack:
+            node = stack.pop()
+            if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') in HOT_TABLES:
+                scans.append(node['Relation Name'])
+            stack.extend(node.get('Plans', []))
+        return scans, json.dumps(plan, indent=1, ensure_ascii=False)
+
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    details = [row[-1] for row in rows]
+    # SEARCH ... USING INTEGER PRIMARY KEY (rowid>?) 是主鍵範圍掃描，實際上與全表掃描相當
+    scans = [d for d in details if d.split()[0] in ('SCAN', 'SEARCH') and d.split()[1] in HOT_TABLES
+             and (d.startswith('SCAN ') or '(rowid>' in d or '(rowid<' in d)]
+    return scans, "\n".join(details)
+
+def run(history_rows, db_uri=None):
+    tmp_dir = None
+    if db_uri is None:
+        tmp_dir = tempfile.mkdtemp()
+        db_uri = f"sqlite:///{os.path.join(tmp_dir, 'plans.db')}"
+    app = create_app({"SQLALCHEMY_DATABASE_URI": db_uri, "SECRET_KEY": "benchmark"})
+    failures = 0
+    with app.app_context():
+        started = time.perf_counter()
+        user_id = _seed(history_rows)
+        print(f"已建立 {history_rows} 筆歷史數據，耗時 {time.perf_counter() - started:.1f}s（{db.engine.dialect.name}）")
+        ear_num = db.session.execute(db.select(Sheep.EarNum).filter_by(user_id=user_id).limit(1)).scalar()
+
+        checks = {
+            "dashboard": lambda: sheep_service.get_dashboard_data(user_id),
+            "history": lambda: sheep_service.get_history_for_sheep(user_id, ear_num),
+            "events": lambda: sheep_service.get_events_for_sheep(user_id, ear_num),
+            "sheep page": lambda: sheep_service.list_sheep_page(
+                user_id, cursor=sheep_service.list_sheep_page(user_id, limit=20)["next_cursor"], limit=20, fields=["Breed"]),
+            "chat": lambda: chat_memory.load_conversation(user_id, "s1"),
+            "event options": lambda: user_service.get_all_event_options(user_id),
+        }
+        with db.engine.connect() as conn:
+            for name, func in checks.items():
+                statements = _capture_selects(func)
+                seen = set()
+                bad = 0
+                for statement, parameters in statements:
+                    if statement in seen: continue
+                    seen.add(statement)
+                    scans, plan = _full_scans(conn, statement, parameters)
+                    if scans:
+                        bad += 1
+                        print(f"\n[{name}] 全表掃描 {scans}:\n{statement}\n{plan}")
+                print(f"{name:<14} {len(seen)} 個查詢  {'OK' if not bad else f'{bad} 個全表掃描'}")
+                failures += bad
+        db.session.remove()
+        if tmp_dir: db.engine.dispose()
+    return failures
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    sys.exit(1 if run(rows, sys.argv[2] if len(sys.argv) > 2 else None) else 0)
+
+# --- END OF FILE backend/benchmarks/check_query_plans.py ---
\ No newline at end of file
@@ -0,0 +1,90 @@
+# --- START OF FILE backend/benchmarks/gemini_stub.py ---
+
+"""
+本機 Gemini API 模擬伺服器，供基準測試與手動測試使用，不需真實 API 金鑰。
+
+- POST /models/<model>:generateContent 延遲 latency 秒後返回固定回覆。
+- POST /models/<model>:streamGenerateContent?alt=sse 延遲 latency 秒後，將回覆切成 chunks 段，
+  每段間隔 chunk_delay 秒以 SSE 送出；非串流請求則等待全部片段「生成」完畢才返回，
+  以模擬真實模型逐 token 生成的延遲。
+- 每 fail_every 個請求返回一次 429，用來驗證重試邏輯。
+
+也可單獨啟動，再將 GEMINI_API_BASE 指向它:
+    python -m benchmarks.gemini_stub [port]
+"""
+
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def make_handler(latency=0.05, fail_every=0, reply_text="這是模擬的 Gemini 回覆。", chunks=1, chunk_delay=0.0):
+    counter = {"n": 0}
+    lock = threading.Lock()
+
+    class GeminiStubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # 支援 keep-alive
+        disable_nagle_algorithm = True # 標頭與內容分兩次寫出，避免 keep-alive 連線上的 Nagle 延遲
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            self.rfile.read(length)
+            with lock:
+                counter["n"] += 1
+                should_fail = fail_every and counter["n"] % fail_every == 0
+            time.sleep(latency)
+            if should_fail:
+                self._send(429, {"error": {"message": "Resource has been exhausted"}})
+                return
+            if ':streamGenerateContent' in self.path:
+                self._send_stream()
+                return
+            time.sleep(chunk_delay * (chunks - 1))
+            self._send(200, _candidate(reply_text))
+
+        def _send_stream(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked') # 與真實 API 相同，以 chunked 編碼逐段送出
+            self.end_headers()
+            step = max(1, -(-len(reply_text) // chunks))
+            for i in range(0, len(reply_text), step):
+                if i: time.sleep(chunk_delay)
+                event = f"data: {json.dumps(_candidate(reply_text[i:i + step]), ensure_ascii=False)}\r\n\r\n".encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _send(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            if status == 429: self.send_header('Retry-After', '0')
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return GeminiStubHandler
+
+def _candidate(text):
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+def start_stub_server(port=0, **handler_options):
+    """在背景執行緒啟動模擬伺服器，返回 (server, base_url)。"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(**handler_options))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == '__main__':
+    server, base_url = start_stub_server(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print(f"Gemini 模擬伺服器運行於 {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+# --- END OF FILE backend/benchmarks/gemini_stub.py ---
\ No newline at end of file
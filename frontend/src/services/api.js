@@ -28,6 +28,39 @@ export const getDashboardData = () => request('/api/dashboard_data');
 export const getAgentTip = (apiKey) => request('/api/agent_tip', { headers: { 'X-Api-Key': apiKey } });
 export const getRecommendation = (apiKey, data) => request('/api/recommendation', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ ...data, api_key: apiKey }) });
 export const chatWithAgent = (apiKey, message, sessionId, earNumContext) => request('/api/chat_with_agent', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ api_key: apiKey, message, session_id: sessionId, ear_num_context: earNumContext }) });
+// 串流版對話：每收到一段回覆即呼叫 onText(text)，完成後 resolve 為 { reply_html }
+export async function streamChatWithAgent(apiKey, message, sessionId, earNumContext, onText) {
+  const response = await fetch('/api/chat_with_agent/stream', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ api_key: apiKey, message, session_id: sessionId, ear_num_context: earNumContext }) });
+  if (!response.ok) {
+    let errorData;
+    try { errorData = await response.json() } catch (e) { throw new Error(response.statusText || `伺服器錯誤: ${response.status}`) }
+    throw new Error(errorData.message || errorData.error || `伺服器錯誤: ${response.status}`)
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let eventName = 'message', data = '';
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event:')) eventName = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (!data) continue;
+      const payload = JSON.parse(data);
+      if (eventName === 'error') throw new Error(payload.error);
+      if (eventName === 'done') return payload;
+      onText(payload.text);
+    }
+  }
+  throw new Error('串流連線意外中斷');
+}
 
 // --- Event Options API ---
 export const getEventOptions = () => request('/api/event_options');
@@ -37,16 +70,21 @@ export const addEventDescription = (typeId, description) => request('/api/event_
 export const deleteEventDescription = (optionId) => request(`/api/event_descriptions/${optionId}`, { method: 'DELETE' });
 
 // --- Sheep & Event & History Management API ---
-export const getAllSheep = () => request('/api/sheep');
+export const getAllSheep = () => request('/api/sheep?all=1');
+// params (選填): { cursor, limit, fields: 'EarNum,Breed,...', status, Breed, Sex, FarmNum }，返回 { items, next_cursor, has_more }
+export const listSheep = (params) => request(`/api/sheep${params ? `?${new URLSearchParams(params)}` : ''}`);
 export const getSheepDetails = (earNum) => request(`/api/sheep/${earNum}`);
 export const addSheep = (data) => request('/api/sheep', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(data) });
 export const updateSheep = (earNum, data) => request(`/api/sheep/${earNum}`, { method: 'PUT', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(data) });
 export const deleteSheep = (earNum) => request(`/api/sheep/${earNum}`, { method: 'DELETE' });
+export const batchUpdateSheep = (items) => request('/api/sheep/batch_update', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ items }) });
 export const getSheepEvents = (earNum) => request(`/api/sheep/${earNum}/events`);
 export const addSheepEvent = (earNum, data) => request(`/api/sheep/${earNum}/events`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(data) });
+export const batchAddSheepEvents = (items) => request('/api/sheep/batch_events', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ items }) });
 export const updateSheepEvent = (eventId, data) => request(`/api/events/${eventId}`, { method: 'PUT', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(data) });
 export const deleteSheepEvent = (eventId) => request(`/api/events/${eventId}`, { method: 'DELETE' });
-export const getSheepHistory = (earNum) => request(`/api/sheep/${earNum}/history`);
+// params (選填): { resolution: 'raw' | 'week' | 'month', from: 'YYYY-MM-DD', to: 'YYYY-MM-DD' }
+export const getSheepHistory = (earNum, params) => request(`/api/sheep/${earNum}/history${params ? `?${new URLSearchParams(params)}` : ''}`);
 export const deleteSheepHistory = (recordId) => request(`/api/history/${recordId}`, { method: 'DELETE' });
 
 // --- Data Management API ---